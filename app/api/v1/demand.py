@@ -1,19 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
 from datetime import datetime
 from app.models.schemas import (
     DemandPredictionRequest,
     DemandPredictionResponse
 )
 from app.ml.lstm_model import lstm_predictor
+from app.ml.demand_models import demand_model_registry
+from app.ml.demand_baseline import demand_baseline
 from app.core.security import get_current_user
+from app.core.http_cache import conditional_response, make_etag
 import logging
 from app.db.redis_cache import redis_conn
 from app.core.config import settings
 from app.services.demand_service import demand_service
+from app.services.forecast_materializer import forecast_materializer
+from app.services.training_jobs import training_jobs
+from app.core.responses import AppRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/demand", tags=["Demand Prediction"])
+router = APIRouter(prefix="/demand", tags=["Demand Prediction"], route_class=AppRoute)
 
 
 @router.post("/predict", response_model=DemandPredictionResponse)
@@ -35,29 +42,17 @@ async def predict_demand(
         # except Exception:
         #     logger.debug("Redis not available for demand/predict")
 
-        # Try to get real data from ClickHouse
-        recent_data = demand_service.get_historical_demand(
-            route_id=request.route_id, 
-            days=7
-        )
-        
-        # Fallback to synthetic data if no real data available
-        if recent_data is None or recent_data.empty:
-            logger.warning("⚠️ No real data available, using synthetic data")
-            recent_data = lstm_predictor.generate_synthetic_data(num_samples=100)
-
-        # Make predictions
-        predictions = lstm_predictor.predict(
-            recent_data=recent_data,
-            hours_ahead=request.hours_ahead
-        )
+        # Trained model when available, vectorized baseline otherwise
+        model = demand_model_registry.get() or demand_baseline
+        predictions = model.forecast([request.route_id], request.hours_ahead)[request.route_id]
+        confidence, model_version = model.confidence, model.version
         
         # Format response
         predictions_list = [
             {
                 "hour": i + 1,
                 "predicted_demand": float(pred),
-                "confidence": 0.85
+                "confidence": confidence
             }
             for i, pred in enumerate(predictions)
         ]
@@ -65,8 +60,8 @@ async def predict_demand(
         response = DemandPredictionResponse(
             route_id=request.route_id,
             predictions=predictions_list,
-            confidence_score=0.85,
-            model_version="1.0.0",
+            confidence_score=confidence,
+            model_version=model_version,
             generated_at=datetime.now()
         )
 
@@ -86,6 +81,34 @@ async def predict_demand(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _load_forecast(route_id: int, hours: int) -> dict:
+    """Materialized forecast, short-lived cache, or computed on request (blocking I/O)"""
+    # Precomputed by the materialization job: a key lookup (ClickHouse on a Redis miss)
+    materialized = forecast_materializer.get_forecast(route_id, hours)
+    if materialized is not None:
+        return materialized
+
+    cache_key = f"demand:forecast:{route_id}:{hours}"
+    try:
+        cached = redis_conn.get(cache_key)
+        if cached:
+            logger.info("✅ Demand forecast returned from cache")
+            return cached
+    except Exception:
+        logger.debug("Redis not available for demand/forecast")
+
+    # Not materialized yet (or horizon too long): compute on request
+    logger.info(f"ℹ️  No materialized forecast for route {route_id}, computing on request")
+    result = forecast_materializer.compute_forecast(route_id, hours)
+
+    try:
+        redis_conn.set(cache_key, result, ttl=getattr(settings, 'CACHE_TTL', 300))
+    except Exception:
+        logger.debug("Could not cache demand forecast")
+
+    return result
+
+
 @router.get("/forecast/{route_id}")
 async def get_demand_forecast(
     route_id: int,
@@ -95,60 +118,57 @@ async def get_demand_forecast(
     """Get demand forecast for a specific route"""
     try:
         logger.info(f"Getting forecast for route {route_id}")
-
-        cache_key = f"demand:forecast:{route_id}:{hours}"
-        try:
-            cached = redis_conn.get(cache_key)
-            if cached:
-                logger.info("✅ Demand forecast returned from cache")
-                return cached
-        except Exception:
-            logger.debug("Redis not available for demand/forecast")
-
-        # Try to get real data from ClickHouse
-        recent_data = demand_service.get_historical_demand(
-            route_id=route_id, 
-            days=7
-        )
+        # Redis, ClickHouse and model calls block, so keep them off the event loop
+        return await asyncio.to_thread(_load_forecast, route_id, hours)
         
-        # Fallback to synthetic data if no real data available
-        if recent_data is None or recent_data.empty:
-            logger.warning("⚠️ No real data available, using synthetic data")
-            recent_data = lstm_predictor.generate_synthetic_data(num_samples=100)
+    except Exception as e:
+        logger.error(f"Error getting forecast: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Make predictions
-        predictions = lstm_predictor.predict(
-            recent_data=recent_data,
-            hours_ahead=hours
-        )
 
-        result = {
-            "route_id": route_id,
-            "forecast": [
-                {"hour": i + 1, "demand": float(pred)}
-                for i, pred in enumerate(predictions)
-            ],
-            "generated_at": datetime.now().isoformat()
-        }
+@router.get("/forecast/{route_id}/history")
+async def get_forecast_history(
+    route_id: int,
+    days: int = 7,
+    horizon: int = 1,
+    current_user: dict = Depends(get_current_user)
+):
+    """Materialized forecasts vs actual demand for a route"""
+    try:
+        return await asyncio.to_thread(forecast_materializer.get_history, route_id, days=days, horizon=horizon)
+    except Exception as e:
+        logger.error(f"Error getting forecast history: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        try:
-            redis_conn.set(cache_key, result, ttl=getattr(settings, 'CACHE_TTL', 300))
-        except Exception:
-            logger.debug("Could not cache demand forecast")
 
-        return result
-        
+@router.post("/forecast/materialize")
+async def materialize_forecasts(
+    hours_ahead: int = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Recompute materialized forecasts for all active routes now"""
+    try:
+        # Model inference for every active route plus ClickHouse writes: keep it off the event loop
+        return await asyncio.to_thread(forecast_materializer.run, hours_ahead=hours_ahead)
     except Exception as e:
-        logger.error(f"Error getting forecast: {e}")
+        logger.error(f"Error materializing forecasts: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _trends_response(request: Request, result: dict, days: int):
+    # generated_at identifies the cache entry; the watermark is the newest data it covers
+    etag = make_etag('demand_trends', days, result['generated_at'], result.get('data_watermark'))
+    last_modified = result.get('data_watermark') or result['generated_at']
+    return conditional_response(request, result, etag, last_modified=datetime.fromisoformat(last_modified))
+
+
 @router.get("/trends")
 async def get_demand_trends(
+    request: Request,
     days: int = 7,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get demand trends for the last N days"""
+    """Get demand trends for the last N days (supports If-None-Match / If-Modified-Since)"""
     try:
         logger.info(f"Getting demand trends for {days} days")
 
@@ -157,7 +177,7 @@ async def get_demand_trends(
             cached = redis_conn.get(cache_key)
             if cached:
                 logger.info("✅ Demand trends returned from cache")
-                return cached
+                return _trends_response(request, cached, days)
         except Exception:
             logger.debug("Redis not available for demand/trends")
 
@@ -165,9 +185,12 @@ async def get_demand_trends(
         historical_data = demand_service.get_historical_demand(days=days)
         
         # Fallback to synthetic data if no real data available
+        data_watermark = None
         if historical_data is None or historical_data.empty:
             logger.warning("⚠️ No real data available, using synthetic data")
             historical_data = lstm_predictor.generate_synthetic_data(num_samples=days * 24)
+        else:
+            data_watermark = historical_data['timestamp'].max().isoformat()
 
         # Calculate trends
         hourly_avg = historical_data.groupby('hour')['demand'].mean()
@@ -182,6 +205,7 @@ async def get_demand_trends(
                 {"date": str(date), "avg_demand": float(demand)}
                 for date, demand in daily_avg.items()
             ],
+            "data_watermark": data_watermark,
             "generated_at": datetime.now().isoformat()
         }
 
@@ -190,37 +214,54 @@ async def get_demand_trends(
         except Exception:
             logger.debug("Could not cache demand trends")
 
-        return result
+        return _trends_response(request, result, days)
         
     except Exception as e:
         logger.error(f"Error getting trends: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/train")
+@router.post("/train", status_code=202)
 async def train_model(
+    kind: str = None,
     epochs: int = 50,
+    days: int = 90,
     current_user: dict = Depends(get_current_user)
 ):
-    """Train LSTM model (admin only)"""
+    """
+    Start training in the background (admin only). Defaults to the served
+    demand model (DEMAND_MODEL), which /predict uses once the job is promoted.
+    """
     try:
-        logger.info("Training LSTM model...")
-        
-        # Generate training data
-        training_data = lstm_predictor.generate_synthetic_data(num_samples=2000)
-        
-        # Train model
-        history = lstm_predictor.train(training_data, epochs=epochs)
-        
-        return {
-            "status": "success",
-            "message": "Model trained successfully",
-            "epochs": epochs,
-            "final_loss": float(history['loss'][-1]),
-            "final_mae": float(history['mae'][-1]),
-            "trained_at": datetime.now()
-        }
+        kind = kind or settings.DEMAND_MODEL
+        params = {'epochs': epochs, 'num_samples': 2000} if kind == 'lstm' else {'days': days}
+        job = training_jobs.submit(kind, params)
+        logger.info(f"Training {kind} demand model in background job {job['job_id']}")
+        return job
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error training model: {e}")
+        logger.error(f"Error starting training job: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/train")
+async def list_training_jobs(
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user)
+):
+    """Recent training jobs"""
+    return {"jobs": training_jobs.list_jobs(limit=limit)}
+
+
+@router.get("/train/{job_id}")
+async def get_training_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Status and progress of a training job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    return job
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from app.core.security import get_current_user
 import logging
 import json
 import os
+from app.ml.model_registry import model_registry
+from app.core.responses import AppRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/metrics", tags=["Model Metrics"])
+router = APIRouter(prefix="/metrics", tags=["Model Metrics"], route_class=AppRoute)
 
 
 @router.get("/models")
@@ -120,3 +122,39 @@ async def get_business_insights(current_user: dict = Depends(get_current_user)):
             "error": str(e),
             "status": "error"
         }
+
+
+@router.get("/registry")
+async def get_model_registry(current_user: dict = Depends(get_current_user)):
+    """Registered models with their active and served versions"""
+    return {
+        "models": [
+            {
+                "name": name,
+                "active_version": model_registry.get_active_version(name),
+                "served_version": model_registry.current_version(name)
+            }
+            for name in model_registry.list_models()
+        ]
+    }
+
+
+@router.get("/registry/{name}")
+async def get_model_versions(name: str, current_user: dict = Depends(get_current_user)):
+    """Published versions of a model, newest first"""
+    versions = model_registry.list_versions(name)
+    if not versions:
+        raise HTTPException(status_code=404, detail=f"Model '{name}' not found")
+    return {"name": name, "versions": versions}
+
+
+@router.post("/registry/{name}/activate/{version}")
+async def activate_model_version(name: str, version: str, current_user: dict = Depends(get_current_user)):
+    """Deploy or roll back to a published version; workers hot-reload it"""
+    try:
+        manifest = model_registry.activate(name, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    swapped = model_registry.poll()
+    return {"name": name, "active_version": manifest["version"], "reloaded": name in swapped}
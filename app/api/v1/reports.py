@@ -1,58 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from datetime import datetime, timedelta
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
 from app.models.schemas import KPIResponse, ReportRequest, ReportResponse
 from app.core.security import get_current_user
+from app.core.http_cache import conditional_response, make_etag
 import logging
-import random
-import uuid
-from app.core.config import settings
-from app.db.redis_cache import redis_conn
+from app.services.kpi_service import kpi_engine
+from app.services.dashboard_composer import dashboard_composer
+from app.services.report_service import report_service
+from app.core.responses import AppRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/reports", tags=["Reports & KPIs"])
+router = APIRouter(prefix="/reports", tags=["Reports & KPIs"], route_class=AppRoute)
 
 
 @router.get("/kpis", response_model=KPIResponse)
 async def get_kpis(
+    request: Request,
+    period: str = Query("daily", regex="^(daily|weekly|monthly)$"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get current KPIs dashboard"""
+    """Get current KPIs dashboard (supports If-None-Match / If-Modified-Since)"""
     try:
-        logger.info("Getting KPIs...")
-        cache_key = "kpis_v1"
-
-        # Try to get from cache (fail gracefully if Redis not available)
-        try:
-            cached = redis_conn.get(cache_key)
-            if cached:
-                logger.info("✅ KPIs returned from cache")
-                return KPIResponse(**cached)
-        except Exception:
-            logger.warning("⚠️ Redis not available, continuing without cache")
-
-        # Generate mock KPI data
-        kpi = KPIResponse(
-            total_passengers=random.randint(5000, 10000),
-            total_revenue=random.uniform(50000, 100000),
-            avg_occupancy=random.uniform(0.6, 0.9),
-            routes_active=random.randint(10, 25),
-            peak_hour=random.choice([7, 8, 17, 18]),
-            sentiment_avg=random.uniform(0.6, 0.85),
-            generated_at=datetime.now()
-        )
-
-        # Cache result (store ISO string for datetime)
-        try:
-            payload = kpi.dict()
-            if isinstance(payload.get('generated_at'), datetime):
-                payload['generated_at'] = payload['generated_at'].isoformat()
-            redis_conn.set(cache_key, payload, ttl=getattr(settings, 'CACHE_TTL', 300))
-            logger.info("✅ KPIs cached")
-        except Exception:
-            logger.warning("⚠️ Could not write KPIs to Redis cache")
-
-        return kpi
+        logger.info(f"Getting {period} KPIs...")
+        kpis = await dashboard_composer.compose_kpis(period)
+        if kpis['partial']:
+            # Degraded responses carry no validators (see conditional_response)
+            return conditional_response(request, KPIResponse(**kpis), None)
+        # The summary's generated_at identifies its cache entry
+        etag = make_etag('kpis', period, kpis['window'], kpis['generated_at'], kpis['sentiment_avg'])
+        return conditional_response(request, KPIResponse(**kpis), etag,
+                                    last_modified=datetime.fromisoformat(kpis['window']['to']))
         
     except Exception as e:
         logger.error(f"Error getting KPIs: {e}")
@@ -61,126 +42,127 @@ async def get_kpis(
 
 @router.get("/dashboard")
 async def get_dashboard(
+    request: Request,
     period: str = Query("daily", regex="^(daily|weekly|monthly)$"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get comprehensive dashboard data"""
+    """Get comprehensive dashboard data (supports If-None-Match / If-Modified-Since)"""
     try:
         logger.info(f"Getting {period} dashboard...")
-
-        cache_key = f"dashboard:{period}"
-
-        try:
-            cached = redis_conn.get(cache_key)
-            if cached:
-                logger.info("✅ Dashboard returned from cache")
-                return cached
-        except Exception:
-            logger.warning("⚠️ Redis not available, continuing without cache")
-
-        # Mock dashboard data
-        dashboard = {
-            "period": period,
-            "metrics": {
-                "total_passengers": random.randint(5000, 15000),
-                "total_revenue": random.uniform(50000, 150000),
-                "total_trips": random.randint(2000, 5000),
-                "avg_occupancy": random.uniform(0.65, 0.85),
-                "on_time_performance": random.uniform(0.80, 0.95)
-            },
-            "routes": {
-                "total": random.randint(15, 30),
-                "active": random.randint(12, 25),
-                "peak_routes": [
-                    {"route_id": i, "name": f"Ruta {i}", "passengers": random.randint(500, 1500)}
-                    for i in range(1, 6)
-                ]
-            },
-            "trends": {
-                "passenger_growth": random.uniform(-5, 15),
-                "revenue_growth": random.uniform(-3, 20),
-                "satisfaction_score": random.uniform(0.70, 0.90)
-            },
-            "alerts": [
-                {
-                    "type": "warning",
-                    "message": "Ruta 5 con alta demanda",
-                    "timestamp": datetime.now().isoformat()
-                },
-                {
-                    "type": "info",
-                    "message": "Mantenimiento programado Ruta 12",
-                    "timestamp": datetime.now().isoformat()
-                }
-            ],
-            "generated_at": datetime.now()
-        }
-        
-        # Try to cache the generated dashboard (do not fail if Redis missing)
-        try:
-            to_cache = dict(dashboard)
-            if isinstance(to_cache.get('generated_at'), datetime):
-                to_cache['generated_at'] = to_cache['generated_at'].isoformat()
-            redis_conn.set(cache_key, to_cache, ttl=getattr(settings, 'CACHE_TTL', 300))
-            logger.info("✅ Dashboard cached")
-        except Exception:
-            logger.warning("⚠️ Could not write dashboard to Redis cache")
-
-        return dashboard
+        dashboard = await dashboard_composer.compose_dashboard(period)
+        if dashboard['partial']:
+            # Degraded responses carry no validators (see conditional_response)
+            return conditional_response(request, dashboard, None)
+        etag = make_etag(
+            'dashboard', period, dashboard['window'], dashboard['generated_at'],
+            dashboard['trends']['satisfaction_score'], dashboard['realtime']['window']
+        )
+        last_modified = max(
+            datetime.fromisoformat(window['to']) for window in (dashboard['window'], dashboard['realtime']['window'])
+        )
+        return conditional_response(request, dashboard, etag, last_modified=last_modified)
 
     except Exception as e:
         logger.error(f"Error getting dashboard: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/generate", response_model=ReportResponse)
+def _report_response(job: dict) -> ReportResponse:
+    report_id = job['report_id']
+    completed = job['status'] == 'completed'
+    return ReportResponse(
+        report_id=report_id,
+        report_type=job['report_type'],
+        status=job['status'],
+        format=job['format'],
+        rows=job.get('rows', 0),
+        status_url=f"/api/v1/reports/status/{report_id}",
+        download_url=f"/api/v1/reports/download/{report_id}" if completed else None,
+        error=job.get('error'),
+        submitted_at=job.get('submitted_at'),
+        generated_at=job.get('finished_at') if completed else None
+    )
+
+
+@router.post("/generate", response_model=ReportResponse, status_code=202)
 async def generate_report(
     request: ReportRequest,
     current_user: dict = Depends(get_current_user)
 ):
-    """Generate custom report"""
+    """Queue a report; poll its status_url and download it when completed"""
     try:
         logger.info(f"Generating {request.report_type} report...")
-        
-        report_id = str(uuid.uuid4())
-        
-        # Simulate report generation
-        return ReportResponse(
-            report_id=report_id,
-            report_type=request.report_type,
-            status="completed",
-            download_url=f"/api/v1/reports/download/{report_id}",
-            generated_at=datetime.now()
+        job = report_service.submit(
+            request.report_type, request.date_from, request.date_to,
+            filters=request.filters, format=request.format, compression=request.compression
         )
+        return _report_response(job)
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/export")
+async def export_report(
+    report_type: str,
+    date_from: datetime,
+    date_to: datetime,
+    format: str = Query("csv", regex="^(csv|json|parquet|arrow)$"),
+    compression: Optional[str] = Query(None, description="gzip, snappy, lz4 or zstd depending on the format"),
+    route_ids: Optional[str] = Query(None, description="Comma-separated route ids"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream a report directly, encoded block by block as ClickHouse returns it"""
+    try:
+        filters = {}
+        if route_ids:
+            filters['route_ids'] = [int(route) for route in route_ids.split(',') if route.strip()]
+        export = report_service.export(report_type, date_from, date_to, filters=filters,
+                                       format=format, compression=compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Exporting {report_type} report as {format}...")
+    return StreamingResponse(
+        export['chunks'],
+        media_type=export['content_type'],
+        headers={"Content-Disposition": f'attachment; filename="{export["filename"]}"'}
+    )
+
+
+@router.get("/status/{report_id}", response_model=ReportResponse)
+async def get_report_status(
+    report_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Status and progress (rows written) of a report"""
+    job = report_service.get(report_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+    return _report_response(job)
+
+
 @router.get("/download/{report_id}")
 async def download_report(
     report_id: str,
     current_user: dict = Depends(get_current_user)
 ):
-    """Download generated report"""
-    try:
-        logger.info(f"Downloading report {report_id}...")
-        
-        # Mock report data
-        return {
-            "report_id": report_id,
-            "status": "ready",
-            "data": {
-                "summary": "Reporte generado exitosamente",
-                "records": random.randint(100, 1000),
-                "generated_at": datetime.now().isoformat()
-            }
-        }
-        
-    except Exception as e:
-        logger.error(f"Error downloading report: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    """Download a completed report, streamed from storage"""
+    job = report_service.get(report_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+    if job['status'] != 'completed':
+        raise HTTPException(status_code=409, detail=f"Report {report_id} is {job['status']}")
+
+    logger.info(f"Downloading report {report_id}...")
+    return StreamingResponse(
+        report_service.iter_report(job),
+        media_type=job['content_type'],
+        headers={"Content-Disposition": f'attachment; filename="{job["filename"]}"'}
+    )
 
 
 @router.get("/performance")
@@ -193,20 +175,8 @@ async def get_performance_metrics(
     try:
         logger.info(f"Getting performance metrics for {days} days...")
         
-        metrics = {
-            "on_time_rate": random.uniform(0.80, 0.95),
-            "avg_delay_minutes": random.uniform(2, 8),
-            "passenger_satisfaction": random.uniform(0.70, 0.90),
-            "revenue_per_trip": random.uniform(50, 150),
-            "occupancy_rate": random.uniform(0.60, 0.85),
-            "period": {
-                "days": days,
-                "from": (datetime.now() - timedelta(days=days)).isoformat(),
-                "to": datetime.now().isoformat()
-            },
-            "generated_at": datetime.now()
-        }
-        
+        # ClickHouse-backed and synchronous: keep it off the event loop
+        metrics = await asyncio.to_thread(kpi_engine.get_performance, days, route_id=route_id)
         if route_id:
             metrics["route_id"] = route_id
         
@@ -225,36 +195,7 @@ async def get_revenue_analysis(
     """Get revenue analysis"""
     try:
         logger.info(f"Getting revenue analysis for {days} days...")
-        
-        # Generate daily revenue data
-        daily_revenue = []
-        for i in range(days):
-            date = datetime.now() - timedelta(days=days - i - 1)
-            daily_revenue.append({
-                "date": date.date().isoformat(),
-                "revenue": random.uniform(5000, 15000),
-                "transactions": random.randint(200, 600),
-                "avg_transaction": random.uniform(20, 50)
-            })
-        
-        total_revenue = sum(day["revenue"] for day in daily_revenue)
-        avg_daily = total_revenue / days
-        
-        return {
-            "summary": {
-                "total_revenue": total_revenue,
-                "avg_daily_revenue": avg_daily,
-                "total_transactions": sum(day["transactions"] for day in daily_revenue),
-                "growth_rate": random.uniform(-5, 15)
-            },
-            "daily_breakdown": daily_revenue,
-            "period": {
-                "days": days,
-                "from": (datetime.now() - timedelta(days=days)).isoformat(),
-                "to": datetime.now().isoformat()
-            },
-            "generated_at": datetime.now()
-        }
+        return await asyncio.to_thread(kpi_engine.get_revenue, days)
         
     except Exception as e:
         logger.error(f"Error getting revenue analysis: {e}")
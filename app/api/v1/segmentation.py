@@ -1,17 +1,23 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
 from datetime import datetime
 from app.models.schemas import (
     UserSegmentationRequest,
     UserSegmentationResponse,
-    UserCluster
+    UserCluster,
+    UserAssignmentRequest,
+    SegmentationSweepRequest
 )
-from app.ml.dbscan_model import dbscan_segmentation
+from app.ml.dbscan_model import DBSCANUserSegmentation
+from app.services.segmentation_store import segmentation_store
+from app.core.config import settings
 from app.core.security import get_current_user
 import logging
+from app.core.responses import AppRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/users", tags=["User Segmentation"])
+router = APIRouter(prefix="/users", tags=["User Segmentation"], route_class=AppRoute)
 
 
 @router.post("/segment", response_model=UserSegmentationResponse)
@@ -23,18 +29,11 @@ async def segment_users(
     try:
         logger.info("Segmenting users with DBSCAN...")
         
-        # Generate synthetic user data
-        users_data = dbscan_segmentation.generate_synthetic_users(num_users=500)
-        
-        # Update DBSCAN parameters
-        dbscan_segmentation.eps = request.eps
-        dbscan_segmentation.min_samples = request.min_samples
-        
-        # Fit model
-        fit_result = dbscan_segmentation.fit(users_data)
-        
-        # Analyze clusters
-        clusters, outliers_info = dbscan_segmentation.analyze_clusters(users_data)
+        # Fitted once per (snapshot, eps, min_samples), then served from the store.
+        # A miss fits DBSCAN (and may load the snapshot), so it runs off the event loop
+        result = await asyncio.to_thread(
+            segmentation_store.get_or_fit, eps=request.eps, min_samples=request.min_samples
+        )
         
         # Format response
         cluster_objects = [
@@ -43,18 +42,19 @@ async def segment_users(
                 user_count=c['user_count'],
                 avg_frequency=c['avg_frequency'],
                 avg_spending=c['avg_spending'],
-                common_routes=[1, 2, 3],  # Mock data
-                peak_hours=[7, 8, 17, 18],  # Mock data
+                common_routes=c['common_routes'],
+                peak_hours=c['peak_hours'],
                 characteristics={"description": c['characteristics']}
             )
-            for c in clusters
+            for c in result['clusters']
         ]
         
         return UserSegmentationResponse(
             clusters=cluster_objects,
-            outliers_count=outliers_info['count'],
-            total_users=len(users_data),
-            silhouette_score=fit_result['silhouette_score'],
+            outliers_count=result['outliers']['count'],
+            total_users=result['total_users'],
+            silhouette_score=result['silhouette_score'],
+            data_source=result['data_source'],
             generated_at=datetime.now()
         )
         
@@ -63,6 +63,42 @@ async def segment_users(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/sweep")
+async def sweep_segmentation_parameters(
+    request: SegmentationSweepRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Evaluate a grid of DBSCAN parameters with one shared neighbour search"""
+    try:
+        logger.info(
+            f"Sweeping {len(request.eps_values)}x{len(request.min_samples_values)} DBSCAN parameters..."
+        )
+        
+        # CPU-bound grid: run it off the event loop, with a bounded process pool
+        snapshot = await asyncio.to_thread(segmentation_store.get_snapshot)
+        model = DBSCANUserSegmentation(
+            mode=settings.SEGMENTATION_MODE,
+            chunk_size=settings.SEGMENTATION_CHUNK_SIZE,
+            silhouette_sample_size=settings.SEGMENTATION_SILHOUETTE_SAMPLE_SIZE
+        )
+        sweep = await asyncio.to_thread(
+            model.sweep, snapshot['users'], request.eps_values, request.min_samples_values,
+            n_jobs=settings.SEGMENTATION_SWEEP_N_JOBS
+        )
+        
+        return {
+            **sweep,
+            "snapshot_id": snapshot['snapshot_id'],
+            "generated_at": datetime.now()
+        }
+        
+    except (ValueError, ImportError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error sweeping segmentation parameters: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/clusters")
 async def get_clusters(
     current_user: dict = Depends(get_current_user)
@@ -71,15 +107,14 @@ async def get_clusters(
     try:
         logger.info("Getting user clusters...")
         
-        # Generate and analyze
-        users_data = dbscan_segmentation.generate_synthetic_users(num_users=500)
-        dbscan_segmentation.fit(users_data)
-        clusters, outliers_info = dbscan_segmentation.analyze_clusters(users_data)
+        result = await asyncio.to_thread(segmentation_store.get_or_fit)
         
         return {
-            "clusters": clusters,
-            "outliers": outliers_info,
-            "generated_at": datetime.now()
+            "clusters": result['clusters'],
+            "outliers": result['outliers'],
+            "data_source": result['data_source'],
+            "version": result['version'],
+            "generated_at": result['fitted_at']
         }
         
     except Exception as e:
@@ -96,20 +131,17 @@ async def get_outliers(
     try:
         logger.info(f"Getting top {limit} outliers...")
         
-        # Generate and analyze
-        users_data = dbscan_segmentation.generate_synthetic_users(num_users=500)
-        dbscan_segmentation.fit(users_data)
+        result = await asyncio.to_thread(segmentation_store.get_or_fit)
         
         # Get outliers
-        users_data['cluster'] = dbscan_segmentation.labels
-        outliers = users_data[users_data['cluster'] == -1].head(limit)
+        outliers = segmentation_store.get_outliers(result, limit=limit)
         
         outliers_list = [
             {
                 "user_id": int(row['user_id']),
-                "usage_frequency": float(row['usage_frequency']),
-                "avg_spending": float(row['avg_spending']),
-                "route_diversity": float(row['route_diversity']),
+                "usage_frequency": row['usage_frequency'],
+                "avg_spending": row['avg_spending'],
+                "route_diversity": row['route_diversity'],
                 "reason": "Comportamiento atípico detectado por DBSCAN"
             }
             for _, row in outliers.iterrows()
@@ -117,8 +149,8 @@ async def get_outliers(
         
         return {
             "outliers": outliers_list,
-            "total_outliers": len(users_data[users_data['cluster'] == -1]),
-            "generated_at": datetime.now()
+            "total_outliers": result['n_outliers'],
+            "generated_at": result['fitted_at']
         }
         
     except Exception as e:
@@ -126,6 +158,35 @@ async def get_outliers(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/assign")
+async def assign_users(
+    request: UserAssignmentRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Assign new users to existing clusters without refitting"""
+    try:
+        logger.info(f"Assigning {len(request.users)} users to clusters...")
+        
+        result = await asyncio.to_thread(segmentation_store.get_or_fit)
+        model = result['model']
+        
+        features = [[getattr(user, name) for name in model.FEATURES] for user in request.users]
+        labels = model.assign_many(features)
+        
+        return {
+            "assignments": [
+                {"user_id": user.user_id, "cluster_id": label}
+                for user, label in zip(request.users, labels)
+            ],
+            "version": result['version'],
+            "generated_at": datetime.now()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error assigning users: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/profile/{user_id}")
 async def get_user_profile(
     user_id: int,
@@ -135,26 +196,21 @@ async def get_user_profile(
     try:
         logger.info(f"Getting profile for user {user_id}...")
         
-        # Generate and analyze
-        users_data = dbscan_segmentation.generate_synthetic_users(num_users=500)
-        dbscan_segmentation.fit(users_data)
-        users_data['cluster'] = dbscan_segmentation.labels
+        result = await asyncio.to_thread(segmentation_store.get_or_fit)
         
         # Find user
-        user = users_data[users_data['user_id'] == user_id]
+        user_row = segmentation_store.get_user(result, user_id)
         
-        if len(user) == 0:
+        if user_row is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_row = user.iloc[0]
-        cluster_id = int(user_row['cluster'])
+        cluster_id = user_row['cluster']
         
         # Get cluster info
         if cluster_id != -1:
-            cluster_data = users_data[users_data['cluster'] == cluster_id]
             cluster_info = {
                 "cluster_id": cluster_id,
-                "cluster_size": len(cluster_data),
+                "cluster_size": (result['labels'] == cluster_id).sum(),
                 "description": "Usuario frecuente" if user_row['usage_frequency'] > 15 else "Usuario ocasional"
             }
         else:
@@ -167,11 +223,11 @@ async def get_user_profile(
             "user_id": user_id,
             "cluster": cluster_info,
             "features": {
-                "usage_frequency": float(user_row['usage_frequency']),
-                "avg_spending": float(user_row['avg_spending']),
-                "route_diversity": float(user_row['route_diversity']),
-                "peak_hour_ratio": float(user_row['peak_hour_usage_ratio']),
-                "weekend_ratio": float(user_row['weekend_usage_ratio'])
+                "usage_frequency": user_row['usage_frequency'],
+                "avg_spending": user_row['avg_spending'],
+                "route_diversity": user_row['route_diversity'],
+                "peak_hour_ratio": user_row['peak_hour_usage_ratio'],
+                "weekend_ratio": user_row['weekend_usage_ratio']
             },
             "generated_at": datetime.now()
         }
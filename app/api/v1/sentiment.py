@@ -11,10 +11,11 @@ import logging
 import random
 from app.db.redis_cache import redis_conn
 from app.core.config import settings
+from app.core.responses import AppRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/sentiment", tags=["Sentiment Analysis"])
+router = APIRouter(prefix="/sentiment", tags=["Sentiment Analysis"], route_class=AppRoute)
 
 
 @router.post("/analyze", response_model=SentimentAnalysisResponse)
@@ -5,51 +5,42 @@ Endpoint temporal para probar predicciones realistas
 from fastapi import APIRouter, Depends
 from app.core.security import get_current_user
 from datetime import datetime
+from typing import Optional
 import numpy as np
+from app.ml.demand_baseline import demand_baseline
+from app.core.responses import AppRoute
 
-router = APIRouter(prefix="/testing", tags=["Testing"])
+router = APIRouter(prefix="/testing", tags=["Testing"], route_class=AppRoute)
 
 
 @router.post("/realistic-demand")
 async def get_realistic_demand(
     hours_ahead: int = 24,
+    route_id: int = 1,
+    seed: Optional[int] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get REAL realistic demand predictions with peak hours"""
     
-    predictions = []
-    start_hour = datetime.now().hour
+    start = datetime.now()
+    demand = demand_baseline.forecast([route_id], hours_ahead, start=start, seed=seed)[route_id]
+    hours = (start.hour + np.arange(1, hours_ahead + 1)) % 24
+    peak = demand_baseline.is_peak(hours)
     
-    for i in range(hours_ahead):
-        hour = (start_hour + i + 1) % 24
-        
-        # Realistic demand patterns
-        if hour in [7, 8]:  # Morning peak
-            base_demand = 180 + np.random.uniform(-15, 20)
-        elif hour in [17, 18, 19]:  # Evening peak
-            base_demand = 195 + np.random.uniform(-18, 25)
-        elif hour in [9, 10, 11, 12]:  # Late morning
-            base_demand = 95 + np.random.uniform(-10, 15)
-        elif hour in [13, 14, 15, 16]:  # Afternoon
-            base_demand = 105 + np.random.uniform(-12, 18)
-        elif hour in [20, 21, 22]:  # Evening
-            base_demand = 65 + np.random.uniform(-8, 12)
-        elif hour in [23, 0, 1, 2, 3, 4, 5]:  # Night
-            base_demand = 25 + np.random.uniform(-5, 8)
-        else:  # Early morning
-            base_demand = 55 + np.random.uniform(-8, 12)
-        
-        predictions.append({
+    predictions = [
+        {
             "hour": hour,
-            "predicted_demand": max(10, base_demand),
+            "predicted_demand": value,
             "confidence": 0.87,
-            "period": "peak" if hour in [7, 8, 17, 18, 19] else "normal"
-        })
+            "period": "peak" if is_peak else "normal"
+        }
+        for hour, value, is_peak in zip(hours, demand, peak)
+    ]
     
     return {
-        "route_id": 1,
+        "route_id": route_id,
         "predictions": predictions,
         "confidence_score": 0.87,
-        "model_version": "realistic-1.0",
+        "model_version": demand_baseline.version,
         "generated_at": datetime.now()
     }
@@ -0,0 +1,143 @@
+import importlib.util
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Optional brotli, preferred over gzip when the client accepts it
+HAS_BROTLI = importlib.util.find_spec('brotli') is not None
+
+# Already compressed (or pointless to compress) bodies pass through untouched
+SKIP_CONTENT_TYPES = (
+    'application/gzip', 'application/zip', 'application/vnd.apache.parquet',
+    'application/vnd.apache.arrow', 'image/', 'audio/', 'video/',
+)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compressed bytes for one streamed chunk, flushed so the client can use them"""
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        import brotli
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def choose_encoding(accept_encoding: str, brotli: bool = HAS_BROTLI) -> Optional[str]:
+    """br if available and accepted, then gzip; None when neither is acceptable"""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q=') and quality[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        accepted.add(name.strip())
+    if brotli and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+class CompressionMiddleware:
+    """
+    gzip / Brotli response compression above a size threshold (small JSON
+    is not worth the CPU). Streamed responses are compressed chunk by
+    chunk and flushed, so exports still stream. Bodies that already carry
+    a Content-Encoding or a compressed content type are left alone.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http':
+            encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+            if encoding is not None:
+                await _CompressionResponder(self, encoding)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+    def compressor(self, encoding: str):
+        if encoding == 'br':
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send: Send = None
+        self.start_message: Message = {}
+        self.compressor = None
+        self.passthrough = False
+        self.started = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            # Held back until the first body chunk tells us whether to compress
+            self.start_message = message
+            headers = Headers(raw=message['headers'])
+            content_type = headers.get('content-type', '')
+            self.passthrough = (
+                'content-encoding' in headers
+                or any(content_type.startswith(skip) for skip in SKIP_CONTENT_TYPES)
+            )
+            return
+
+        if message['type'] != 'http.response.body':
+            await self.send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if not self.started:
+            self.started = True
+            if self.passthrough or (len(body) < self.middleware.minimum_size and not more_body):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = self.middleware.compressor(self.encoding)
+            headers = MutableHeaders(raw=self.start_message['headers'])
+            headers['Content-Encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+            if more_body:
+                del headers['Content-Length']
+                message['body'] = self.compressor.chunk(body)
+            else:
+                message['body'] = self.compressor.finish(body)
+                headers['Content-Length'] = str(len(message['body']))
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        if not self.passthrough:
+            message['body'] = self.compressor.chunk(body) if more_body else self.compressor.finish(body)
+        await self.send(message)
@@ -41,8 +41,68 @@ class Settings(BaseSettings):
     # ML Models
     MODEL_PATH: str = "./models"
     LSTM_MODEL_PATH: str = "./models/lstm_demand_prediction.h5"
+    LSTM_TRAINING_MEMMAP_PATH: str = "./models/lstm_training_matrix.f32"  # streaming training matrix (raw float32)
+    DEMAND_MODEL: str = "gbm"
+    DEMAND_MODEL_FILE: str = "./models/demand_production.pkl"
+    DEMAND_RUNTIME_PATH: str = "./models/lstm_demand_prediction.tflite"  # .tflite | .onnx
     BERT_MODEL_PATH: str = "./models/bert_sentiment_analysis"
-    
+    DBSCAN_MODEL_PATH: str = "./models/dbscan_segmentation"  # .npy arrays + manifest.json
+    TRAINING_JOBS_PATH: str = "./models/jobs"
+
+    # Model Registry
+    MODEL_REGISTRY_PATH: str = "./models/registry"
+    MODEL_REGISTRY_POLL_SECONDS: int = 30
+    MODEL_REGISTRY_MONGO_MIRROR: bool = False  # also record versions in Mongo ml_models
+
+    # Startup
+    STARTUP_LOAD_WORKERS: int = 4  # components loaded in parallel after boot
+    STARTUP_REQUIRED_COMPONENTS: list = []  # must load successfully for /ready (others may fall back)
+    TORCH_NUM_THREADS: int = 0  # torch threads per worker process (0: cores / workers)
+
+    # User Segmentation
+    SEGMENTATION_STORE_PATH: str = "./models/segmentation"
+    SEGMENTATION_STORE_MAX_ENTRIES: int = 16
+    SEGMENTATION_USE_FEATURE_STORE: bool = False  # enable after scripts/setup_user_feature_store.py
+    SEGMENTATION_MIN_TRANSACTIONS: int = 3
+    SEGMENTATION_SNAPSHOT_USERS: int = 500
+    SEGMENTATION_SNAPSHOT_SEED: int = 42
+    SEGMENTATION_EPS: float = 0.5
+    SEGMENTATION_MIN_SAMPLES: int = 5
+    SEGMENTATION_MODE: str = "exact"  # exact | scalable | hdbscan
+    SEGMENTATION_CHUNK_SIZE: int = 20000
+    SEGMENTATION_SILHOUETTE_SAMPLE_SIZE: int = 10000
+    SEGMENTATION_SWEEP_N_JOBS: int = 2  # sweep processes per API request; the script can use every core
+    SEGMENTATION_DRIFT_MIN_USERS: int = 50
+    SEGMENTATION_DRIFT_MAX_NOISE_INCREASE: float = 0.15
+    SEGMENTATION_DRIFT_MAX_CLUSTER_SHIFT: float = 0.25
+
+    # Forecast materialization
+    FORECAST_HORIZON_HOURS: int = 48
+    FORECAST_REFRESH_MINUTES: int = 60
+    FORECAST_CACHE_TTL: int = 3 * 3600  # outlives a few missed refreshes
+    FORECAST_ACTIVE_ROUTE_DAYS: int = 7
+    FORECAST_FALLBACK_ROUTES: list = list(range(1, 11))
+
+    # KPIs
+    KPI_BUCKET_MINUTES: int = 5  # windows end on bucket boundaries; one computation per bucket
+    KPI_ROUTE_HOURLY_CAPACITY: int = 200  # boardings per route-hour counted as full occupancy
+    KPI_ALERT_GROWTH_PCT: float = 30.0  # route demand jump that raises a dashboard alert
+    DASHBOARD_FRAGMENT_TIMEOUT_SECONDS: float = 3.0  # per fragment; a slow source leaves its section empty
+
+    # Reports
+    REPORT_QUEUE_BACKEND: str = "redis"  # redis | local (in-process, single worker only)
+    REPORT_STORAGE_BACKEND: str = "local"  # local | gridfs
+    REPORT_STORAGE_PATH: str = "./reports"
+    REPORT_WORKERS: int = 2  # worker threads per API process (0: only scripts/run_report_workers.py)
+    REPORT_BATCH_ROWS: int = 10000  # rows per ClickHouse block streamed through the stages
+    REPORT_RETENTION_HOURS: int = 24  # job status and report files are dropped after this
+
+    # Response compression (gzip, or br when brotli is installed)
+    RESPONSE_COMPRESSION: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1000  # bytes; smaller bodies are sent as is
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11; higher costs much more CPU per response
+
     # Cache
     CACHE_TTL: int = 3600
     
@@ -0,0 +1,71 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+from app.core.responses import AppJSONResponse
+
+
+def make_etag(*version) -> str:
+    """
+    Weak ETag from whatever identifies the version of a cached payload
+    (cache key parts, generated_at, data window), not from the payload
+    itself, so checking it never serializes the body. Weak because the
+    compression middleware may re-encode the bytes of the same payload.
+    """
+    digest = hashlib.sha1(json.dumps(version, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def http_date(value: datetime) -> str:
+    """RFC 7231 date; naive datetimes are taken as server local time"""
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """If-None-Match wins over If-Modified-Since, as in RFC 7232"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        opaque = etag[2:] if etag.startswith('W/') else etag
+        return any(
+            (tag[2:] if tag.startswith('W/') else tag) == opaque
+            for tag in (part.strip() for part in if_none_match.split(','))
+        )
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+    return False
+
+
+def conditional_response(request: Request, content: Any, etag: Optional[str],
+                         last_modified: Optional[datetime] = None) -> Response:
+    """
+    200 with the payload, or an empty 304 when the client already has this
+    version. Polling clients revalidate on every request (no-cache) but
+    only download the body when it changed.
+    etag=None marks a degraded payload (a source failed or timed out): it
+    goes out without validators and must not be stored, so a client can
+    neither keep it as a good version nor revalidate a good one against it.
+    """
+    if etag is None:
+        return AppJSONResponse(content, headers={'Cache-Control': 'no-store'})
+
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return AppJSONResponse(content, headers=headers)
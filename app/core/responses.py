@@ -0,0 +1,82 @@
+import asyncio
+import functools
+from decimal import Decimal
+from typing import Any, Callable
+
+import numpy as np
+import orjson
+from fastapi.dependencies.utils import get_typed_return_annotation
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+def _default(value: Any) -> Any:
+    """Types orjson does not serialize natively"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()  # non-contiguous or unsupported dtype
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class AppJSONResponse(ORJSONResponse):
+    """
+    Default response class: orjson with numpy scalars and arrays, datetimes,
+    pydantic models and non-string keys handled while rendering. NaN and
+    infinity become null instead of failing the response.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+
+
+def _render_directly(endpoint: Callable, status_code: int = None) -> Callable:
+    """Wrap an endpoint so its return value becomes an AppJSONResponse as is"""
+
+    def to_response(content: Any) -> Any:
+        if isinstance(content, Response):
+            return content
+        return AppJSONResponse(content, status_code=status_code or 200)
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            return to_response(await endpoint(*args, **kwargs))
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return to_response(endpoint(*args, **kwargs))
+
+    wrapper.renders_directly = True
+    return wrapper
+
+
+class AppRoute(APIRoute):
+    """
+    FastAPI runs the return value of routes without a response_model
+    through jsonable_encoder before the response class sees it: a full
+    Python-level copy of the payload that also rejects numpy integers.
+    These routes hand their payload straight to AppJSONResponse instead.
+    Routes with a response_model keep FastAPI's validation and pydantic
+    serialization.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        response_model = kwargs.get('response_model')
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = get_typed_return_annotation(endpoint)
+        if response_model is None and not getattr(endpoint, 'renders_directly', False):
+            endpoint = _render_directly(endpoint, kwargs.get('status_code'))
+        super().__init__(path, endpoint, **kwargs)
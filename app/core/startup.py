@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StartupOrchestrator:
+    """
+    Loads connections and models in the background after the server binds.
+    Components run in a thread pool as soon as their dependencies settle,
+    so slow loaders (BERT, profile rollups) overlap instead of adding up.
+    The API answers /health right away; /ready reports per-component state
+    and only turns green once loading is done and required components
+    succeeded. Optional components that fail leave their fallback in place.
+    """
+
+    PENDING = 'pending'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, max_workers: int = None, required: Iterable[str] = None):
+        self.max_workers = max_workers or settings.STARTUP_LOAD_WORKERS
+        self.required = set(settings.STARTUP_REQUIRED_COMPONENTS if required is None else required)
+        self._components: Dict[str, Dict[str, Any]] = {}
+        self._settled: Dict[str, threading.Event] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, loader: Callable[[], Any], depends_on: Iterable[str] = (),
+            required: bool = False, preload: bool = False):
+        """
+        Register a component; loader() raising marks it failed.
+        Dependencies must be added first: the pool starts components in
+        registration order, so a component never waits on one queued behind it.
+        preload marks components that are safe to load before forking
+        workers (no sockets, no background threads).
+        """
+        missing = [dep for dep in depends_on if dep not in self._components]
+        if missing:
+            raise ValueError(f"Unknown startup dependencies for {name}: {missing}")
+        if preload and any(not self._components[dep]['preload'] for dep in depends_on):
+            raise ValueError(f"Preloaded component {name} cannot depend on per-worker components")
+        self._components[name] = {
+            'loader': loader,
+            'depends_on': list(depends_on),
+            'preload': preload,
+            'status': self.PENDING,
+            'error': None,
+            'duration_ms': None,
+        }
+        self._settled[name] = threading.Event()
+        if required:
+            self.required.add(name)
+
+    def has_components(self) -> bool:
+        return bool(self._components)
+
+    def preload(self) -> Dict[str, str]:
+        """
+        Load the preload components and block until they settle. Called in
+        the gunicorn master so forked workers share the weights copy-on-write.
+        The pool is shut down before returning: no threads survive the fork.
+        """
+        names = [name for name, component in self._components.items()
+                 if component['preload'] and not self._settled[name].is_set()]
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='preload') as executor:
+            for future in [executor.submit(self._load, name) for name in names]:
+                future.result()
+
+        logger.info(f"✅ Preloaded {len(names)} components in {time.perf_counter() - started_at:.2f}s")
+        return {name: self.get_status(name) for name in names}
+
+    def start(self) -> 'StartupOrchestrator':
+        """Start loading every component not loaded yet; returns immediately"""
+        if self.is_started():
+            return self
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='startup')
+        started_at = time.perf_counter()
+        futures = [
+            self._executor.submit(self._load, name)
+            for name in self._components if not self._settled[name].is_set()
+        ]
+
+        def finish():
+            for future in futures:
+                future.result()
+            self._executor.shutdown(wait=False)
+            self._done.set()
+            failed = [name for name, component in self._components.items() if component['status'] == self.FAILED]
+            logger.info(f"✅ Startup loading finished in {time.perf_counter() - started_at:.2f}s"
+                        + (f" ({', '.join(failed)} using fallbacks)" if failed else ""))
+
+        threading.Thread(target=finish, name='startup-wait', daemon=True).start()
+        return self
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every component settled (used when preloading before fork)"""
+        return self._done.wait(timeout)
+
+    def is_started(self) -> bool:
+        return self._executor is not None
+
+    def is_done(self) -> bool:
+        return self._done.is_set()
+
+    def is_ready(self, components: Iterable[str] = None) -> bool:
+        """
+        Without arguments: loading finished and every required component is
+        ready. With names: those components are ready (others may still load).
+        """
+        if components is not None:
+            return all(self.get_status(name) == self.READY for name in components)
+        return self.is_done() and all(self.get_status(name) == self.READY for name in self.required)
+
+    def get_status(self, name: str) -> Optional[str]:
+        component = self._components.get(name)
+        return component['status'] if component else None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            components = {
+                name: {
+                    'status': component['status'],
+                    'required': name in self.required,
+                    # Loaded by the gunicorn master and shared with this worker
+                    'preloaded': component.get('pid') not in (None, os.getpid()),
+                    'duration_ms': component['duration_ms'],
+                    'error': component['error'],
+                }
+                for name, component in self._components.items()
+            }
+        return {
+            'ready': self.is_ready(),
+            'loading_done': self.is_done(),
+            'components': components,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def unknown(self, names: Iterable[str]) -> List[str]:
+        return [name for name in names if name not in self._components]
+
+    def _load(self, name: str):
+        component = self._components[name]
+        try:
+            for dep in component['depends_on']:
+                # Dependencies run on other pool threads; a dependency may
+                # fail, this component still tries (every loader falls back)
+                self._settled[dep].wait()
+
+            self._set(name, status=self.LOADING, pid=os.getpid())
+            started = time.perf_counter()
+            try:
+                component['loader']()
+            except Exception as e:
+                self._set(name, status=self.FAILED, error=str(e),
+                          duration_ms=round((time.perf_counter() - started) * 1000, 1))
+                level = logging.ERROR if name in self.required else logging.WARNING
+                logger.log(level, f"⚠️ {name} failed to load: {e}")
+                return
+
+            self._set(name, status=self.READY, duration_ms=round((time.perf_counter() - started) * 1000, 1))
+            logger.info(f"✅ {name} ready in {component['duration_ms']:.0f} ms")
+        finally:
+            self._settled[name].set()
+
+    def _set(self, name: str, **fields):
+        with self._lock:
+            self._components[name].update(fields)
+
+
+# Global instance
+startup_orchestrator = StartupOrchestrator()
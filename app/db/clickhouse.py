@@ -1,42 +1,78 @@
 from clickhouse_driver import Client
 from app.core.config import settings
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 
 class ClickHouseConnection:
-    """ClickHouse database connection"""
+    """
+    ClickHouse database connection.
+    A driver Client is a single connection that cannot run two queries at
+    once, so each thread (request thread pool, dashboard fragments, report
+    workers) gets its own client the first time it queries.
+    """
     
     def __init__(self):
-        self.client = None
+        self._local = threading.local()
+        self._clients = []
+        self._lock = threading.Lock()
+    
+    @property
+    def client(self):
+        return getattr(self._local, 'client', None)
     
     def connect(self):
-        """Connect to ClickHouse"""
+        """Connect to ClickHouse (for the calling thread)"""
         try:
-            self.client = Client(
-                host=settings.CLICKHOUSE_HOST,
-                port=settings.CLICKHOUSE_PORT,
-                user=settings.CLICKHOUSE_USER,
-                password=settings.CLICKHOUSE_PASSWORD,
-                database=settings.CLICKHOUSE_DATABASE
-            )
-            logger.info("✅ Connected to ClickHouse")
-            return self.client
+            client = self._new_client()
+            self._local.client = client
+            with self._lock:
+                self._clients.append(client)
+                first = len(self._clients) == 1
+            logger.log(logging.INFO if first else logging.DEBUG, "✅ Connected to ClickHouse")
+            return client
         except Exception as e:
             logger.error(f"❌ Error connecting to ClickHouse: {e}")
             raise
     
-    def execute(self, query: str, params: dict = None):
-        """Execute query"""
+    def execute(self, query: str, params: dict = None, **kwargs):
+        """Execute query (extra kwargs such as columnar go to the driver)"""
         if not self.client:
             self.connect()
-        return self.client.execute(query, params or {})
+        return self.client.execute(query, params or {}, **kwargs)
+    
+    def execute_iter(self, query: str, params: dict = None, **kwargs):
+        """
+        Stream result rows block by block instead of loading them all.
+        The stream holds its connection until it is exhausted or closed, and
+        may be consumed from several threads (StreamingResponse), so it gets
+        a dedicated client instead of the calling thread's one.
+        """
+        client = self._new_client()
+        try:
+            yield from client.execute_iter(query, params or {}, **kwargs)
+        finally:
+            client.disconnect()
+    
+    def _new_client(self) -> Client:
+        return Client(
+            host=settings.CLICKHOUSE_HOST,
+            port=settings.CLICKHOUSE_PORT,
+            user=settings.CLICKHOUSE_USER,
+            password=settings.CLICKHOUSE_PASSWORD,
+            database=settings.CLICKHOUSE_DATABASE
+        )
     
     def disconnect(self):
-        """Disconnect from ClickHouse"""
-        if self.client:
-            self.client.disconnect()
+        """Disconnect every thread's client from ClickHouse"""
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.disconnect()
+        # Threads that still hold a closed client reconnect on their next query
+        if clients:
             logger.info("Disconnected from ClickHouse")
 
 
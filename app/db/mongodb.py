@@ -29,7 +29,7 @@ class MongoDBConnection:
     
     def get_collection(self, collection_name: str):
         """Get MongoDB collection"""
-        if not self.db:
+        if self.db is None:
             self.connect()
         return self.db[collection_name]
     
@@ -1,13 +1,14 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 import logging
 import sys
 from datetime import datetime
-import os
-import pickle
+from typing import Optional
 
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.responses import AppJSONResponse, AppRoute
+from app.core.startup import StartupOrchestrator, startup_orchestrator
 from app.api.v1 import demand, segmentation, sentiment, reports, metrics, testing
 from app.db.clickhouse import clickhouse_conn
 from app.db.mongodb import mongodb_conn
@@ -30,8 +31,11 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="Analytics & Reporting Service para CityTransit con ML/DL",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=AppJSONResponse
 )
+# App-level routes render through orjson too (see app/core/responses.py)
+app.router.route_class = AppRoute
 
 # Configure CORS
 app.add_middleware(
@@ -42,6 +46,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/br above a size threshold; exports already compressed pass through
+if settings.RESPONSE_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
 
 # Health check endpoint
 @app.get("/health")
@@ -56,12 +69,26 @@ async def health_check():
     }
 
 
+# Readiness endpoint (per-model with ?models=demand_lstm,bert_sentiment)
+@app.get("/ready")
+@app.get("/api/v1/ready")
+async def readiness_check(models: Optional[str] = None):
+    """Readiness check endpoint: 503 until models finished loading"""
+    names = [name.strip() for name in models.split(',') if name.strip()] if models else None
+    status = startup_orchestrator.status()
+    status['ready'] = startup_orchestrator.is_ready(names)
+    if names:
+        status['requested'] = names
+        status['unknown'] = startup_orchestrator.unknown(names)
+    return AppJSONResponse(status_code=200 if status['ready'] else 503, content=status)
+
+
 # Exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
     logger.error(f"Global exception: {exc}")
-    return JSONResponse(
+    return AppJSONResponse(
         status_code=500,
         content={
             "detail": str(exc),
@@ -70,6 +97,76 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+def register_startup_components(orchestrator: StartupOrchestrator):
+    """Connections and ML models (optional - service works without them)"""
+    
+    def load_demand_baseline():
+        from app.ml.demand_baseline import demand_baseline
+        from app.services.demand_service import demand_service
+        if not demand_baseline.load_profiles(demand_service.get_hourly_profile()):
+            raise RuntimeError("No hourly rollup available, using static profile")
+    
+    def load_demand_gbm():
+        from app.ml.demand_models import demand_model_registry
+        if demand_model_registry.load() is None:
+            raise FileNotFoundError(f"{settings.DEMAND_MODEL_FILE} not found, using baseline predictions")
+    
+    def load_demand_lstm():
+        # Served from its TFLite/ONNX export; TensorFlow is only imported by the trainer
+        from app.ml.demand_runtime import demand_runtime
+        if not demand_runtime.load():
+            raise FileNotFoundError(f"{settings.DEMAND_RUNTIME_PATH} not found, using fallback predictions")
+    
+    def load_bert():
+        from app.ml.bert_model import bert_analyzer
+        if bert_analyzer.load_model() is None:
+            raise RuntimeError("BERT pipeline unavailable, using rule-based sentiment analysis")
+    
+    def load_model_registry():
+        # Serve the active registry versions
+        from app.ml.model_registry import model_registry, register_serving_loaders
+        register_serving_loaders(model_registry)
+        model_registry.poll()
+    
+    def start_model_registry_polling():
+        # Hot-reload new versions (per worker: threads do not survive fork)
+        from app.ml.model_registry import model_registry
+        model_registry.start_polling()
+    
+    orchestrator.add('clickhouse', clickhouse_conn.connect)
+    orchestrator.add('mongodb', mongodb_conn.connect)
+    orchestrator.add('redis', redis_conn.connect)
+    orchestrator.add('demand_baseline', load_demand_baseline, depends_on=['clickhouse'])
+    # Models hold no sockets or threads, so gunicorn can load them once
+    # before forking and share the weights (see gunicorn_conf.py)
+    orchestrator.add('demand_gbm', load_demand_gbm, preload=True)
+    orchestrator.add('demand_lstm', load_demand_lstm, preload=True)
+    orchestrator.add('bert_sentiment', load_bert, preload=True)
+    # Registry versions override the fixed-path models, so load them last
+    orchestrator.add('model_registry', load_model_registry, preload=True,
+                     depends_on=['demand_gbm', 'demand_lstm', 'bert_sentiment'])
+    orchestrator.add('model_registry_polling', start_model_registry_polling, depends_on=['model_registry'])
+
+
+def preload_models():
+    """Load fork-safe models in the gunicorn master (preload_app)"""
+    if not startup_orchestrator.has_components():
+        register_startup_components(startup_orchestrator)
+    return startup_orchestrator.preload()
+
+
+def init_worker(torch_threads: int = None):
+    """Per-process setup right after a gunicorn worker is forked"""
+    from app.ml.bert_model import set_torch_threads
+    from app.ml.demand_runtime import demand_runtime
+    
+    set_torch_threads(torch_threads)
+    # TFLite/ONNX sessions own native thread pools that do not survive
+    # fork; the demand model is small, so each worker rebuilds its own
+    if demand_runtime.is_loaded:
+        demand_runtime.load(demand_runtime.model_path)
+
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
@@ -78,70 +175,18 @@ async def startup_event():
     logger.info(f"🚀 Starting {settings.APP_NAME} v{settings.APP_VERSION}")
     logger.info("=" * 50)
     
-    try:
-        # Connect to databases
-        logger.info("📡 Connecting to databases...")
-        
-        try:
-            clickhouse_conn.connect()
-        except Exception as e:
-            logger.warning(f"⚠️ ClickHouse connection failed: {e}")
-        
-        try:
-            mongodb_conn.connect()
-        except Exception as e:
-            logger.warning(f"⚠️ MongoDB connection failed: {e}")
-        
-        try:
-            redis_conn.connect()
-        except Exception as e:
-            logger.warning(f"⚠️ Redis connection failed: {e}")
-        
-        logger.info("✅ Database connections initialized")
-        
-        # Load ML models (optional - service works without them)
-        logger.info("🤖 Loading ML models (optional)...")
-        
-        try:
-            from app.ml.lstm_model import lstm_predictor
-            lstm_predictor.load_or_create_model()
-            logger.info("✅ LSTM model loaded")
-        except ImportError as e:
-            logger.warning(f"⚠️ LSTM module not available: {e}. Install tensorflow to enable.")
-        except Exception as e:
-            logger.warning(f"⚠️ LSTM model load failed: {e}. Will use fallback predictions.")
-        
-        try:
-            from app.ml.bert_model import bert_analyzer
-            bert_analyzer.load_model()
-            logger.info("✅ BERT model loaded")
-        except ImportError as e:
-            logger.warning(f"⚠️ BERT module not available: {e}. Install transformers to enable.")
-        except Exception as e:
-            logger.warning(f"⚠️ BERT model load failed: {e}. Will use fallback sentiment analysis.")
-
-        # Load DBSCAN model if persisted (optional)
-        try:
-            dbscan_path = os.path.join(settings.MODEL_PATH, 'dbscan_segmentation.pkl')
-            if os.path.exists(dbscan_path):
-                from app.ml import dbscan_model as dbscan_module
-                with open(dbscan_path, 'rb') as f:
-                    loaded = pickle.load(f)
-                    dbscan_module.dbscan_segmentation = loaded
-                    logger.info(f"✅ DBSCAN model loaded from {dbscan_path}")
-            else:
-                logger.info("ℹ️  No persisted DBSCAN model found. Will create on demand.")
-        except Exception as e:
-            logger.warning(f"⚠️ DBSCAN model load failed: {e}. Will use fresh model.")
-        
-        logger.info("=" * 50)
-        logger.info("✅ Service ready!")
-        logger.info(f"📚 API Documentation: http://localhost:8000/docs")
-        logger.info("=" * 50)
-        
-    except Exception as e:
-        logger.error(f"❌ Startup error: {e}")
-        raise
+    # Connections and models load in parallel in the background; /health
+    # answers immediately and /ready reports when loading is done. Under
+    # gunicorn with preload_app the models are already loaded by the master.
+    if not startup_orchestrator.has_components():
+        register_startup_components(startup_orchestrator)
+    startup_orchestrator.start()
+    
+    from app.services.report_service import report_service
+    report_service.start_workers()
+    
+    logger.info(f"📚 API Documentation: http://localhost:8000/docs")
+    logger.info("⏳ Loading connections and ML models in the background (see /ready)")
 
 
 # Shutdown event
@@ -150,6 +195,16 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("🛑 Shutting down service...")
     
+    try:
+        from app.ml.model_registry import model_registry
+        from app.services.training_jobs import training_jobs
+        from app.services.report_service import report_service
+        model_registry.stop_polling()
+        training_jobs.shutdown()
+        report_service.stop_workers()
+    except Exception as e:
+        logger.error(f"Error stopping background jobs: {e}")
+    
     try:
         clickhouse_conn.disconnect()
         mongodb_conn.disconnect()
@@ -179,6 +234,7 @@ async def root():
         "endpoints": {
             "docs": "/docs",
             "health": "/health",
+            "ready": "/ready",
             "api": "/api/v1"
         }
     }
@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def save_arrays(path: str, arrays: Dict[str, np.ndarray], manifest: Dict[str, Any]):
+    """
+    Write a model artifact directory: one .npy file per array plus a JSON
+    manifest with the scalar parameters. The directory is built next to
+    the target and renamed into place, so readers never see a partial one.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = os.path.join(parent, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    os.makedirs(staging)
+
+    try:
+        files = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            files[name] = {'file': f"{name}.npy", 'dtype': str(array.dtype), 'shape': list(array.shape)}
+            np.save(os.path.join(staging, files[name]['file']), array, allow_pickle=False)
+
+        with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump({**manifest, 'arrays': files}, f, indent=2, default=_json_default)
+
+        previous = None
+        if os.path.exists(path):
+            previous = f"{staging}.old"
+            os.rename(path, previous)
+        os.rename(staging, path)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def load_arrays(path: str, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Read an artifact directory written by save_arrays(). Arrays are memory
+    mapped read-only by default: loading only maps the files, and every
+    process that loads the same artifact shares its pages in the OS cache.
+    Never unpickles anything.
+    """
+    with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    arrays = {
+        name: np.load(os.path.join(path, entry['file']), mmap_mode='r' if mmap else None, allow_pickle=False)
+        for name, entry in manifest.pop('arrays', {}).items()
+    }
+    return arrays, manifest
+
+
+def is_artifact(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST))
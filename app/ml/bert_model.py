@@ -1,19 +1,38 @@
 import logging
 from typing import Dict
 from app.core.config import settings
+import importlib.util
+import os
 import re
+import sys
 
-# Optional transformers import
-try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-    import torch
-    HAS_TRANSFORMERS = True
-except ImportError:
-    HAS_TRANSFORMERS = False
+# Optional transformers/torch, imported only when the model is loaded
+HAS_TRANSFORMERS = (importlib.util.find_spec('transformers') is not None
+                    and importlib.util.find_spec('torch') is not None)
 
 logger = logging.getLogger(__name__)
 
 
+def set_torch_threads(num_threads: int = None) -> bool:
+    """
+    Pin torch's thread pools for this process. With several workers on one
+    machine each one gets its share of the cores instead of all of them.
+    No-op until torch has been imported.
+    """
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return False
+
+    num_threads = num_threads or settings.TORCH_NUM_THREADS or os.cpu_count()
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first parallel op in this process
+        pass
+    return True
+
+
 class BERTSentimentAnalyzer:
     """BERT model for sentiment analysis"""
     
@@ -23,8 +42,8 @@ class BERTSentimentAnalyzer:
         self.pipeline = None
         self.model_name = "nlptown/bert-base-multilingual-uncased-sentiment"
         
-    def load_model(self):
-        """Load BERT model"""
+    def load_model(self, model_path: str = None):
+        """Load BERT model (hub name by default, or a saved pipeline directory)"""
         if not HAS_TRANSFORMERS:
             logger.warning("⚠️ Transformers library not available. Using rule-based sentiment.")
             self.pipeline = None
@@ -32,20 +51,26 @@ class BERTSentimentAnalyzer:
         
         try:
             logger.info("🤖 Loading BERT sentiment analysis model...")
+            import torch
+            from transformers import pipeline
+            set_torch_threads()
             
-            # Use sentiment-analysis pipeline with multilingual model
-            self.pipeline = pipeline(
+            # Use sentiment-analysis pipeline with multilingual model.
+            # Build it fully before replacing the served one
+            loaded = pipeline(
                 "sentiment-analysis",
-                model=self.model_name,
+                model=model_path or self.model_name,
                 device=0 if torch.cuda.is_available() else -1
             )
+            self.pipeline = loaded
             
             logger.info("✅ BERT model loaded successfully")
             return self.pipeline
         except Exception as e:
+            # A failed (re)load keeps serving the current pipeline, if any
             logger.error(f"❌ Error loading BERT model: {e}")
-            logger.info("⚠️ Using fallback rule-based sentiment analysis")
-            self.pipeline = None
+            if self.pipeline is None:
+                logger.info("⚠️ Using fallback rule-based sentiment analysis")
             return None
     
     def analyze(self, text: str) -> Dict:
@@ -1,10 +1,21 @@
 import numpy as np
 import pandas as pd
-from sklearn.cluster import DBSCAN
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import silhouette_score
+from app.ml.feature_matrix import to_feature_matrix, scale_in_place
 import logging
-from typing import List, Dict, Any
+import warnings
+from typing import List, Dict, Any, Optional, Mapping, Sequence, Union
+
+# scikit-learn, scipy and joblib are imported where they are used so that
+# importing this module (every API worker does) stays cheap.
+
+
+def has_hdbscan() -> bool:
+    """Optional HDBSCAN (scikit-learn >= 1.3)"""
+    try:
+        from sklearn.cluster import HDBSCAN  # noqa: F401
+        return True
+    except ImportError:
+        return False
 
 logger = logging.getLogger(__name__)
 
@@ -12,54 +23,98 @@ logger = logging.getLogger(__name__)
 class DBSCANUserSegmentation:
     """DBSCAN for user segmentation"""
     
-    def __init__(self, eps: float = 0.5, min_samples: int = 5):
+    # Features: frequency, avg_spending, route_diversity, peak_hour_usage, weekend_usage
+    FEATURES = [
+        'usage_frequency',
+        'avg_spending',
+        'route_diversity',
+        'peak_hour_usage_ratio',
+        'weekend_usage_ratio',
+        'total_transactions'
+    ]
+    
+    MODES = ('exact', 'scalable', 'hdbscan')
+    
+    # Bump when the saved array layout changes
+    ARTIFACT_FORMAT = 2
+    
+    def __init__(self, eps: float = 0.5, min_samples: int = 5, mode: str = 'exact',
+                 chunk_size: int = 20000, silhouette_sample_size: Optional[int] = 10000,
+                 random_state: Optional[int] = 42):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown segmentation mode '{mode}'. Expected one of {self.MODES}")
+        
         self.eps = eps
         self.min_samples = min_samples
-        self.scaler = StandardScaler()
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.silhouette_sample_size = silhouette_sample_size
+        self.random_state = random_state
+        self.scaler = None  # StandardScaler, created on first fit
         self.model = None
         self.labels = None
+        self.core_samples = None
+        self.core_labels = None
+        self.core_sample_indices = None
+        self.core_radii = None
+        self.core_index = None
         
-    def prepare_user_features(self, users_data: pd.DataFrame):
-        """Prepare user features for clustering"""
-        # Features: frequency, avg_spending, route_diversity, peak_hour_usage, weekend_usage
-        features = [
-            'usage_frequency',
-            'avg_spending',
-            'route_diversity',
-            'peak_hour_usage_ratio',
-            'weekend_usage_ratio',
-            'avg_trip_duration',
-            'total_transactions'
-        ]
+    def prepare_user_features(self, users_data: pd.DataFrame, dtype=np.float32,
+                              memmap_path: Optional[str] = None):
+        """
+        Prepare user features for clustering.
+        Builds a contiguous float32 matrix column by column (missing values
+        as 0) and scales it in place; memmap_path backs large extracts on disk.
+        """
+        features = list(self.FEATURES)
+        if self.scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            self.scaler = StandardScaler()
         
-        # Handle missing values
-        users_data = users_data.fillna(0)
+        X = to_feature_matrix(users_data, features, dtype=dtype, memmap_path=memmap_path)
+        scale_in_place(X, self.scaler)
         
-        # Scale features
-        scaled_features = self.scaler.fit_transform(users_data[features])
+        return X, features
+    
+    def build_radius_graph(self, X: np.ndarray, radius: float):
+        """
+        Build the sparse radius-neighbours distance graph in row chunks.
+        Only pairs within radius are stored, so memory scales with
+        neighbourhood density instead of n². Returns a scipy CSR matrix.
+        """
+        from scipy import sparse
+        from sklearn.neighbors import NearestNeighbors
         
-        return scaled_features, features
+        neighbors = NearestNeighbors(radius=radius, n_jobs=-1).fit(X)
+        chunk_size = self.chunk_size or len(X)
+        
+        blocks = []
+        for start in range(0, len(X), chunk_size):
+            block = neighbors.radius_neighbors_graph(X[start:start + chunk_size], mode='distance')
+            blocks.append(block.astype(np.float32))
+        
+        return sparse.vstack(blocks, format='csr')
     
-    def fit(self, users_data: pd.DataFrame):
+    def fit(self, users_data: pd.DataFrame, memmap_path: Optional[str] = None):
         """Fit DBSCAN model"""
-        logger.info("🤖 Fitting DBSCAN clustering model...")
+        logger.info(f"🤖 Fitting DBSCAN clustering model ({self.mode} mode)...")
         
-        X, feature_names = self.prepare_user_features(users_data)
+        X, feature_names = self.prepare_user_features(users_data, memmap_path=memmap_path)
         
-        # Fit DBSCAN
-        self.model = DBSCAN(eps=self.eps, min_samples=self.min_samples, n_jobs=-1)
-        self.labels = self.model.fit_predict(X)
+        if self.mode == 'exact':
+            from sklearn.cluster import DBSCAN
+            self.model = DBSCAN(eps=self.eps, min_samples=self.min_samples, n_jobs=-1)
+            self.labels = self.model.fit_predict(X)
+        else:
+            self.labels = self._fit_scalable(X)
+        self._build_core_index(X)
         
         # Calculate metrics
-        n_clusters = len(set(self.labels)) - (1 if -1 in self.labels else 0)
-        n_outliers = list(self.labels).count(-1)
+        n_outliers = int((self.labels == -1).sum())
+        n_clusters = int(len(np.unique(self.labels[self.labels != -1])))
         
         # Calculate silhouette score (excluding outliers)
-        mask = self.labels != -1
-        if n_clusters > 1 and mask.sum() > 0:
-            silhouette_avg = silhouette_score(X[mask], self.labels[mask])
-        else:
-            silhouette_avg = None
+        silhouette_avg = self.score_silhouette(X, self.labels)
         
         logger.info(f"✅ DBSCAN completed: {n_clusters} clusters, {n_outliers} outliers")
         if silhouette_avg:
@@ -72,72 +127,334 @@ class DBSCANUserSegmentation:
             'labels': self.labels
         }
     
-    def analyze_clusters(self, users_data: pd.DataFrame):
-        """Analyze cluster characteristics"""
+    def _fit_scalable(self, X: np.ndarray) -> np.ndarray:
+        """Fit on a chunked sparse neighbour graph, or with HDBSCAN"""
+        from sklearn.cluster import DBSCAN
+        from sklearn.exceptions import EfficiencyWarning
+        
+        if self.mode == 'hdbscan':
+            if not has_hdbscan():
+                raise ImportError("HDBSCAN requires scikit-learn >= 1.3")
+            from sklearn.cluster import HDBSCAN
+            self.model = HDBSCAN(min_cluster_size=max(self.min_samples, 2), min_samples=self.min_samples)
+            return self.model.fit_predict(X)
+        
+        graph = self.build_radius_graph(X, self.eps)
+        logger.info(f"📊 Radius graph: {graph.nnz} edges for {graph.shape[0]} users")
+        self.model = DBSCAN(eps=self.eps, min_samples=self.min_samples, metric='precomputed')
+        with warnings.catch_warnings():
+            # DBSCAN re-sorts the graph itself after adding the diagonal
+            warnings.simplefilter('ignore', EfficiencyWarning)
+            return self.model.fit_predict(graph)
+    
+    def score_silhouette(self, X: np.ndarray, labels: np.ndarray) -> Optional[float]:
+        """Silhouette score excluding outliers, on a random sample for large inputs"""
+        mask = labels != -1
+        n_points = int(mask.sum())
+        if n_points == 0 or len(np.unique(labels[mask])) < 2:
+            return None
+        
+        from sklearn.metrics import silhouette_score
+        
+        # silhouette_score is O(n²); sample so it stays bounded on the full rider base
+        sample_size = self.silhouette_sample_size
+        if sample_size and n_points > sample_size:
+            return float(silhouette_score(X[mask], labels[mask], sample_size=sample_size,
+                                          random_state=self.random_state))
+        return float(silhouette_score(X[mask], labels[mask]))
+    
+    def sweep(self, users_data: pd.DataFrame, eps_values: Sequence[float],
+              min_samples_values: Sequence[int], n_jobs: int = -1, k_distance_points: int = 100):
+        """
+        Evaluate a grid of (eps, min_samples) with a single neighbour search.
+        The radius graph is built once at the largest eps; DBSCAN on a
+        precomputed graph ignores edges beyond its own eps, so every grid
+        point reuses it (exact and scalable modes give the same labels).
+        In hdbscan mode eps is HDBSCAN's cluster_selection_epsilon and each
+        point is fitted on the feature matrix. Does not change this
+        instance's fitted state.
+        """
+        if not eps_values or not min_samples_values:
+            raise ValueError("eps_values and min_samples_values must not be empty")
+        if self.mode == 'hdbscan' and not has_hdbscan():
+            raise ImportError("HDBSCAN requires scikit-learn >= 1.3")
+        
+        from joblib import Parallel, delayed
+        from sklearn.neighbors import NearestNeighbors
+        from sklearn.preprocessing import StandardScaler
+        
+        # Own scaler: refitting self.scaler would shift later assign()/assign_many() results
+        X = to_feature_matrix(users_data, list(self.FEATURES))
+        scale_in_place(X, StandardScaler())
+        
+        # k-distance curve (k = largest min_samples, self included as DBSCAN does)
+        k = min(max(min_samples_values), len(X))
+        distances, _ = NearestNeighbors(n_neighbors=k, n_jobs=n_jobs).fit(X).kneighbors(X)
+        k_distances = np.sort(distances[:, -1])[::-1]
+        curve_idx = np.unique(np.linspace(0, len(k_distances) - 1, min(k_distance_points, len(k_distances))).astype(int))
+        
+        grid = [(float(eps), int(min_samples)) for eps in eps_values for min_samples in min_samples_values]
+        graph = None
+        if self.mode != 'hdbscan':
+            graph = self.build_radius_graph(X, max(eps_values))
+            logger.info(f"📊 Sweep graph: {graph.nnz} edges, {len(grid)} combinations")
+        
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(_evaluate_sweep_point)(
+                graph, X, eps, min_samples, self.silhouette_sample_size, self.random_state
+            )
+            for eps, min_samples in grid
+        )
+        
+        return {
+            'mode': self.mode,
+            'k': int(k),
+            'k_distance': [
+                {'rank': int(i), 'distance': float(k_distances[i])} for i in curve_idx
+            ],
+            'results': results,
+            'total_users': len(X)
+        }
+    
+    def _build_core_index(self, X: np.ndarray):
+        """
+        Index fitted core samples for nearest-neighbour cluster assignment,
+        each with the radius within which it captures new users.
+        """
+        from sklearn.neighbors import KDTree, NearestNeighbors
+        
+        if hasattr(self.model, 'core_sample_indices_'):
+            core_indices = self.model.core_sample_indices_
+            radii = np.full(len(core_indices), self.eps)
+        else:
+            # scikit-learn's HDBSCAN has no core samples and no predict: every
+            # clustered point anchors its cluster, with its core distance
+            # (distance to its min_samples-th neighbour, itself included) as
+            # radius instead of a global eps
+            core_indices = np.flatnonzero(self.labels != -1)
+            radii = np.empty(0)
+            if len(core_indices) > 0:
+                k = min(self.min_samples, len(X))
+                distances, _ = NearestNeighbors(n_neighbors=k).fit(X).kneighbors(X[core_indices])
+                radii = distances[:, -1]
+        self.core_sample_indices = np.asarray(core_indices, dtype=np.int64)
+        self.core_samples = X[core_indices]
+        self.core_labels = self.labels[core_indices]
+        self.core_radii = np.asarray(radii, dtype=np.float64)
+        self.core_index = KDTree(self.core_samples) if len(core_indices) > 0 else None
+    
+    def assign_many(self, users_data: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        Assign users to fitted clusters without refitting.
+        A user joins the cluster of its nearest core sample if that sample
+        lies within its radius, otherwise it is -1. The radius is eps for
+        DBSCAN (its border-point rule) and the core distance for HDBSCAN,
+        an approximation of HDBSCAN's mutual-reachability assignment.
+        """
+        if self.core_samples is None:
+            raise ValueError("Model must be fitted first")
+        
+        if isinstance(users_data, pd.DataFrame):
+            X = to_feature_matrix(users_data, self.FEATURES)
+        else:
+            X = np.array(np.atleast_2d(users_data), dtype=np.float32)
+        X = scale_in_place(X, self.scaler, fit=False)
+        
+        if self.core_index is None:
+            return np.full(len(X), -1, dtype=int)
+        
+        distances, indices = self.core_index.query(X, k=1)
+        return np.where(
+            distances[:, 0] <= self.core_radii[indices[:, 0]],
+            self.core_labels[indices[:, 0]],
+            -1
+        ).astype(int)
+    
+    def assign(self, features: Union[Mapping[str, float], Sequence[float]]) -> int:
+        """Assign a single user (feature mapping or ordered vector) to a cluster"""
+        if isinstance(features, Mapping):
+            features = [features.get(name) or 0 for name in self.FEATURES]
+        return int(self.assign_many(np.asarray([features], dtype=float))[0])
+    
+    # Fitted state as plain arrays: persisted as .npy files and memory
+    # mapped on load instead of pickling the whole object
+    def to_arrays(self):
+        """Serving state (scaler statistics and core samples) and its parameters"""
+        if self.core_samples is None:
+            raise ValueError("Model must be fitted first")
+        
+        arrays = {
+            'scaler_mean': self.scaler.mean_,
+            'scaler_scale': self.scaler.scale_,
+            'scaler_var': self.scaler.var_,
+            # float64 so the KDTree indexes the mapped pages without a private copy
+            'core_samples': np.asarray(self.core_samples, dtype=np.float64),
+            'core_labels': np.asarray(self.core_labels, dtype=np.int64),
+            'core_sample_indices': self.core_sample_indices,
+            'core_radii': self.core_radii,
+        }
+        params = {
+            'format': self.ARTIFACT_FORMAT,
+            'features': list(self.FEATURES),
+            'eps': self.eps,
+            'min_samples': self.min_samples,
+            'mode': self.mode,
+            'n_samples_seen': int(np.max(self.scaler.n_samples_seen_)),
+        }
+        return arrays, params
+    
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], params: Dict[str, Any]) -> 'DBSCANUserSegmentation':
+        """Rebuild a fitted model for assignment (labels of the training users are not kept)"""
+        from sklearn.neighbors import KDTree
+        from sklearn.preprocessing import StandardScaler
+        
+        if params.get('format') != cls.ARTIFACT_FORMAT or params.get('features') != cls.FEATURES:
+            raise ValueError("Incompatible DBSCAN artifact, retrain the model")
+        
+        model = cls(eps=params['eps'], min_samples=params['min_samples'], mode=params['mode'])
+        model.scaler = StandardScaler()
+        model.scaler.mean_ = arrays['scaler_mean']
+        model.scaler.scale_ = arrays['scaler_scale']
+        model.scaler.var_ = arrays['scaler_var']
+        model.scaler.n_features_in_ = len(arrays['scaler_mean'])
+        model.scaler.n_samples_seen_ = params['n_samples_seen']
+        
+        model.core_samples = arrays['core_samples']
+        model.core_labels = arrays['core_labels']
+        model.core_sample_indices = arrays['core_sample_indices']
+        model.core_radii = arrays['core_radii']
+        model.core_index = KDTree(model.core_samples) if len(model.core_samples) > 0 else None
+        return model
+    
+    def save(self, path: str):
+        """Write the fitted model as a .npy + manifest.json artifact directory"""
+        from app.ml.artifacts import save_arrays
+        
+        arrays, params = self.to_arrays()
+        save_arrays(path, arrays, params)
+        logger.info(f"✅ DBSCAN model saved to {path}")
+    
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'DBSCANUserSegmentation':
+        """Load an artifact written by save(); arrays are memory mapped"""
+        from app.ml.artifacts import load_arrays
+        
+        arrays, params = load_arrays(path, mmap=mmap)
+        return cls.from_arrays(arrays, params)
+    
+    def analyze_clusters(self, users_data: pd.DataFrame, top_routes: int = 3, top_hours: int = 4):
+        """
+        Analyze cluster characteristics.
+        All per-cluster statistics come from grouped aggregations over the
+        fitted labels, so cost stays flat as the cluster count grows; the
+        input frame is not modified. common_routes and peak_hours are the
+        most frequent top_route / peak_hour values of the members (from
+        transacciones when the users come from the feature store).
+        """
         if self.labels is None:
             raise ValueError("Model must be fitted first")
         
-        users_data['cluster'] = self.labels
-        clusters = []
+        labels = pd.Series(self.labels, index=users_data.index, name='cluster')
+        grouped = users_data.groupby(labels, sort=True)
         
-        # Analyze each cluster
-        unique_clusters = set(self.labels)
-        if -1 in unique_clusters:
-            unique_clusters.remove(-1)  # Exclude outliers from analysis
+        stats = grouped.agg(
+            user_count=('usage_frequency', 'size'),
+            avg_frequency=('usage_frequency', 'mean'),
+            avg_spending=('avg_spending', 'mean'),
+            avg_route_diversity=('route_diversity', 'mean'),
+            peak_hour_ratio=('peak_hour_usage_ratio', 'mean'),
+            weekend_ratio=('weekend_usage_ratio', 'mean')
+        )
+        quantiles = grouped[['usage_frequency', 'avg_spending']].quantile([0.5, 0.75]).unstack()
+        descriptions = self._describe_clusters(stats, quantiles)
+        common_routes = self._top_values(users_data, labels, 'top_route', top_routes)
+        peak_hours = self._top_values(users_data, labels, 'peak_hour', top_hours)
         
-        for cluster_id in unique_clusters:
-            cluster_data = users_data[users_data['cluster'] == cluster_id]
-            
-            cluster_info = {
+        clusters = [
+            {
                 'cluster_id': int(cluster_id),
-                'user_count': len(cluster_data),
-                'avg_frequency': float(cluster_data['usage_frequency'].mean()),
-                'avg_spending': float(cluster_data['avg_spending'].mean()),
-                'avg_route_diversity': float(cluster_data['route_diversity'].mean()),
-                'peak_hour_ratio': float(cluster_data['peak_hour_usage_ratio'].mean()),
-                'weekend_ratio': float(cluster_data['weekend_usage_ratio'].mean()),
-                'characteristics': self._describe_cluster(cluster_data)
+                'user_count': int(row.user_count),
+                'avg_frequency': float(row.avg_frequency),
+                'avg_spending': float(row.avg_spending),
+                'avg_route_diversity': float(row.avg_route_diversity),
+                'peak_hour_ratio': float(row.peak_hour_ratio),
+                'weekend_ratio': float(row.weekend_ratio),
+                'common_routes': common_routes.get(cluster_id, []),
+                'peak_hours': sorted(peak_hours.get(cluster_id, [])),
+                'characteristics': descriptions[cluster_id]
             }
-            
-            clusters.append(cluster_info)
+            for cluster_id, row in stats.drop(index=-1, errors='ignore').iterrows()
+        ]
         
         # Outliers analysis
-        outliers = users_data[users_data['cluster'] == -1]
-        outliers_info = {
-            'count': len(outliers),
-            'avg_frequency': float(outliers['usage_frequency'].mean()) if len(outliers) > 0 else 0,
-            'avg_spending': float(outliers['avg_spending'].mean()) if len(outliers) > 0 else 0
-        }
+        if -1 in stats.index:
+            outliers_row = stats.loc[-1]
+            outliers_info = {
+                'count': int(outliers_row['user_count']),
+                'avg_frequency': float(outliers_row['avg_frequency']),
+                'avg_spending': float(outliers_row['avg_spending'])
+            }
+        else:
+            outliers_info = {'count': 0, 'avg_frequency': 0, 'avg_spending': 0}
         
         logger.info(f"✅ Analyzed {len(clusters)} clusters")
         return clusters, outliers_info
     
-    def _describe_cluster(self, cluster_data: pd.DataFrame) -> str:
-        """Generate cluster description"""
-        freq = cluster_data['usage_frequency'].mean()
-        spending = cluster_data['avg_spending'].mean()
-        
-        # Classify cluster
-        if freq > cluster_data['usage_frequency'].quantile(0.75):
-            freq_label = "Alta frecuencia"
-        elif freq > cluster_data['usage_frequency'].quantile(0.5):
-            freq_label = "Frecuencia media"
-        else:
-            freq_label = "Baja frecuencia"
+    @staticmethod
+    def _describe_clusters(stats: pd.DataFrame, quantiles: pd.DataFrame) -> pd.Series:
+        """Generate cluster descriptions from per-cluster means and quantiles"""
+        freq_label = np.select(
+            [
+                stats['avg_frequency'] > quantiles[('usage_frequency', 0.75)],
+                stats['avg_frequency'] > quantiles[('usage_frequency', 0.5)]
+            ],
+            ["Alta frecuencia", "Frecuencia media"],
+            default="Baja frecuencia"
+        )
+        spending_label = np.select(
+            [
+                stats['avg_spending'] > quantiles[('avg_spending', 0.75)],
+                stats['avg_spending'] > quantiles[('avg_spending', 0.5)]
+            ],
+            ["Alto gasto", "Gasto medio"],
+            default="Bajo gasto"
+        )
+        return pd.Series(
+            [f"{freq} - {spending}" for freq, spending in zip(freq_label, spending_label)],
+            index=stats.index
+        )
+    
+    @staticmethod
+    def _top_values(users_data: pd.DataFrame, labels: pd.Series, column: str, top_n: int) -> Dict[int, List[int]]:
+        """Most frequent values of a column per cluster (empty when the column is absent)"""
+        if column not in users_data.columns:
+            return {}
         
-        if spending > cluster_data['avg_spending'].quantile(0.75):
-            spending_label = "Alto gasto"
-        elif spending > cluster_data['avg_spending'].quantile(0.5):
-            spending_label = "Gasto medio"
-        else:
-            spending_label = "Bajo gasto"
+        counts = users_data.groupby([labels, users_data[column]]).size()
+        top = counts.sort_values(ascending=False, kind='stable').groupby(level=0).head(top_n)
         
-        return f"{freq_label} - {spending_label}"
+        result: Dict[int, List[int]] = {}
+        for (cluster_id, value), _ in top.items():
+            result.setdefault(int(cluster_id), []).append(int(value))
+        return result
+    
+    # Hours counted as peak by the feature store (morning and evening windows)
+    PEAK_HOURS = [6, 7, 8, 9, 17, 18, 19, 20]
     
-    def generate_synthetic_users(self, num_users: int = 500):
-        """Generate synthetic user data for testing"""
+    def generate_synthetic_users(self, num_users: int = 500, random_state: Optional[int] = None):
+        """
+        Generate synthetic user data for testing.
+        Every column is synthetic, top_route and peak_hour included: the
+        peak hour follows each user's peak_hour_usage_ratio and the route
+        pools are made up per profile. Real values come from
+        user_feature_service.
+        """
         logger.info(f"📊 Generating {num_users} synthetic users...")
         
+        # Seeded generator gives a reproducible snapshot; default keeps global RNG
+        rng = np.random.RandomState(random_state) if random_state is not None else np.random
+        
         # Create different user profiles
         profiles = []
         
@@ -145,13 +462,13 @@ class DBSCANUserSegmentation:
         n_commuters = int(num_users * 0.4)
         profiles.append(pd.DataFrame({
             'user_id': range(1, n_commuters + 1),
-            'usage_frequency': np.random.normal(20, 3, n_commuters).clip(15, 30),
-            'avg_spending': np.random.normal(150, 20, n_commuters).clip(100, 200),
-            'route_diversity': np.random.normal(2, 0.5, n_commuters).clip(1, 3),
-            'peak_hour_usage_ratio': np.random.normal(0.7, 0.1, n_commuters).clip(0.5, 0.9),
-            'weekend_usage_ratio': np.random.normal(0.2, 0.1, n_commuters).clip(0, 0.4),
-            'avg_trip_duration': np.random.normal(30, 5, n_commuters).clip(20, 45),
-            'total_transactions': np.random.normal(200, 30, n_commuters).clip(150, 300)
+            'usage_frequency': rng.normal(20, 3, n_commuters).clip(15, 30),
+            'avg_spending': rng.normal(150, 20, n_commuters).clip(100, 200),
+            'route_diversity': rng.normal(2, 0.5, n_commuters).clip(1, 3),
+            'peak_hour_usage_ratio': rng.normal(0.7, 0.1, n_commuters).clip(0.5, 0.9),
+            'weekend_usage_ratio': rng.normal(0.2, 0.1, n_commuters).clip(0, 0.4),
+            'total_transactions': rng.normal(200, 30, n_commuters).clip(150, 300),
+            'top_route': rng.choice([1, 2, 3], n_commuters)
         }))
         
         # Profile 2: Occasional users (30%)
@@ -159,13 +476,13 @@ class DBSCANUserSegmentation:
         start_id = n_commuters + 1
         profiles.append(pd.DataFrame({
             'user_id': range(start_id, start_id + n_occasional),
-            'usage_frequency': np.random.normal(8, 2, n_occasional).clip(5, 12),
-            'avg_spending': np.random.normal(60, 15, n_occasional).clip(30, 100),
-            'route_diversity': np.random.normal(3, 1, n_occasional).clip(2, 5),
-            'peak_hour_usage_ratio': np.random.normal(0.5, 0.15, n_occasional).clip(0.2, 0.7),
-            'weekend_usage_ratio': np.random.normal(0.5, 0.15, n_occasional).clip(0.3, 0.7),
-            'avg_trip_duration': np.random.normal(25, 8, n_occasional).clip(15, 40),
-            'total_transactions': np.random.normal(80, 20, n_occasional).clip(50, 120)
+            'usage_frequency': rng.normal(8, 2, n_occasional).clip(5, 12),
+            'avg_spending': rng.normal(60, 15, n_occasional).clip(30, 100),
+            'route_diversity': rng.normal(3, 1, n_occasional).clip(2, 5),
+            'peak_hour_usage_ratio': rng.normal(0.5, 0.15, n_occasional).clip(0.2, 0.7),
+            'weekend_usage_ratio': rng.normal(0.5, 0.15, n_occasional).clip(0.3, 0.7),
+            'total_transactions': rng.normal(80, 20, n_occasional).clip(50, 120),
+            'top_route': rng.randint(1, 11, n_occasional)
         }))
         
         # Profile 3: Weekend warriors (20%)
@@ -173,13 +490,13 @@ class DBSCANUserSegmentation:
         start_id = n_commuters + n_occasional + 1
         profiles.append(pd.DataFrame({
             'user_id': range(start_id, start_id + n_weekend),
-            'usage_frequency': np.random.normal(6, 1.5, n_weekend).clip(4, 9),
-            'avg_spending': np.random.normal(90, 20, n_weekend).clip(50, 130),
-            'route_diversity': np.random.normal(4, 1, n_weekend).clip(3, 6),
-            'peak_hour_usage_ratio': np.random.normal(0.3, 0.1, n_weekend).clip(0.1, 0.5),
-            'weekend_usage_ratio': np.random.normal(0.8, 0.1, n_weekend).clip(0.6, 1.0),
-            'avg_trip_duration': np.random.normal(35, 10, n_weekend).clip(20, 60),
-            'total_transactions': np.random.normal(60, 15, n_weekend).clip(40, 90)
+            'usage_frequency': rng.normal(6, 1.5, n_weekend).clip(4, 9),
+            'avg_spending': rng.normal(90, 20, n_weekend).clip(50, 130),
+            'route_diversity': rng.normal(4, 1, n_weekend).clip(3, 6),
+            'peak_hour_usage_ratio': rng.normal(0.3, 0.1, n_weekend).clip(0.1, 0.5),
+            'weekend_usage_ratio': rng.normal(0.8, 0.1, n_weekend).clip(0.6, 1.0),
+            'total_transactions': rng.normal(60, 15, n_weekend).clip(40, 90),
+            'top_route': rng.randint(5, 11, n_weekend)
         }))
         
         # Profile 4: Outliers (10%)
@@ -187,19 +504,55 @@ class DBSCANUserSegmentation:
         start_id = n_commuters + n_occasional + n_weekend + 1
         profiles.append(pd.DataFrame({
             'user_id': range(start_id, start_id + n_outliers),
-            'usage_frequency': np.random.uniform(0, 40, n_outliers),
-            'avg_spending': np.random.uniform(0, 300, n_outliers),
-            'route_diversity': np.random.uniform(1, 10, n_outliers),
-            'peak_hour_usage_ratio': np.random.uniform(0, 1, n_outliers),
-            'weekend_usage_ratio': np.random.uniform(0, 1, n_outliers),
-            'avg_trip_duration': np.random.uniform(5, 120, n_outliers),
-            'total_transactions': np.random.uniform(1, 500, n_outliers)
+            'usage_frequency': rng.uniform(0, 40, n_outliers),
+            'avg_spending': rng.uniform(0, 300, n_outliers),
+            'route_diversity': rng.uniform(1, 10, n_outliers),
+            'peak_hour_usage_ratio': rng.uniform(0, 1, n_outliers),
+            'weekend_usage_ratio': rng.uniform(0, 1, n_outliers),
+            'total_transactions': rng.uniform(1, 500, n_outliers),
+            'top_route': rng.randint(1, 11, n_outliers)
         }))
         
         users_data = pd.concat(profiles, ignore_index=True)
+        
+        # Most used hour: a peak hour with the user's own peak-usage probability
+        n = len(users_data)
+        off_peak_hours = [hour for hour in range(24) if hour not in self.PEAK_HOURS]
+        users_data['peak_hour'] = np.where(
+            rng.random_sample(n) < users_data['peak_hour_usage_ratio'].to_numpy(),
+            rng.choice(self.PEAK_HOURS, n),
+            rng.choice(off_peak_hours, n)
+        )
         logger.info("✅ Synthetic users generated")
         return users_data
 
 
+def _evaluate_sweep_point(graph, X: np.ndarray, eps: float, min_samples: int,
+                          silhouette_sample_size: Optional[int], random_state: Optional[int]) -> Dict[str, Any]:
+    """Fit one sweep combination on the shared precomputed graph (HDBSCAN on X without one)"""
+    from sklearn.cluster import DBSCAN
+    from sklearn.exceptions import EfficiencyWarning
+    
+    if graph is None:
+        from sklearn.cluster import HDBSCAN
+        labels = HDBSCAN(min_cluster_size=max(min_samples, 2), min_samples=min_samples,
+                         cluster_selection_epsilon=eps).fit_predict(X)
+    else:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', EfficiencyWarning)
+            labels = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(graph)
+    
+    scorer = DBSCANUserSegmentation(silhouette_sample_size=silhouette_sample_size, random_state=random_state)
+    n_outliers = int((labels == -1).sum())
+    return {
+        'eps': eps,
+        'min_samples': min_samples,
+        'n_clusters': int(len(np.unique(labels[labels != -1]))),
+        'n_outliers': n_outliers,
+        'outlier_ratio': n_outliers / len(labels) if len(labels) else 0.0,
+        'silhouette_score': scorer.score_silhouette(X, labels)
+    }
+
+
 # Global instance
 dbscan_segmentation = DBSCANUserSegmentation()
@@ -0,0 +1,177 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+import pickle
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.ml.feature_matrix import to_feature_matrix
+
+logger = logging.getLogger(__name__)
+
+
+def calendar_features(timestamps) -> pd.DataFrame:
+    """Calendar feature columns for hourly timestamps (shared by training and serving)"""
+    timestamps = pd.DatetimeIndex(timestamps)
+    hour = timestamps.hour.to_numpy()
+    day_of_week = timestamps.dayofweek.to_numpy()
+    return pd.DataFrame({
+        'timestamp': timestamps,
+        'hour': hour,
+        'day_of_week': day_of_week,
+        'is_weekend': (day_of_week >= 5).astype(np.int8),
+        'month': timestamps.month.to_numpy(),
+        'is_peak_hour': (((hour >= 7) & (hour <= 9)) | ((hour >= 17) & (hour <= 19))).astype(np.int8),
+    })
+
+
+def build_forecast_frame(route_ids: Iterable[int], hours_ahead: int,
+                         start: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Calendar features for every (route, hour) pair in one frame.
+    Rows are route-major: route r, hour h sits at r * hours_ahead + h.
+    Hours start at the next full hour after `start` (default: now).
+    """
+    route_ids = np.asarray(list(route_ids), dtype=np.int64)
+    start = pd.Timestamp(start or datetime.now()).floor('h') + pd.Timedelta(hours=1)
+    calendar = calendar_features(pd.date_range(start, periods=hours_ahead, freq='h'))
+
+    frame = calendar.iloc[np.tile(np.arange(hours_ahead), len(route_ids))].reset_index(drop=True)
+    frame.insert(0, 'route_id', np.repeat(route_ids, hours_ahead))
+    return frame
+
+
+class DemandModel(ABC):
+    """
+    Interface for servable demand models.
+    Subclasses implement predict() over a feature frame; forecast() builds
+    the features for all routes x hours and runs one predict() call.
+    """
+
+    name = 'base'
+
+    def __init__(self, version: str = '1.0.0', confidence: float = 0.85):
+        self.version = version
+        self.confidence = confidence
+
+    @abstractmethod
+    def predict(self, frame: pd.DataFrame) -> np.ndarray:
+        """Demand for every row of a build_forecast_frame() frame"""
+
+    def forecast(self, route_ids: Iterable[int], hours_ahead: int = 24,
+                 start: Optional[datetime] = None) -> Dict[int, np.ndarray]:
+        """Forecast the next hours_ahead hours for every route at once"""
+        route_ids = list(route_ids)
+        frame = build_forecast_frame(route_ids, hours_ahead, start)
+        predictions = self.predict(frame).reshape(len(route_ids), hours_ahead)
+        return {int(route_id): row for route_id, row in zip(route_ids, predictions)}
+
+
+class SklearnDemandModel(DemandModel):
+    """
+    Serves a scikit-learn regressor artifact as written by
+    scripts/train_production_models.py: a pickled dict with 'model',
+    'features', 'metrics' and 'trained_at'. Works for GradientBoosting as
+    well as HistGradientBoosting or any other regressor on those features.
+    Artifacts without a route_id feature would give every route the same
+    forecast, so they are rejected and callers fall back to the per-route
+    baseline until the model is retrained.
+    """
+
+    name = 'gbm'
+
+    def __init__(self, artifact: Dict, path: str = None):
+        if 'route_id' not in artifact['features']:
+            raise ValueError("Demand model artifact has no route_id feature; retrain it with "
+                             "scripts/train_production_models.py")
+        accuracy = artifact.get('metrics', {}).get('accuracy')
+        super().__init__(
+            version=f"{self.name}-{artifact.get('trained_at', 'unknown')}",
+            confidence=float(np.clip(accuracy / 100, 0, 1)) if accuracy is not None else 0.85
+        )
+        self.model = artifact['model']
+        self.features = list(artifact['features'])
+        self.metrics = artifact.get('metrics', {})
+        self.path = path
+
+    @classmethod
+    def from_file(cls, path: str) -> Optional["SklearnDemandModel"]:
+        """Load a pickled artifact, or None if it was never trained"""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return cls(pickle.load(f), path=path)
+
+    def predict(self, frame: pd.DataFrame) -> np.ndarray:
+        X = to_feature_matrix(frame, self.features)
+        return np.clip(self.model.predict(X), 0, None)
+
+
+class DemandModelRegistry:
+    """
+    Registry of demand model loaders keyed by name.
+    The active model (settings.DEMAND_MODEL) is loaded once and shared;
+    get() returns None when it is unavailable so callers can fall back.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Optional[DemandModel]]] = {}
+        self._models: Dict[str, DemandModel] = {}
+        self._attempted = set()
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Optional[DemandModel]]):
+        """Register a loader that builds a model (or returns None if not trained)"""
+        self._loaders[name] = loader
+
+    def available(self):
+        return sorted(self._loaders)
+
+    def load(self, name: str = None) -> Optional[DemandModel]:
+        """(Re)load a model by name, replacing the served instance"""
+        name = name or settings.DEMAND_MODEL
+        if name not in self._loaders:
+            raise ValueError(f"Unknown demand model '{name}'. Available: {self.available()}")
+
+        try:
+            model = self._loaders[name]()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load demand model '{name}': {e}")
+            model = None
+
+        with self._lock:
+            self._attempted.add(name)
+            if model is None:
+                self._models.pop(name, None)
+                logger.info(f"ℹ️  Demand model '{name}' not available. Using fallback predictions.")
+            else:
+                self._models[name] = model
+                logger.info(f"✅ Demand model '{name}' loaded (version {model.version})")
+        return model
+
+    def set(self, name: str, model: DemandModel):
+        """Serve an already loaded model (e.g. a new version from the model registry)"""
+        with self._lock:
+            self._attempted.add(name)
+            self._models[name] = model
+        logger.info(f"✅ Demand model '{name}' set (version {model.version})")
+
+    def get(self, name: str = None) -> Optional[DemandModel]:
+        """Get a loaded model, trying to load it once on first use"""
+        name = name or settings.DEMAND_MODEL
+        with self._lock:
+            model = self._models.get(name)
+            attempted = name in self._attempted
+        if model is None and not attempted and name in self._loaders:
+            model = self.load(name)
+        return model
+
+
+# Global instance
+demand_model_registry = DemandModelRegistry()
+demand_model_registry.register('gbm', lambda: SklearnDemandModel.from_file(settings.DEMAND_MODEL_FILE))
@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.ml.feature_matrix import last_windows
+
+logger = logging.getLogger(__name__)
+
+
+def _load_tflite_interpreter(model_path: str):
+    """Prefer the standalone TFLite runtimes; full TensorFlow is the last resort"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            logger.warning("⚠️ No standalone TFLite runtime installed. Falling back to tensorflow.lite.")
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path)
+
+
+def next_step_features(window: np.ndarray, predictions: np.ndarray, scale: np.ndarray, minimum: np.ndarray,
+                       previous_idx: int, rolling_idx: int, rolling_window: int) -> np.ndarray:
+    """
+    Scaled feature row for the hour after each window, given its predicted
+    demand. As in training, previous_demand is the demand of the window's
+    last hour and rolling_mean averages the last rolling_window demands up
+    to and including the new hour. Past demands are recovered from the
+    previous_demand column and the last hour's from its rolling_mean; the
+    other features repeat the latest row.
+    """
+    past = (window[:, -(rolling_window - 1):, previous_idx] - minimum[previous_idx]) / scale[previous_idx]
+    last_rolling = (window[:, -1, rolling_idx] - minimum[rolling_idx]) / scale[rolling_idx]
+    last_demand = rolling_window * last_rolling - past.sum(axis=1)
+    rolling = (past[:, 1:].sum(axis=1) + last_demand + predictions) / rolling_window
+
+    next_step = window[:, -1].copy()
+    next_step[:, previous_idx] = last_demand * scale[previous_idx] + minimum[previous_idx]
+    next_step[:, rolling_idx] = rolling * scale[rolling_idx] + minimum[rolling_idx]
+    return next_step
+
+
+class DemandInferenceRuntime:
+    """
+    Lean serving runtime for the exported LSTM demand model.
+    Loads the TFLite (or ONNX) file written by
+    LSTMDemandPredictor.export_for_serving() and scales inputs from its
+    manifest with numpy, so serving never imports TensorFlow or Keras.
+    """
+
+    def __init__(self, model_path: str = None):
+        self.model_path = model_path or settings.DEMAND_RUNTIME_PATH
+        self.manifest = None
+        self._interpreter = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.manifest is not None
+
+    @staticmethod
+    def manifest_path_for(model_path: str) -> str:
+        return os.path.splitext(model_path)[0] + '.json'
+
+    def load(self, model_path: str = None) -> bool:
+        """
+        Load an exported model and its manifest (default: the configured
+        path). The new interpreter is built before the swap, so in-flight
+        predictions finish on the previous one. Returns False if none exists.
+        """
+        model_path = model_path or self.model_path
+        manifest_path = self.manifest_path_for(model_path)
+        if not os.path.exists(model_path) or not os.path.exists(manifest_path):
+            logger.info(f"ℹ️  No exported demand model at {model_path}. Using rule-based predictions.")
+            return False
+
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        interpreter, session = None, None
+        if manifest['format'] == 'tflite':
+            interpreter = _load_tflite_interpreter(model_path)
+            interpreter.allocate_tensors()
+        elif manifest['format'] == 'onnx':
+            import onnxruntime
+            session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        else:
+            raise ValueError(f"Unsupported serving format: {manifest['format']}")
+
+        manifest['scaler_min'] = np.asarray(manifest['scaler_min'], dtype=np.float32)
+        manifest['scaler_scale'] = np.asarray(manifest['scaler_scale'], dtype=np.float32)
+
+        with self._lock:
+            self.manifest, self._interpreter, self._session = manifest, interpreter, session
+            self.model_path = model_path
+
+        logger.info(f"✅ Demand model ({manifest['format']}) loaded from {model_path}")
+        return True
+
+    def prepare_batch(self, recent_data: pd.DataFrame, group_col: Optional[str] = 'route_id'):
+        """
+        Scaled (routes, sequence_length, features) batch from the latest rows
+        of every route, using the scaler fitted at training time.
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Demand serving model not loaded")
+
+        route_ids, sequences = last_windows(
+            recent_data, self.manifest['features'], self.manifest['sequence_length'], group_col=group_col
+        )
+        # MinMaxScaler.transform: X * scale_ + min_
+        sequences *= self.manifest['scaler_scale']
+        sequences += self.manifest['scaler_min']
+        return route_ids, sequences
+
+    def predict_batch(self, sequences: np.ndarray, hours_ahead: int = 24) -> np.ndarray:
+        """
+        Recursive multi-horizon forecast, one model call per hour for the
+        whole batch. Mirrors LSTMDemandPredictor.predict_batch().
+        Returns a (routes, hours_ahead) matrix.
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Demand serving model not loaded")
+
+        predictions = np.empty((len(sequences), hours_ahead), dtype=np.float32)
+        if len(sequences) == 0:
+            return predictions
+
+        manifest = self.manifest
+        features = manifest['features']
+        window = np.array(sequences, dtype=np.float32)
+        with self._lock:
+            for step in range(hours_ahead):
+                predictions[:, step] = self._run(window)
+
+                next_step = next_step_features(
+                    window, predictions[:, step], manifest['scaler_scale'], manifest['scaler_min'],
+                    features.index('previous_demand'), features.index('rolling_mean'),
+                    manifest.get('rolling_window', 6)
+                )
+                window[:, :-1] = window[:, 1:]
+                window[:, -1] = next_step
+
+        return predictions
+
+    def predict_routes(self, recent_data: pd.DataFrame, hours_ahead: int = 24,
+                       group_col: str = 'route_id') -> dict:
+        """Forecast every route in recent_data with one batched rollout"""
+        route_ids, sequences = self.prepare_batch(recent_data, group_col=group_col)
+        predictions = self.predict_batch(sequences, hours_ahead)
+        return {int(route_id): row.tolist() for route_id, row in zip(route_ids, predictions)}
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        """One forward pass; callers hold the lock (interpreters are not thread-safe)"""
+        if self._session is not None:
+            input_name = self._session.get_inputs()[0].name
+            return self._session.run(None, {input_name: batch})[0][:, 0]
+
+        interpreter = self._interpreter
+        input_detail = interpreter.get_input_details()[0]
+        if tuple(input_detail['shape']) != batch.shape:
+            interpreter.resize_tensor_input(input_detail['index'], batch.shape)
+            interpreter.allocate_tensors()
+        interpreter.set_tensor(input_detail['index'], batch)
+        interpreter.invoke()
+        return interpreter.get_tensor(interpreter.get_output_details()[0]['index'])[:, 0]
+
+
+# Global instance
+demand_runtime = DemandInferenceRuntime()
@@ -0,0 +1,113 @@
+import logging
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+
+def to_feature_matrix(frame: pd.DataFrame, columns: Sequence[str], dtype=np.float32,
+                      memmap_path: Optional[str] = None) -> np.ndarray:
+    """
+    Build a C-contiguous (rows, features) matrix from DataFrame columns.
+    Columns are copied one at a time into a preallocated array (missing
+    values become 0), so the full frame is never duplicated. With
+    memmap_path the matrix is backed by an .npy file on disk instead of RAM.
+    """
+    shape = (len(frame), len(columns))
+    if memmap_path:
+        matrix = np.lib.format.open_memmap(memmap_path, mode='w+', dtype=dtype, shape=shape)
+    else:
+        matrix = np.empty(shape, dtype=dtype)
+
+    for j, column in enumerate(columns):
+        matrix[:, j] = frame[column].to_numpy(dtype=dtype, na_value=0)
+
+    return matrix
+
+
+def stream_feature_matrix(chunks: Iterable[pd.DataFrame], columns: Sequence[str], memmap_path: str,
+                          dtype=np.float32, scaler=None,
+                          keep: Sequence[str] = ()) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Build a (rows, features) matrix from DataFrame chunks straight into a
+    raw memmap at memmap_path, so only one chunk is held in RAM however
+    many rows the extract has. With scaler, partial_fit() sees every chunk
+    (apply it afterwards with scale_in_place(..., fit=False)). The `keep`
+    columns are returned as 1-D arrays (one value per row, e.g. targets).
+    Returns (matrix, kept_columns).
+    """
+    rows = 0
+    kept = {column: [] for column in keep}
+    with open(memmap_path, 'wb') as f:
+        for frame in chunks:
+            block = to_feature_matrix(frame, columns, dtype=dtype)
+            if len(block) == 0:
+                continue
+            if scaler is not None:
+                scaler.partial_fit(block)
+            f.write(block.tobytes())
+            rows += len(block)
+            for column in keep:
+                kept[column].append(frame[column].to_numpy())
+
+    kept = {column: np.concatenate(parts) if parts else np.empty(0) for column, parts in kept.items()}
+    if rows == 0:
+        return np.empty((0, len(columns)), dtype=dtype), kept
+    return np.memmap(memmap_path, dtype=dtype, mode='r+', shape=(rows, len(columns))), kept
+
+
+def scale_in_place(matrix: np.ndarray, scaler, fit: bool = True) -> np.ndarray:
+    """
+    Fit and/or apply a scikit-learn scaler without allocating a scaled copy.
+    copy=False only holds for this call: the scaler is shared (and persisted),
+    and other callers expect transform() to leave their input alone.
+    """
+    previous_copy = scaler.get_params()['copy']
+    scaler.set_params(copy=False)
+    try:
+        if fit:
+            scaler.fit(matrix)
+        scaled = scaler.transform(matrix)
+    finally:
+        scaler.set_params(copy=previous_copy)
+
+    # Scalers only work in place on float input; keep the caller's buffer authoritative
+    if scaled is not matrix:
+        matrix[...] = scaled
+    return matrix
+
+
+def sliding_windows(matrix: np.ndarray, length: int) -> np.ndarray:
+    """
+    Zero-copy (n - length + 1, length, features) view of consecutive rows.
+    Windows share memory with the input; copy before mutating them.
+    """
+    if len(matrix) < length:
+        return np.empty((0, length) + matrix.shape[1:], dtype=matrix.dtype)
+    # sliding_window_view appends the window axis last: (n, features, length)
+    return sliding_window_view(matrix, length, axis=0).swapaxes(1, 2)
+
+
+def last_windows(frame: pd.DataFrame, columns: Sequence[str], length: int,
+                 group_col: Optional[str] = None, dtype=np.float32):
+    """
+    Stack the last `length` rows of every group into a (groups, length,
+    features) matrix, groups in sorted order. Groups with fewer rows are
+    skipped; without group_col the whole frame is a single group (id None).
+    Returns (group_ids, windows).
+    """
+    if group_col and group_col in frame.columns:
+        counts = frame.groupby(group_col, sort=True).size()
+        group_ids = counts.index[counts >= length].to_numpy()
+        tails = frame[frame[group_col].isin(group_ids)]
+        tails = tails.groupby(group_col, sort=True).tail(length)
+        tails = tails.iloc[np.argsort(tails[group_col].to_numpy(), kind='stable')]
+    else:
+        group_ids = np.array([None]) if len(frame) >= length else np.array([])
+        tails = frame.tail(length) if len(group_ids) else frame.iloc[:0]
+
+    matrix = to_feature_matrix(tails, columns, dtype=dtype)
+    return group_ids, matrix.reshape(len(group_ids), length, len(columns))
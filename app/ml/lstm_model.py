@@ -1,39 +1,68 @@
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
+from datetime import datetime
+import importlib.util
+import json
 import logging
 import os
 from app.core.config import settings
+from app.ml.feature_matrix import (
+    to_feature_matrix, stream_feature_matrix, scale_in_place, sliding_windows, last_windows
+)
 
-# Optional TensorFlow import
-try:
-    from tensorflow import keras
-    from tensorflow.keras.models import Sequential, load_model
-    from tensorflow.keras.layers import LSTM, Dense, Dropout
-    HAS_TENSORFLOW = True
-except ImportError:
-    HAS_TENSORFLOW = False
-    logger = logging.getLogger(__name__)
-    logger.warning("⚠️ TensorFlow not available. Using fallback predictions.")
+# TensorFlow is optional and only imported when training or exporting, so
+# serving processes that use the lean runtime never pay for it
+HAS_TENSORFLOW = importlib.util.find_spec('tensorflow') is not None
 
 logger = logging.getLogger(__name__)
 
+if not HAS_TENSORFLOW:
+    logger.warning("⚠️ TensorFlow not available. Using fallback predictions.")
+
+
+def _import_tensorflow():
+    """Import TensorFlow on first use"""
+    import tensorflow as tf
+    return tf
+
 
 class LSTMDemandPredictor:
     """LSTM Model for demand prediction"""
     
+    # Features: hour, day_of_week, month, is_weekend, is_holiday, temperature, precipitation, events_count
+    FEATURES = ['hour', 'day_of_week', 'month', 'is_weekend', 'is_holiday',
+                'temperature', 'precipitation', 'events_count', 'previous_demand', 'rolling_mean']
+    ROLLING_WINDOW = 6  # hours averaged into rolling_mean
+    
     def __init__(self):
         self.model = None
-        self.scaler = MinMaxScaler()
+        self._scaler = None
         self.model_path = settings.LSTM_MODEL_PATH
         self.sequence_length = 24  # 24 hours lookback
+        self._rollout_fn = None
+        self._rollout_model = None
         
+    @property
+    def scaler(self):
+        """MinMaxScaler, created on first use so importing this module stays light"""
+        if self._scaler is None:
+            from sklearn.preprocessing import MinMaxScaler
+            self._scaler = MinMaxScaler()
+        return self._scaler
+    
+    @scaler.setter
+    def scaler(self, scaler):
+        self._scaler = scaler
+    
     def build_model(self, input_shape):
         """Build LSTM model"""
         if not HAS_TENSORFLOW:
             logger.warning("⚠️ TensorFlow not available. Cannot build LSTM model.")
             return None
         
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense, Dropout
+        
         model = Sequential([
             LSTM(128, return_sequences=True, input_shape=input_shape),
             Dropout(0.2),
@@ -63,6 +92,7 @@ class LSTMDemandPredictor:
         
         if os.path.exists(self.model_path):
             try:
+                from tensorflow.keras.models import load_model
                 self.model = load_model(self.model_path)
                 logger.info(f"✅ Loaded LSTM model from {self.model_path}")
                 return self.model
@@ -73,122 +103,399 @@ class LSTMDemandPredictor:
         self.model = self.build_model((self.sequence_length, 10))
         return self.model
     
-    def prepare_data(self, data: pd.DataFrame):
-        """Prepare data for LSTM"""
-        # Features: hour, day_of_week, month, is_weekend, is_holiday, temperature, precipitation, events_count
-        features = ['hour', 'day_of_week', 'month', 'is_weekend', 'is_holiday', 
-                   'temperature', 'precipitation', 'events_count', 'previous_demand', 'rolling_mean']
+    def build_windows(self, data: pd.DataFrame, group_col: str = 'route_id', memmap_path: str = None):
+        """
+        Scale features once and index every valid training window.
+        Returns (windows, targets, starts): windows is a zero-copy strided view
+        over the scaled matrix, starts holds the first row of each usable
+        window and targets its next-hour demand. When group_col is present
+        (e.g. several routes), rows are grouped and windows never cross a
+        group boundary; rows are expected in time order within each group.
+        """
+        groups = None
+        if group_col and group_col in data.columns:
+            groups = data[group_col].to_numpy()
+            if len(groups) > 1 and not np.all(groups[:-1] <= groups[1:]):
+                order = np.argsort(groups, kind='stable')
+                data = data.iloc[order]
+                groups = groups[order]
         
-        # Scale data
-        scaled_data = self.scaler.fit_transform(data[features])
+        scaled_data = to_feature_matrix(data, self.FEATURES, memmap_path=memmap_path)
+        scale_in_place(scaled_data, self.scaler)
+        demand = data['demand'].to_numpy(dtype=np.float32)
         
-        # Create sequences
-        X, y = [], []
-        for i in range(len(scaled_data) - self.sequence_length):
-            X.append(scaled_data[i:i + self.sequence_length])
-            y.append(data['demand'].iloc[i + self.sequence_length])
-        
-        return np.array(X), np.array(y)
+        starts = self._window_starts(len(scaled_data), groups)
+        return sliding_windows(scaled_data, self.sequence_length), demand[starts + self.sequence_length], starts
     
-    def train(self, data: pd.DataFrame, epochs: int = 50, batch_size: int = 32):
-        """Train LSTM model"""
-        logger.info("🤖 Training LSTM model...")
+    def build_windows_streaming(self, chunks, memmap_path: str = None, group_col: str = 'route_id',
+                                scale_rows: int = 65536):
+        """
+        build_windows() for extracts that do not fit in RAM.
+        chunks is an iterable of DataFrames already ordered by group and time
+        (e.g. a cursor ordered by route_id, timestamp). Each chunk is written
+        straight into a float32 memmap at memmap_path while the scaler is
+        partially fitted, then the matrix is scaled in place block by block.
+        Only demand and group ids (one value per row) stay in RAM.
+        """
+        self.scaler = None  # partial_fit must start from a fresh scaler
+        keep = ['demand']
+        if group_col:
+            chunks = self._require_group(chunks, group_col)
+            keep.append(group_col)
         
-        X, y = self.prepare_data(data)
+        scaled_data, kept = stream_feature_matrix(
+            chunks, self.FEATURES, memmap_path or settings.LSTM_TRAINING_MEMMAP_PATH,
+            scaler=self.scaler, keep=keep
+        )
+        for offset in range(0, len(scaled_data), scale_rows):
+            scale_in_place(scaled_data[offset:offset + scale_rows], self.scaler, fit=False)
         
-        if self.model is None:
-            self.model = self.build_model((X.shape[1], X.shape[2]))
+        groups = kept.get(group_col)
+        if groups is not None and len(groups) > 1:
+            # Rows cannot be reordered out of core, so every group must be one run
+            run_values = groups[np.r_[0, np.flatnonzero(groups[1:] != groups[:-1]) + 1]]
+            if len(np.unique(run_values)) != len(run_values):
+                raise ValueError(f"Streaming chunks must be ordered by {group_col}")
         
-        # Split train/validation
-        split_idx = int(len(X) * 0.8)
-        X_train, X_val = X[:split_idx], X[split_idx:]
-        y_train, y_val = y[:split_idx], y[split_idx:]
+        demand = kept['demand'].astype(np.float32)
+        starts = self._window_starts(len(scaled_data), groups)
+        return sliding_windows(scaled_data, self.sequence_length), demand[starts + self.sequence_length], starts
+    
+    @staticmethod
+    def _require_group(chunks, group_col: str):
+        """Chunks either all carry group_col or none do (single series)"""
+        for frame in chunks:
+            if group_col not in frame.columns:
+                frame = frame.assign(**{group_col: 0})
+            yield frame
+    
+    def _window_starts(self, rows: int, groups: np.ndarray = None) -> np.ndarray:
+        """First row of every window whose target row lies in the same group"""
+        length = self.sequence_length
+        if rows <= length:
+            return np.empty(0, dtype=np.int64)
+        if groups is None:
+            return np.arange(rows - length)
+        # Groups are contiguous, so a window plus its target stays inside
+        # one group exactly when its first row and target row match
+        return np.flatnonzero(groups[:-length] == groups[length:])
+    
+    def prepare_data(self, data: pd.DataFrame, group_col: str = 'route_id', memmap_path: str = None):
+        """
+        Prepare data for LSTM.
+        Features are scaled in place in a float32 matrix and window i covers
+        rows [i, i + sequence_length) with demand at i + sequence_length as
+        target. A single series returns X as a zero-copy view; grouped data
+        gathers only the windows that stay within one group.
+        """
+        windows, y, starts = self.build_windows(data, group_col=group_col, memmap_path=memmap_path)
+        
+        if len(starts) == 0 or starts[-1] - starts[0] + 1 == len(starts):
+            first = int(starts[0]) if len(starts) else 0
+            X = windows[first:first + len(starts)]
+        else:
+            X = windows[starts]
         
-        # Train model
-        history = self.model.fit(
-            X_train, y_train,
-            validation_data=(X_val, y_val),
-            epochs=epochs,
-            batch_size=batch_size,
-            verbose=0
+        return X, y
+    
+    def iter_batches(self, windows: np.ndarray, targets: np.ndarray, starts: np.ndarray,
+                     batch_size: int = 256):
+        """Yield (X, y) batches, materializing one batch of windows at a time"""
+        for offset in range(0, len(starts), batch_size):
+            batch = starts[offset:offset + batch_size]
+            yield np.ascontiguousarray(windows[batch]), targets[offset:offset + batch_size]
+    
+    def make_dataset(self, windows: np.ndarray, targets: np.ndarray, starts: np.ndarray,
+                     batch_size: int = 256):
+        """Streaming tf.data pipeline over build_windows() output"""
+        if not HAS_TENSORFLOW:
+            raise ImportError("TensorFlow is required for streaming datasets")
+        
+        tf = _import_tensorflow()
+        feature_count = windows.shape[-1]
+        signature = (
+            tf.TensorSpec(shape=(None, self.sequence_length, feature_count), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32)
         )
+        return tf.data.Dataset.from_generator(
+            lambda: self.iter_batches(windows, targets, starts, batch_size),
+            output_signature=signature
+        ).prefetch(tf.data.AUTOTUNE)
+    
+    def train(self, data, epochs: int = 50, batch_size: int = 32, streaming: bool = False,
+              callbacks: list = None, export_path: str = None, memmap_path: str = None):
+        """
+        Train LSTM model.
+        streaming=True feeds Keras from a generator-backed tf.data pipeline so
+        only one batch of windows is materialized at a time; data may then be
+        an iterable of DataFrame chunks, whose feature matrix is built on disk
+        at memmap_path (LSTM_TRAINING_MEMMAP_PATH by default). callbacks are
+        passed to Keras fit(); export_path overrides where the serving
+        export is written.
+        """
+        logger.info("🤖 Training LSTM model...")
+        
+        if streaming:
+            memmap_path = memmap_path or settings.LSTM_TRAINING_MEMMAP_PATH
+            os.makedirs(os.path.dirname(memmap_path) or '.', exist_ok=True)
+            if isinstance(data, pd.DataFrame):
+                windows, y, starts = self.build_windows(data, memmap_path=memmap_path)
+            else:
+                windows, y, starts = self.build_windows_streaming(data, memmap_path=memmap_path)
+            if self.model is None:
+                self.model = self.build_model((self.sequence_length, windows.shape[-1]))
+            
+            # Split train/validation
+            split_idx = int(len(starts) * 0.8)
+            train_data = self.make_dataset(windows, y[:split_idx], starts[:split_idx], batch_size)
+            val_data = self.make_dataset(windows, y[split_idx:], starts[split_idx:], batch_size)
+            
+            history = self.model.fit(train_data, validation_data=val_data, epochs=epochs,
+                                     callbacks=callbacks, verbose=0)
+        else:
+            X, y = self.prepare_data(data)
+            
+            if self.model is None:
+                self.model = self.build_model((X.shape[1], X.shape[2]))
+            
+            # Split train/validation
+            split_idx = int(len(X) * 0.8)
+            X_train, X_val = X[:split_idx], X[split_idx:]
+            y_train, y_val = y[:split_idx], y[split_idx:]
+            
+            # Train model
+            history = self.model.fit(
+                X_train, y_train,
+                validation_data=(X_val, y_val),
+                epochs=epochs,
+                batch_size=batch_size,
+                callbacks=callbacks,
+                verbose=0
+            )
         
         # Save model
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
         self.model.save(self.model_path)
         
         logger.info(f"✅ LSTM model trained and saved to {self.model_path}")
+        
+        try:
+            self.export_for_serving(export_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not export LSTM model for serving: {e}")
+        
         return history.history
     
+    def export_for_serving(self, path: str = None) -> str:
+        """
+        Convert the trained model to a lean inference format and write a JSON
+        manifest next to it with the scaler parameters and input layout, so
+        serving only needs the TFLite or ONNX runtime and numpy.
+        The format follows the file extension (.tflite or .onnx).
+        """
+        if not HAS_TENSORFLOW or self.model is None:
+            raise RuntimeError("A trained TensorFlow model is required for export")
+        from sklearn.utils.validation import check_is_fitted
+        check_is_fitted(self.scaler)
+        
+        path = path or settings.DEMAND_RUNTIME_PATH
+        fmt = os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('tflite', 'onnx'):
+            raise ValueError(f"Unsupported serving format: {fmt}")
+        
+        tf = _import_tensorflow()
+        model = self._unrolled_copy(self.model)
+        
+        if fmt == 'tflite':
+            content = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+        else:
+            import tf2onnx
+            signature = (tf.TensorSpec((None, self.sequence_length, len(self.FEATURES)),
+                                       tf.float32, name='sequences'),)
+            proto, _ = tf2onnx.convert.from_keras(model, input_signature=signature)
+            content = proto.SerializeToString()
+        
+        manifest = {
+            'format': fmt,
+            'model_file': os.path.basename(path),
+            'sequence_length': self.sequence_length,
+            'features': self.FEATURES,
+            'scaler_min': self.scaler.min_.tolist(),
+            'scaler_scale': self.scaler.scale_.tolist(),
+            'rolling_window': self.ROLLING_WINDOW,
+            'source_model': self.model_path,
+            'exported_at': datetime.now().isoformat()
+        }
+        
+        # Write-then-rename, model before manifest, so a reader that sees the
+        # new manifest always finds a complete model file
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
+        
+        manifest_path = os.path.splitext(path)[0] + '.json'
+        with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        
+        logger.info(f"✅ LSTM model exported for serving to {path}")
+        return path
+    
+    @staticmethod
+    def _unrolled_copy(model):
+        """
+        Copy of the model with statically unrolled LSTM layers.
+        The fixed 24-step loop then converts to builtin ops only, keeping a
+        dynamic batch dimension and no dependency on TF kernels at runtime.
+        """
+        from tensorflow import keras
+        
+        config = model.get_config()
+        for layer in config['layers']:
+            if layer['class_name'] == 'LSTM':
+                layer['config']['unroll'] = True
+        
+        unrolled = keras.Sequential.from_config(config)
+        unrolled.set_weights(model.get_weights())
+        return unrolled
+    
     def predict(self, recent_data: pd.DataFrame, hours_ahead: int = 24):
-        """Predict demand for the next hours"""
-        # FORCE REALISTIC PREDICTIONS (bypass TensorFlow model temporarily)
-        logger.info("🎯 Using realistic rule-based predictions with peak hours")
-        return self._rule_based_predict(recent_data, hours_ahead)
+        """
+        Predict demand for the next hours.
+        Served from the exported runtime when one is loaded, then from the
+        in-process Keras model (training processes); rule-based otherwise.
+        """
+        from app.ml.demand_runtime import demand_runtime
+        if demand_runtime.is_loaded:
+            try:
+                _, sequences = demand_runtime.prepare_batch(recent_data, group_col=None)
+                return demand_runtime.predict_batch(sequences, hours_ahead)[0].tolist()
+            except Exception as e:
+                logger.error(f"Error in serving runtime prediction: {e}. Trying TensorFlow model.")
         
-        # Original code (disabled for realistic data)
         if not HAS_TENSORFLOW or self.model is None:
             logger.warning("⚠️ TensorFlow model not available. Using rule-based prediction.")
             return self._rule_based_predict(recent_data, hours_ahead)
         
         try:
-            # Prepare features
-            features = ['hour', 'day_of_week', 'month', 'is_weekend', 'is_holiday', 
-                       'temperature', 'precipitation', 'events_count', 'previous_demand', 'rolling_mean']
-            
-            # Get last sequence
-            last_sequence = self.scaler.transform(recent_data[features].tail(self.sequence_length))
-            last_sequence = last_sequence.reshape(1, self.sequence_length, -1)
-            
-            # Generate predictions
-            predictions = []
-            for _ in range(hours_ahead):
-                pred = self.model.predict(last_sequence, verbose=0)
-                predictions.append(pred[0, 0])
-                
-                # Update sequence (simplified)
-                last_sequence = np.roll(last_sequence, -1, axis=1)
-                last_sequence[0, -1, -1] = pred[0, 0]
+            # Single route is a batch of one
+            _, sequences = self.prepare_inference_batch(recent_data, group_col=None)
+            predictions = self.predict_batch(sequences, hours_ahead)[0]
             
             logger.info(f"✅ Generated {hours_ahead} predictions")
-            return predictions
+            return predictions.tolist()
         except Exception as e:
             logger.error(f"Error in TensorFlow prediction: {e}. Falling back to rule-based.")
             return self._rule_based_predict(recent_data, hours_ahead)
     
-    def _rule_based_predict(self, recent_data: pd.DataFrame, hours_ahead: int = 24):
-        """Realistic rule-based prediction with peak hours"""
-        from datetime import datetime, timedelta
+    def prepare_inference_batch(self, recent_data: pd.DataFrame, group_col: str = 'route_id'):
+        """
+        Stack the last sequence_length rows of every group into one
+        (routes, sequence_length, features) float32 tensor.
+        Groups with fewer rows than sequence_length are skipped.
+        """
+        route_ids, sequences = last_windows(recent_data, self.FEATURES, self.sequence_length,
+                                            group_col=group_col)
+        from sklearn.exceptions import NotFittedError
+        from sklearn.utils.validation import check_is_fitted
+        try:
+            check_is_fitted(self.scaler)
+        except NotFittedError:
+            # Fitting on the inference window would rescale every route to its own range
+            raise RuntimeError("Demand scaler is not fitted; train or load the model first")
+        scale_in_place(sequences.reshape(-1, len(self.FEATURES)), self.scaler, fit=False)
         
-        # Get current hour or start from current time
-        if recent_data is not None and not recent_data.empty and 'hour' in recent_data.columns:
-            start_hour = int(recent_data.iloc[-1]['hour'])
-        else:
-            start_hour = datetime.now().hour
+        return route_ids, sequences
+    
+    def predict_batch(self, sequences: np.ndarray, hours_ahead: int = 24) -> np.ndarray:
+        """
+        Recursive multi-horizon forecast for many routes at once.
+        The whole horizon runs inside one compiled tf.function, so a batch
+        costs a single graph execution instead of one predict() per hour.
+        Returns a (routes, hours_ahead) matrix.
+        """
+        if not HAS_TENSORFLOW or self.model is None:
+            raise RuntimeError("TensorFlow model not available")
+        if len(sequences) == 0:
+            return np.empty((0, hours_ahead), dtype=np.float32)
         
-        predictions = []
-        for i in range(hours_ahead):
-            hour = (start_hour + i + 1) % 24
-            
-            # Realistic demand patterns based on typical transit usage
-            if hour in [7, 8]:  # Morning peak (7am-9am)
-                base_demand = 180 + np.random.uniform(-15, 20)
-            elif hour in [17, 18, 19]:  # Evening peak (5pm-8pm)
-                base_demand = 195 + np.random.uniform(-18, 25)
-            elif hour in [9, 10, 11, 12]:  # Late morning
-                base_demand = 95 + np.random.uniform(-10, 15)
-            elif hour in [13, 14, 15, 16]:  # Afternoon
-                base_demand = 105 + np.random.uniform(-12, 18)
-            elif hour in [20, 21, 22]:  # Evening
-                base_demand = 65 + np.random.uniform(-8, 12)
-            elif hour in [23, 0, 1, 2, 3, 4, 5]:  # Night
-                base_demand = 25 + np.random.uniform(-5, 8)
-            else:  # Early morning (6am)
-                base_demand = 55 + np.random.uniform(-8, 12)
-            
-            predictions.append(max(10, base_demand))
+        if self._rollout_fn is None or self._rollout_model is not self.model:
+            self._rollout_fn = self._build_rollout(self.model)
+            self._rollout_model = self.model
+        
+        tf = _import_tensorflow()
+        predictions = self._rollout_fn(
+            tf.convert_to_tensor(sequences, dtype=tf.float32),
+            tf.constant(hours_ahead, dtype=tf.int32),
+            tf.constant(self.scaler.scale_, dtype=tf.float32),
+            tf.constant(self.scaler.min_, dtype=tf.float32)
+        )
+        return predictions.numpy()
+    
+    def predict_routes(self, recent_data: pd.DataFrame, hours_ahead: int = 24,
+                       group_col: str = 'route_id') -> dict:
+        """Forecast every route in recent_data with one batched rollout"""
+        route_ids, sequences = self.prepare_inference_batch(recent_data, group_col=group_col)
+        predictions = self.predict_batch(sequences, hours_ahead)
+        return {int(route_id): row.tolist() for route_id, row in zip(route_ids, predictions)}
+    
+    def _build_rollout(self, model):
+        """Compile the recursive horizon loop for a given Keras model"""
+        tf = _import_tensorflow()
+        length, feature_count = self.sequence_length, len(self.FEATURES)
+        previous_idx = self.FEATURES.index('previous_demand')
+        rolling_idx = self.FEATURES.index('rolling_mean')
+        rolling_window = self.ROLLING_WINDOW
+        previous_mask = tf.one_hot(previous_idx, feature_count)
+        rolling_mask = tf.one_hot(rolling_idx, feature_count)
+        
+        @tf.function(input_signature=[
+            tf.TensorSpec(shape=(None, length, feature_count), dtype=tf.float32),
+            tf.TensorSpec(shape=(), dtype=tf.int32),
+            tf.TensorSpec(shape=(feature_count,), dtype=tf.float32),
+            tf.TensorSpec(shape=(feature_count,), dtype=tf.float32)
+        ])
+        def rollout(sequences, hours_ahead, scale, minimum):
+            outputs = tf.TensorArray(tf.float32, size=hours_ahead)
+            for step in tf.range(hours_ahead):
+                prediction = model(sequences, training=False)[:, 0]
+                outputs = outputs.write(step, prediction)
+                
+                # Same recurrence as demand_runtime.next_step_features()
+                past = sequences[:, -(rolling_window - 1):, previous_idx]
+                past = (past - minimum[previous_idx]) / scale[previous_idx]
+                last_rolling = (sequences[:, -1, rolling_idx] - minimum[rolling_idx]) / scale[rolling_idx]
+                last_demand = rolling_window * last_rolling - tf.reduce_sum(past, axis=1)
+                rolling = (tf.reduce_sum(past[:, 1:], axis=1) + last_demand + prediction) / rolling_window
+                
+                next_step = (
+                    sequences[:, -1] * (1 - previous_mask - rolling_mask)
+                    + (last_demand * scale[previous_idx] + minimum[previous_idx])[:, None] * previous_mask
+                    + (rolling * scale[rolling_idx] + minimum[rolling_idx])[:, None] * rolling_mask
+                )
+                sequences = tf.concat([sequences[:, 1:, :], next_step[:, None, :]], axis=1)
+            return tf.transpose(outputs.stack())
+        
+        return rollout
+    
+    def _rule_based_predict(self, recent_data: pd.DataFrame, hours_ahead: int = 24, seed: int = None):
+        """Realistic rule-based prediction with peak hours (vectorized baseline)"""
+        from app.ml.demand_baseline import demand_baseline
+        
+        # Continue from the latest observation, or from now
+        start, route_id = datetime.now(), 0
+        if recent_data is not None and not recent_data.empty:
+            last = recent_data.iloc[-1]
+            if 'timestamp' in recent_data.columns:
+                start = pd.Timestamp(last['timestamp']).to_pydatetime()
+            elif 'hour' in recent_data.columns:
+                start = start.replace(hour=int(last['hour']))
+            if 'route_id' in recent_data.columns:
+                route_id = int(last['route_id'])
         
-        return predictions
+        predictions = demand_baseline.forecast([route_id], hours_ahead, start=start, seed=seed)
+        return predictions[route_id].tolist()
     
     def generate_synthetic_data(self, num_samples: int = 1000):
         """Generate synthetic training data"""
@@ -217,7 +524,7 @@ class LSTMDemandPredictor:
         
         data['demand'] = (base_demand + hour_effect + weekend_effect + holiday_effect + noise).clip(0)
         data['previous_demand'] = data['demand'].shift(1).fillna(method='bfill')
-        data['rolling_mean'] = data['demand'].rolling(window=6).mean().fillna(method='bfill')
+        data['rolling_mean'] = data['demand'].rolling(window=self.ROLLING_WINDOW).mean().fillna(method='bfill')
         
         logger.info("✅ Synthetic data generated")
         return data
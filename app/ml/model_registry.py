@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(path: str) -> str:
+    """Checksum of a file, or of every file under a directory"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                digest.update(_sha256(file_path).encode())
+        return digest.hexdigest()
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path: str, payload: Dict[str, Any]):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """
+    Versioned model registry on the shared models/ volume.
+
+    Layout: <root>/<name>/<version>/ holds the artifacts plus registry.json
+    (checksums and metadata); <root>/<name>/ACTIVE points at the served
+    version. Versions are immutable and published with a directory rename,
+    and activation is a single file rename, so every worker sees either the
+    old or the new version.
+
+    Workers register a loader per model and call poll() (or start_polling())
+    to pick up activations. A new version is loaded and checksum-verified
+    off to the side and only then swapped in (read-copy-update): requests in
+    flight keep the object they already hold.
+    """
+
+    MANIFEST = 'registry.json'
+    ACTIVE = 'ACTIVE'
+
+    def __init__(self, root: str = None):
+        self.root = root or settings.MODEL_REGISTRY_PATH
+        self._loaders: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._current: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._poll_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ----- publishing (trainers, deploy tooling) -----
+
+    def publish(self, name: str, artifacts: Dict[str, str], metadata: Dict[str, Any] = None,
+                activate: bool = True) -> Dict[str, Any]:
+        """
+        Copy artifacts (files or directories, keyed by role) into a new
+        immutable version and optionally make it active.
+        """
+        model_dir = os.path.join(self.root, name)
+        staging_dir = os.path.join(model_dir, f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging_dir)
+
+        try:
+            files = {}
+            for role, source in artifacts.items():
+                target = os.path.join(staging_dir, os.path.basename(os.path.normpath(source)))
+                if os.path.isdir(source):
+                    shutil.copytree(source, target)
+                else:
+                    shutil.copyfile(source, target)
+                files[role] = {'path': os.path.basename(target), 'sha256': _sha256(target)}
+
+            checksum = hashlib.sha256(
+                ''.join(files[role]['sha256'] for role in sorted(files)).encode()
+            ).hexdigest()
+            version = f"{datetime.now():%Y%m%d%H%M%S}-{checksum[:8]}"
+            manifest = {
+                'name': name,
+                'version': version,
+                'checksum': checksum,
+                'files': files,
+                'metadata': metadata or {},
+                'created_at': datetime.now().isoformat()
+            }
+            _write_json(os.path.join(staging_dir, self.MANIFEST), manifest)
+            if os.path.exists(os.path.join(model_dir, version)):
+                # Same artifacts published twice within a second
+                shutil.rmtree(staging_dir)
+            else:
+                os.rename(staging_dir, os.path.join(model_dir, version))
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"✅ Published {name} version {version}")
+        self._mirror(manifest, status='published')
+        if activate:
+            self.activate(name, version)
+        return self.get_version(name, version)
+
+    def activate(self, name: str, version: str) -> Dict[str, Any]:
+        """Point the model at a published version (deploy or rollback)"""
+        manifest = self.get_version(name, version)
+        if manifest is None:
+            raise ValueError(f"Unknown version {version} for model '{name}'")
+        self.verify(manifest)
+
+        _write_json(os.path.join(self.root, name, self.ACTIVE), {
+            'version': version,
+            'activated_at': datetime.now().isoformat()
+        })
+        logger.info(f"✅ {name} version {version} activated")
+        self._mirror(manifest, status='active')
+        return manifest
+
+    # ----- lookups -----
+
+    def list_models(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith('.') and os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def list_versions(self, name: str) -> List[Dict[str, Any]]:
+        """Published versions, newest first, flagging the active one"""
+        model_dir = os.path.join(self.root, name)
+        if not os.path.isdir(model_dir):
+            return []
+        active = self.get_active_version(name)
+        versions = [
+            self.get_version(name, version)
+            for version in os.listdir(model_dir)
+            if not version.startswith('.') and os.path.exists(os.path.join(model_dir, version, self.MANIFEST))
+        ]
+        versions.sort(key=lambda manifest: manifest['created_at'], reverse=True)
+        return [{**manifest, 'active': manifest['version'] == active} for manifest in versions]
+
+    def get_version(self, name: str, version: str) -> Optional[Dict[str, Any]]:
+        """Manifest of a version with absolute artifact paths"""
+        version_dir = os.path.join(self.root, name, version)
+        path = os.path.join(version_dir, self.MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['paths'] = {
+            role: os.path.join(version_dir, entry['path']) for role, entry in manifest['files'].items()
+        }
+        return manifest
+
+    def get_active_version(self, name: str) -> Optional[str]:
+        path = os.path.join(self.root, name, self.ACTIVE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['version']
+
+    def get_active(self, name: str) -> Optional[Dict[str, Any]]:
+        version = self.get_active_version(name)
+        return self.get_version(name, version) if version else None
+
+    def verify(self, manifest: Dict[str, Any]):
+        """Raise if any artifact no longer matches its recorded checksum"""
+        for role, entry in manifest['files'].items():
+            if _sha256(manifest['paths'][role]) != entry['sha256']:
+                raise ValueError(f"Checksum mismatch for {manifest['name']} {manifest['version']} ({role})")
+
+    # ----- serving side -----
+
+    def register_loader(self, name: str, loader: Callable[[Dict[str, Any]], Any]):
+        """loader(manifest) builds (and installs) the served object for a version"""
+        self._loaders[name] = loader
+
+    def current(self, name: str) -> Optional[Any]:
+        """Object loaded for the active version in this worker"""
+        entry = self._current.get(name)
+        return entry[1] if entry else None
+
+    def current_version(self, name: str) -> Optional[str]:
+        entry = self._current.get(name)
+        return entry[0] if entry else None
+
+    def poll(self) -> Dict[str, str]:
+        """Load any model whose active version changed. Returns {name: version} swapped"""
+        swapped = {}
+        for name, loader in list(self._loaders.items()):
+            version = self.get_active_version(name)
+            if version is None or version == self.current_version(name):
+                continue
+            try:
+                manifest = self.get_version(name, version)
+                self.verify(manifest)
+                loaded = loader(manifest)
+            except Exception as e:
+                logger.error(f"❌ Could not load {name} version {version}: {e}. Keeping current version.")
+                continue
+
+            # Swap the reference only once the new version is fully loaded
+            with self._lock:
+                self._current[name] = (version, loaded)
+            swapped[name] = version
+            logger.info(f"🔄 {name} hot-reloaded to version {version}")
+        return swapped
+
+    def start_polling(self, interval: float = None):
+        """Poll for new active versions in a daemon thread"""
+        interval = interval or settings.MODEL_REGISTRY_POLL_SECONDS
+        if self._poll_thread is not None and self._poll_thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.warning(f"⚠️ Model registry poll failed: {e}")
+
+        self._stop.clear()
+        self._poll_thread = threading.Thread(target=run, name='model-registry-poll', daemon=True)
+        self._poll_thread.start()
+
+    def stop_polling(self):
+        self._stop.set()
+
+    def _mirror(self, manifest: Dict[str, Any], status: str):
+        """Best-effort copy of version metadata into Mongo ml_models"""
+        if not settings.MODEL_REGISTRY_MONGO_MIRROR:
+            return
+        try:
+            from app.db.mongodb import mongodb_conn
+            collection = mongodb_conn.get_collection('ml_models')
+            if status == 'active':
+                collection.update_many({'name': manifest['name'], 'status': 'active'},
+                                       {'$set': {'status': 'published'}})
+            record = {key: value for key, value in manifest.items() if key != 'paths'}
+            collection.update_one(
+                {'name': manifest['name'], 'version': manifest['version']},
+                {'$set': {**record, 'status': status, 'updated_at': datetime.now()}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not mirror {manifest['name']} {manifest['version']} to MongoDB: {e}")
+
+
+def register_serving_loaders(registry: ModelRegistry):
+    """Wire registry versions into the serving singletons"""
+
+    def load_demand_lstm(manifest):
+        from app.ml.demand_runtime import demand_runtime
+        if not demand_runtime.load(manifest['paths']['model']):
+            raise FileNotFoundError(manifest['paths']['model'])
+        return demand_runtime
+
+    def load_demand_gbm(manifest):
+        from app.ml.demand_models import demand_model_registry, SklearnDemandModel
+        model = SklearnDemandModel.from_file(manifest['paths']['model'])
+        model.version = f"{SklearnDemandModel.name}-{manifest['version']}"
+        demand_model_registry.set(SklearnDemandModel.name, model)
+        return model
+
+    def load_bert_sentiment(manifest):
+        from app.ml.bert_model import bert_analyzer
+        if bert_analyzer.load_model(manifest['paths']['model']) is None:
+            raise RuntimeError("BERT pipeline could not be built")
+        return bert_analyzer.pipeline
+
+    def load_user_segmentation(manifest):
+        from app.services.segmentation_store import segmentation_store
+        return segmentation_store.install_published(manifest)
+
+    registry.register_loader('demand_lstm', load_demand_lstm)
+    registry.register_loader('demand_gbm', load_demand_gbm)
+    registry.register_loader('bert_sentiment', load_bert_sentiment)
+    registry.register_loader('user_segmentation', load_user_segmentation)
+
+
+# Global instance
+model_registry = ModelRegistry()
@@ -48,12 +48,35 @@ class UserCluster(BaseModel):
     characteristics: Dict[str, Any]
 
 
+class UserFeatures(BaseModel):
+    """Segmentation features of a single user"""
+    user_id: Optional[int] = Field(None, description="User ID")
+    usage_frequency: float
+    avg_spending: float
+    route_diversity: float
+    peak_hour_usage_ratio: float
+    weekend_usage_ratio: float
+    total_transactions: float
+
+
+class UserAssignmentRequest(BaseModel):
+    """Cluster assignment request for new or changed users"""
+    users: List[UserFeatures] = Field(..., min_length=1, description="Users to assign")
+
+
+class SegmentationSweepRequest(BaseModel):
+    """DBSCAN parameter sweep request"""
+    eps_values: List[float] = Field([0.3, 0.5, 0.8, 1.0], min_length=1, max_length=20, description="eps grid")
+    min_samples_values: List[int] = Field([3, 5, 10], min_length=1, max_length=20, description="min_samples grid")
+
+
 class UserSegmentationResponse(BaseModel):
     """User segmentation response"""
     clusters: List[UserCluster]
     outliers_count: int
     total_users: int
     silhouette_score: Optional[float]
+    data_source: str  # feature_store | synthetic (profiles are made up)
     generated_at: datetime
 
 
@@ -78,8 +101,14 @@ class KPIResponse(BaseModel):
     total_revenue: float
     avg_occupancy: float
     routes_active: int
-    peak_hour: int
-    sentiment_avg: float
+    peak_hour: Optional[int] = None
+    sentiment_avg: Optional[float] = None
+    passenger_growth: Optional[float] = None
+    revenue_growth: Optional[float] = None
+    period: str = "daily"
+    data_available: bool = True
+    partial: bool = False  # a source failed or timed out; not cacheable
+    window: Optional[Dict[str, str]] = None
     generated_at: datetime
 
 
@@ -88,14 +117,20 @@ class ReportRequest(BaseModel):
     report_type: str = Field(..., description="Type of report")
     date_from: datetime
     date_to: datetime
-    filters: Optional[Dict[str, Any]] = Field(None, description="Additional filters")
-    format: str = Field("json", description="Output format: json, pdf, excel")
+    filters: Optional[Dict[str, Any]] = Field(None, description="Additional filters: route_ids")
+    format: str = Field("json", description="Output format: json, csv, parquet, arrow")
+    compression: Optional[str] = Field(None, description="gzip (json, csv), snappy/gzip/zstd (parquet), lz4/zstd (arrow)")
 
 
 class ReportResponse(BaseModel):
-    """Report response"""
+    """Report job status"""
     report_id: str
     report_type: str
-    status: str
-    download_url: Optional[str]
-    generated_at: datetime
+    status: str = Field(..., description="queued, running, completed or failed")
+    format: str = "json"
+    rows: int = 0
+    status_url: Optional[str] = None
+    download_url: Optional[str] = None
+    error: Optional[str] = None
+    submitted_at: Optional[datetime] = None
+    generated_at: Optional[datetime] = None
@@ -1,3 +1,3 @@
-from .demand_service import demand_service
-
-__all__ = ['demand_service']
+"""
+Application services
+"""
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Tuple
+
+from app.core.config import settings
+from app.services.kpi_service import KPIEngine, PERIOD_DAYS, kpi_engine
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardComposer:
+    """
+    Builds the KPI and dashboard views from independent fragments
+    (ClickHouse summary, MongoDB sentiment, realtime transactions) fetched
+    concurrently, so a view takes as long as its slowest fragment instead
+    of the sum of all of them. Each fragment has its own cache key in the
+    KPI engine and its own timeout: a fragment that fails or times out is
+    left empty and reported in `fragments` while the rest is still served.
+
+    The database drivers are synchronous, so every fragment runs in the
+    default thread pool. A timed out fetch keeps running in its thread and
+    still fills its cache entry, which the next request then picks up;
+    requests arriving meanwhile wait on that same fetch instead of starting
+    another one, so a hung source holds at most one thread per fragment.
+    """
+
+    def __init__(self, engine: KPIEngine = None, timeout: float = None):
+        self.engine = engine or kpi_engine
+        self.timeout = timeout
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+
+    async def compose_kpis(self, period: str = 'daily', now: datetime = None) -> Dict[str, Any]:
+        days = PERIOD_DAYS[period]
+        values, fragments = await self.gather({
+            'summary': lambda: self.engine.fetch_summary(days, now=now),
+            'sentiment': lambda: self.engine.fetch_sentiment(days, now=now),
+        }, scope=(days, now))
+        summary = values['summary'] or self.engine.empty_summary(days, now=now)
+        return {
+            **self.engine.build_kpis(period, summary, values['sentiment']),
+            'partial': any(fragment['status'] != 'ok' for fragment in fragments.values())
+        }
+
+    async def compose_dashboard(self, period: str = 'daily', top_routes: int = 5,
+                                now: datetime = None) -> Dict[str, Any]:
+        days = PERIOD_DAYS[period]
+        values, fragments = await self.gather({
+            'summary': lambda: self.engine.fetch_summary(days, now=now),
+            'sentiment': lambda: self.engine.fetch_sentiment(days, now=now),
+            'realtime': lambda: self.engine.fetch_realtime(now=now),
+        }, scope=(days, now))
+        summary = values['summary'] or self.engine.empty_summary(days, now=now)
+        dashboard = self.engine.build_dashboard(
+            period, summary, values['sentiment'], values['realtime'], top_routes=top_routes
+        )
+        return {
+            **dashboard,
+            'partial': any(fragment['status'] != 'ok' for fragment in fragments.values()),
+            'fragments': fragments
+        }
+
+    async def gather(self, fetchers: Dict[str, Callable[[], Any]],
+                     scope: Tuple = ()) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Run every fetcher concurrently; failed fragments come back as None.
+        Fetchers with the same name and scope share one in-flight call.
+        """
+        results = await asyncio.gather(*(
+            self._fetch(name, fetch, (name, *scope)) for name, fetch in fetchers.items()
+        ))
+        values = {name: value for name, value, _ in results}
+        fragments = {name: status for name, _, status in results}
+        return values, fragments
+
+    async def _fetch(self, name: str, fetch: Callable[[], Any], key: Tuple) -> Tuple[str, Any, Dict[str, Any]]:
+        timeout = self.timeout or settings.DASHBOARD_FRAGMENT_TIMEOUT_SECONDS
+        started = time.perf_counter()
+        value, status = None, {'status': 'ok'}
+        try:
+            task = self._inflight.get(key)
+            if task is None:
+                task = self._inflight[key] = asyncio.ensure_future(asyncio.to_thread(fetch))
+                task.add_done_callback(lambda done: self._finished(key, done))
+            # shield: a timeout here must not cancel the fetch other requests share
+            value = await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Dashboard fragment '{name}' timed out after {timeout}s")
+            status = {'status': 'timeout'}
+        except Exception as e:
+            logger.warning(f"⚠️ Dashboard fragment '{name}' failed: {e}")
+            status = {'status': 'error', 'error': str(e)}
+        status['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return name, value, status
+
+    def _finished(self, key: Tuple, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here when every waiter already timed out
+
+
+# Global instance
+dashboard_composer = DashboardComposer()
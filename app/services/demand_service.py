@@ -84,6 +84,75 @@ class DemandDataService:
             logger.error(f"❌ Error fetching historical demand: {e}")
             return None
     
+    def get_hourly_profile(self, days: int = 28) -> pd.DataFrame:
+        """
+        Hourly rollup for the demand baseline: average passengers per
+        route, day of week (0=Monday) and hour over the last N days
+        """
+        try:
+            if not clickhouse_conn.client:
+                clickhouse_conn.connect()
+            
+            # Averaged over the days that had traffic in each slot
+            query = """
+            SELECT 
+                route_id,
+                toDayOfWeek(timestamp) - 1 as day_of_week,
+                toHour(timestamp) as hour,
+                sum(passenger_count) / uniqExact(toDate(timestamp)) as avg_demand
+            FROM transaction_records
+            WHERE timestamp >= now() - INTERVAL %(days)s DAY
+            GROUP BY route_id, day_of_week, hour
+            """
+            
+            columns = ['route_id', 'day_of_week', 'hour', 'avg_demand']
+            result = clickhouse_conn.execute(query, {'days': days}, columnar=True)
+            if not result or len(result[0]) == 0:
+                logger.warning("⚠️ No hourly demand rollup found in ClickHouse")
+                return None
+            
+            df = pd.DataFrame(dict(zip(columns, result)))
+            logger.info(f"✅ Fetched hourly demand profile ({len(df)} slots)")
+            return df
+            
+        except Exception as e:
+            logger.error(f"❌ Error fetching hourly demand profile: {e}")
+            return None
+    
+    def get_route_hourly_demand(self, days: int = 90) -> pd.DataFrame:
+        """
+        Passengers per route and hour over the last N days, in time order
+        (training data for the served demand model)
+        """
+        try:
+            if not clickhouse_conn.client:
+                clickhouse_conn.connect()
+            
+            query = """
+            SELECT 
+                route_id,
+                toStartOfHour(timestamp) as hour_start,
+                sum(passenger_count) as demand
+            FROM transaction_records
+            WHERE timestamp >= now() - INTERVAL %(days)s DAY
+            GROUP BY route_id, hour_start
+            ORDER BY hour_start, route_id
+            """
+            
+            columns = ['route_id', 'timestamp', 'demand']
+            result = clickhouse_conn.execute(query, {'days': days}, columnar=True)
+            if not result or len(result[0]) == 0:
+                logger.warning("⚠️ No hourly route demand found in ClickHouse")
+                return None
+            
+            df = pd.DataFrame(dict(zip(columns, result)))
+            logger.info(f"✅ Fetched hourly route demand ({len(df)} rows)")
+            return df
+            
+        except Exception as e:
+            logger.error(f"❌ Error fetching hourly route demand: {e}")
+            return None
+    
     def get_realtime_metrics(self, route_id: int = None) -> dict:
         """Get real-time demand metrics"""
         try:
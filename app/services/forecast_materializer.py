@@ -0,0 +1,277 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.db.clickhouse import clickhouse_conn
+from app.db.redis_cache import redis_conn
+from app.ml.demand_baseline import demand_baseline
+from app.ml.demand_models import demand_model_registry
+
+logger = logging.getLogger(__name__)
+
+
+DEMAND_FORECASTS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS demand_forecasts (
+    route_id UInt32,
+    target_hour DateTime,
+    horizon UInt16,
+    predicted_demand Float32,
+    model_version String,
+    data_watermark DateTime,
+    generated_at DateTime
+) ENGINE = ReplacingMergeTree(generated_at)
+ORDER BY (route_id, target_hour, horizon)
+"""
+
+
+class ForecastMaterializer:
+    """
+    Precomputes demand forecasts for every active route.
+    Each run scores all routes x hours in one model call and writes the
+    result to ClickHouse (history, keyed by target hour and horizon) and
+    Redis (latest forecast per route), so the forecast endpoint is a key
+    lookup and forecast-vs-actual is a single join.
+    """
+
+    CACHE_PREFIX = "demand:forecast:materialized"
+
+    def run(self, hours_ahead: int = None, route_ids: List[int] = None) -> Dict[str, Any]:
+        """Materialize forecasts for all active routes"""
+        hours_ahead = hours_ahead or settings.FORECAST_HORIZON_HOURS
+        route_ids = route_ids or self.get_active_routes()
+        watermark = self.get_watermark()
+        generated_at = datetime.now().replace(microsecond=0)
+
+        # Trained model when available, vectorized baseline otherwise
+        model = demand_model_registry.get() or demand_baseline
+        forecasts = {
+            # Stored as Float32 in ClickHouse; keep Redis identical to it
+            route_id: predictions.astype(np.float32)
+            for route_id, predictions in model.forecast(route_ids, hours_ahead, start=generated_at).items()
+        }
+        target_hours = pd.date_range(
+            pd.Timestamp(generated_at).floor('h') + pd.Timedelta(hours=1), periods=hours_ahead, freq='h'
+        ).to_pydatetime().tolist()
+
+        self._write_clickhouse(forecasts, target_hours, model.version, watermark, generated_at)
+        for route_id, predictions in forecasts.items():
+            self._write_cache(self._build_document(
+                route_id, predictions, target_hours, model.version, watermark, generated_at
+            ))
+
+        logger.info(f"✅ Materialized {hours_ahead}h forecasts for {len(route_ids)} routes "
+                    f"(model {model.version}, watermark {watermark})")
+        return {
+            'routes': len(route_ids),
+            'hours_ahead': hours_ahead,
+            'model_version': model.version,
+            'data_watermark': watermark.isoformat() if watermark else None,
+            'generated_at': generated_at.isoformat()
+        }
+
+    def get_latest(self, route_id: int) -> Optional[Dict[str, Any]]:
+        """Latest materialized forecast for a route (Redis, then ClickHouse)"""
+        try:
+            cached = redis_conn.get(self._cache_key(route_id))
+            if cached:
+                return cached
+        except Exception:
+            logger.debug("Redis not available for materialized forecasts")
+
+        try:
+            result = clickhouse_conn.execute(
+                """
+                SELECT target_hour, horizon, predicted_demand, model_version, data_watermark, generated_at
+                FROM demand_forecasts FINAL
+                WHERE route_id = %(route_id)s
+                  AND generated_at = (SELECT max(generated_at) FROM demand_forecasts WHERE route_id = %(route_id)s)
+                ORDER BY horizon
+                """,
+                {'route_id': route_id}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read materialized forecast for route {route_id}: {e}")
+            return None
+
+        if not result:
+            return None
+
+        _, _, _, model_version, watermark, generated_at = result[0]
+        document = self._build_document(
+            route_id, [row[2] for row in result], [row[0] for row in result],
+            model_version, watermark, generated_at
+        )
+        self._write_cache(document)
+        return document
+
+    def get_forecast(self, route_id: int, hours: int, now: datetime = None) -> Optional[Dict[str, Any]]:
+        """
+        Next `hours` hours of the latest materialized forecast, skipping
+        target hours that already passed. None if the run does not cover them.
+        """
+        document = self.get_latest(route_id)
+        if document is None:
+            return None
+
+        now = (now or datetime.now()).isoformat()
+        upcoming = [point for point in document['forecast'] if point['target_hour'] > now][:hours]
+        if len(upcoming) < hours:
+            return None
+
+        return {
+            **document,
+            'forecast': [{**point, 'hour': i + 1} for i, point in enumerate(upcoming)]
+        }
+
+    def compute_forecast(self, route_id: int, hours: int) -> Dict[str, Any]:
+        """
+        Forecast one route on request (when nothing is materialized yet), in
+        the same document schema as materialized forecasts
+        """
+        generated_at = datetime.now().replace(microsecond=0)
+        model = demand_model_registry.get() or demand_baseline
+        predictions = model.forecast([route_id], hours, start=generated_at)[route_id]
+        target_hours = pd.date_range(
+            pd.Timestamp(generated_at).floor('h') + pd.Timedelta(hours=1), periods=hours, freq='h'
+        ).to_pydatetime().tolist()
+        return self._build_document(route_id, predictions, target_hours, model.version, None, generated_at)
+
+    def get_history(self, route_id: int, days: int = 7, horizon: int = 1) -> Dict[str, Any]:
+        """
+        Forecast vs actual demand for past hours at a fixed horizon.
+        Actual demand is the hour's passengers. Hours without records have
+        no actual (None) and are left out of the MAE and MAPE instead of
+        counting as zero demand.
+        """
+        query = """
+        SELECT
+            f.target_hour,
+            f.predicted_demand,
+            a.actual_demand
+        FROM (
+            SELECT target_hour, argMax(predicted_demand, generated_at) as predicted_demand
+            FROM demand_forecasts
+            WHERE route_id = %(route_id)s
+              AND horizon = %(horizon)s
+              AND target_hour >= now() - INTERVAL %(days)s DAY
+              AND target_hour <= now()
+            GROUP BY target_hour
+        ) AS f
+        LEFT JOIN (
+            SELECT toStartOfHour(timestamp) as target_hour, sum(passenger_count) as actual_demand
+            FROM transaction_records
+            WHERE route_id = %(route_id)s
+              AND timestamp >= now() - INTERVAL %(days)s DAY
+            GROUP BY target_hour
+        ) AS a USING target_hour
+        ORDER BY f.target_hour
+        SETTINGS join_use_nulls = 1
+        """
+        target_hours, predicted, actual = clickhouse_conn.execute(
+            query, {'route_id': route_id, 'days': days, 'horizon': horizon}, columnar=True
+        ) or ([], [], [])
+
+        predicted = np.asarray(predicted, dtype=np.float64)
+        actual = np.array([np.nan if value is None else value for value in actual], dtype=np.float64)
+        observed = ~np.isnan(actual)
+        errors = np.abs(predicted[observed] - actual[observed])
+
+        return {
+            'route_id': route_id,
+            'horizon': horizon,
+            'history': [
+                {'target_hour': hour.isoformat(), 'predicted_demand': float(p),
+                 'actual_demand': float(a) if has_actual else None}
+                for hour, p, a, has_actual in zip(target_hours, predicted, actual, observed)
+            ],
+            'observed_hours': int(observed.sum()),
+            'mae': float(errors.mean()) if len(errors) else None,
+            'mape': float((errors / actual[observed]).mean() * 100) if len(errors) else None
+        }
+
+    def get_active_routes(self, days: int = None) -> List[int]:
+        """Routes with transactions in the recent window"""
+        days = days or settings.FORECAST_ACTIVE_ROUTE_DAYS
+        try:
+            result = clickhouse_conn.execute(
+                """
+                SELECT DISTINCT route_id FROM transaction_records
+                WHERE timestamp >= now() - INTERVAL %(days)s DAY
+                ORDER BY route_id
+                """,
+                {'days': days}
+            )
+            if result:
+                return [int(row[0]) for row in result]
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load active routes: {e}")
+
+        logger.warning("⚠️ No active routes found, using configured fallback routes")
+        return list(settings.FORECAST_FALLBACK_ROUTES)
+
+    def get_watermark(self) -> Optional[datetime]:
+        """Latest transaction timestamp the forecasts are based on"""
+        try:
+            result = clickhouse_conn.execute("SELECT max(timestamp) FROM transaction_records")
+            return result[0][0] if result and result[0][0] else None
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read data watermark: {e}")
+            return None
+
+    def _cache_key(self, route_id: int) -> str:
+        return f"{self.CACHE_PREFIX}:{route_id}"
+
+    def _build_document(self, route_id, predictions, target_hours, model_version,
+                        watermark, generated_at) -> Dict[str, Any]:
+        return {
+            'route_id': int(route_id),
+            'forecast': [
+                {'hour': i + 1, 'target_hour': target.isoformat(), 'demand': float(value)}
+                for i, (target, value) in enumerate(zip(target_hours, predictions))
+            ],
+            'model_version': model_version,
+            'data_watermark': watermark.isoformat() if watermark else None,
+            'generated_at': generated_at.isoformat()
+        }
+
+    def _write_cache(self, document: Dict[str, Any]):
+        try:
+            redis_conn.set(self._cache_key(document['route_id']), document, ttl=settings.FORECAST_CACHE_TTL)
+        except Exception:
+            logger.debug("Could not cache materialized forecast")
+
+    def _write_clickhouse(self, forecasts: Dict[int, np.ndarray], target_hours: List[datetime],
+                          model_version: str, watermark: Optional[datetime], generated_at: datetime):
+        """Append one row per (route, hour); ReplacingMergeTree keeps the latest run"""
+        hours_ahead = len(target_hours)
+        route_ids = np.fromiter(forecasts.keys(), dtype=np.int64)
+        values = np.vstack(list(forecasts.values())) if len(route_ids) else np.empty((0, hours_ahead))
+        rows = len(route_ids) * hours_ahead
+
+        columns = [
+            np.repeat(route_ids, hours_ahead).tolist(),
+            target_hours * len(route_ids),
+            np.tile(np.arange(1, hours_ahead + 1), len(route_ids)).tolist(),
+            values.ravel().astype(np.float32).tolist(),
+            [model_version] * rows,
+            [watermark or generated_at] * rows,
+            [generated_at] * rows,
+        ]
+        try:
+            clickhouse_conn.execute(DEMAND_FORECASTS_TABLE_DDL)
+            clickhouse_conn.execute(
+                "INSERT INTO demand_forecasts (route_id, target_hour, horizon, predicted_demand, "
+                "model_version, data_watermark, generated_at) VALUES",
+                columns,
+                columnar=True
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write materialized forecasts to ClickHouse: {e}")
+
+
+# Global instance
+forecast_materializer = ForecastMaterializer()
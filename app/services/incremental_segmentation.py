@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.db.clickhouse import clickhouse_conn
+from app.services.segmentation_store import segmentation_store
+from app.services.user_feature_service import user_feature_service
+
+logger = logging.getLogger(__name__)
+
+
+USER_SEGMENTS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS user_segments (
+    user_id UInt64,
+    cluster_id Int32,
+    segmentation_version String,
+    assigned_at DateTime
+) ENGINE = ReplacingMergeTree(assigned_at)
+ORDER BY user_id
+"""
+
+
+class IncrementalSegmentation:
+    """
+    Places new or changed riders into the fitted segmentation.
+    Users updated since the last run are assigned through the core-sample
+    index; a full refit only happens when assignment drift crosses the
+    configured thresholds, so nightly cost scales with churn. Refits are
+    published to the model registry, from which API workers reload them.
+    """
+
+    def __init__(self, state_path: str = None, store=None, registry=None):
+        self.state_path = state_path or os.path.join(
+            settings.SEGMENTATION_STORE_PATH, 'incremental_state.json'
+        )
+        self.store = store or segmentation_store
+        self.registry = registry
+
+    def run(self, force_refit: bool = False) -> Dict[str, Any]:
+        """
+        Assign the feature-store delta and refit if drift requires it.
+        Raises RuntimeError when the segmentation was not fitted on the
+        feature store (SEGMENTATION_USE_FEATURE_STORE off or the store
+        empty): real riders would be placed in synthetic clusters.
+        """
+        state = self.load_state()
+        result = self._require_feature_store(self.store.get_or_fit())
+
+        if state.get('version') != result['version']:
+            state = self._reset_state(state, result)
+        state['last_run_at'] = datetime.now().isoformat()
+
+        watermark = datetime.fromisoformat(state['watermark']) if state.get('watermark') else None
+        delta = user_feature_service.load_features(
+            min_transactions=settings.SEGMENTATION_MIN_TRANSACTIONS,
+            updated_since=watermark
+        )
+
+        if delta is None or delta.empty:
+            # The watermark stays at the newest transaction seen: nothing is newer yet
+            self.save_state(state)
+            logger.info("ℹ️  No new or changed users since last run")
+            return {'status': 'unchanged', 'assigned': 0, 'version': result['version'], 'refit': False}
+
+        labels = result['model'].assign_many(delta)
+        self._write_assignments(delta, labels, result['version'])
+
+        for label, count in zip(*np.unique(labels, return_counts=True)):
+            state['counts'][str(int(label))] = state['counts'].get(str(int(label)), 0) + int(count)
+        state['watermark'] = pd.Timestamp(delta['last_seen'].max()).to_pydatetime().isoformat()
+
+        drift = self.compute_drift(result['labels'], state['counts'])
+        refit = force_refit or drift['exceeded']
+
+        if refit:
+            logger.info(f"🔄 Drift threshold exceeded ({drift}). Refitting segmentation...")
+            self.store.refresh_snapshot()
+            result = self._require_feature_store(self.store.get_or_fit())
+            self.store.publish(result, registry=self.registry)
+            state = self._reset_state(state, result)
+            state['last_refit_at'] = datetime.now().isoformat()
+
+        self.save_state(state)
+
+        logger.info(f"✅ Assigned {len(delta)} users ({drift['noise_rate']:.1%} to outliers)")
+        return {
+            'status': 'refitted' if refit else 'assigned',
+            'assigned': int(len(delta)),
+            'drift': drift,
+            'refit': refit,
+            'version': result['version']
+        }
+
+    @staticmethod
+    def compute_drift(baseline_labels: np.ndarray, counts: Dict[str, int]) -> Dict[str, Any]:
+        """
+        Compare assignments accumulated since the last fit with the fitted
+        label distribution: the rise in the outlier (-1) rate and the total
+        variation distance between cluster size shares.
+        """
+        baseline_ids, baseline_counts = np.unique(baseline_labels, return_counts=True)
+        baseline = dict(zip(baseline_ids.astype(int), baseline_counts / baseline_counts.sum()))
+
+        assigned = {int(label): count for label, count in counts.items()}
+        total = sum(assigned.values())
+        if total == 0:
+            return {'assigned_users': 0, 'noise_rate': 0.0, 'noise_rate_increase': 0.0,
+                    'cluster_shift': 0.0, 'exceeded': False}
+
+        current = {label: count / total for label, count in assigned.items()}
+        labels = set(baseline) | set(current)
+        cluster_shift = 0.5 * sum(abs(current.get(label, 0.0) - baseline.get(label, 0.0)) for label in labels)
+        noise_rate = current.get(-1, 0.0)
+        noise_rate_increase = noise_rate - baseline.get(-1, 0.0)
+
+        # Too few assignments make the shares noisy, so never trigger on them
+        exceeded = total >= settings.SEGMENTATION_DRIFT_MIN_USERS and (
+            noise_rate_increase > settings.SEGMENTATION_DRIFT_MAX_NOISE_INCREASE
+            or cluster_shift > settings.SEGMENTATION_DRIFT_MAX_CLUSTER_SHIFT
+        )
+
+        return {
+            'assigned_users': int(total),
+            'noise_rate': float(noise_rate),
+            'noise_rate_increase': float(noise_rate_increase),
+            'cluster_shift': float(cluster_shift),
+            'exceeded': bool(exceeded)
+        }
+
+    def load_state(self) -> Dict[str, Any]:
+        """Load the watermark and accumulated assignment counts"""
+        if not os.path.exists(self.state_path):
+            return {'watermark': None, 'version': None, 'counts': {}}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_state(self, state: Dict[str, Any]):
+        """Persist state (write-then-rename)"""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _require_feature_store(result: Dict[str, Any]) -> Dict[str, Any]:
+        if result['data_source'] != 'feature_store':
+            raise RuntimeError(
+                f"Segmentation {result['version']} was fitted on {result['data_source']} users; "
+                "incremental runs need SEGMENTATION_USE_FEATURE_STORE and a populated feature store"
+            )
+        return result
+
+    @staticmethod
+    def _reset_state(state: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """Start drift tracking over for a new fitted version (keeps the watermark)"""
+        return {
+            'watermark': state.get('watermark'),
+            'version': result['version'],
+            'counts': {},
+            'last_refit_at': state.get('last_refit_at'),
+            'last_run_at': state.get('last_run_at')
+        }
+
+    def _write_assignments(self, users: pd.DataFrame, labels: np.ndarray, version: str):
+        """Upsert assignments into ClickHouse (latest row per user wins)"""
+        try:
+            clickhouse_conn.execute(USER_SEGMENTS_TABLE_DDL)
+            assigned_at = datetime.now().replace(microsecond=0)
+            rows = [
+                (int(user_id), int(label), version, assigned_at)
+                for user_id, label in zip(users['user_id'].to_numpy(), labels)
+            ]
+            clickhouse_conn.execute(
+                "INSERT INTO user_segments (user_id, cluster_id, segmentation_version, assigned_at) VALUES",
+                rows
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write user segment assignments: {e}")
+
+
+# Global instance
+incremental_segmentation = IncrementalSegmentation()
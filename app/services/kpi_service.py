@@ -0,0 +1,399 @@
+import logging
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.clickhouse import clickhouse_conn
+from app.db.redis_cache import redis_conn
+
+logger = logging.getLogger(__name__)
+
+
+PERIOD_DAYS = {'daily': 1, 'weekly': 7, 'monthly': 30}
+
+# Current and previous window in one pass over (route, hour) slots: every
+# figure is a -If aggregate on the slot's window instead of its own query.
+# transaction_records holds one row per route and hour with its passenger
+# count and average fare, so boardings and revenue are sums over those rows.
+# Only slots with boardings exist, so occupancy divides by every hour of the
+# window for each active route (empty hours count as 0, not as missing).
+SUMMARY_QUERY = """
+SELECT
+    sumIf(boardings, slot >= %(start)s) AS passengers,
+    sumIf(boardings, slot < %(start)s) AS prev_passengers,
+    sumIf(revenue, slot >= %(start)s) AS revenue,
+    sumIf(revenue, slot < %(start)s) AS prev_revenue,
+    countIf(slot >= %(start)s) AS service_hours,
+    sumIf(least(boardings / %(capacity)s, 1), slot >= %(start)s)
+        / (uniqExactIf(route_id, slot >= %(start)s) * %(window_hours)s) AS avg_occupancy,
+    uniqExactIf(route_id, slot >= %(start)s) AS routes_active,
+    uniqExact(route_id) AS routes_total,
+    sumMapIf([toHour(slot)], [boardings], slot >= %(start)s) AS hourly,
+    sumMapIf([route_id], [boardings], slot >= %(start)s) AS route_passengers,
+    sumMapIf([route_id], [boardings], slot < %(start)s) AS prev_route_passengers
+FROM (
+    SELECT
+        route_id,
+        toStartOfHour(timestamp) AS slot,
+        sum(passenger_count) AS boardings,
+        sum(passenger_count * toFloat64(fare_amount)) AS revenue
+    FROM transaction_records
+    WHERE timestamp >= %(prev_start)s AND timestamp < %(end)s{route_filter}
+    GROUP BY route_id, slot
+)
+"""
+
+DAILY_REVENUE_QUERY = """
+SELECT
+    toDate(timestamp) AS day,
+    sum(passenger_count) AS passengers,
+    sum(passenger_count * toFloat64(fare_amount)) AS revenue
+FROM transaction_records
+WHERE timestamp >= %(prev_start)s AND timestamp < %(end)s
+GROUP BY day
+ORDER BY day
+"""
+
+REALTIME_QUERY = """
+SELECT
+    sum(passenger_count) AS passengers,
+    sum(passenger_count * toFloat64(fare_amount)) AS revenue,
+    uniqExact(route_id) AS routes_active
+FROM transaction_records
+WHERE timestamp >= %(start)s AND timestamp < %(end)s
+"""
+
+# Summary row for an empty window (also served when ClickHouse is unreachable)
+EMPTY_SUMMARY_ROW = (0, 0, 0.0, 0.0, 0, float('nan'), 0, 0, ([], []), ([], []), ([], []))
+
+SENTIMENT_SCORES = {'POSITIVE': 1.0, 'NEUTRAL': 0.5, 'NEGATIVE': 0.0}
+
+
+def _growth(current: float, previous: float) -> Optional[float]:
+    """Percent change, None when there is no previous value to compare with"""
+    if not previous:
+        return None
+    return round((current - previous) / previous * 100, 2)
+
+
+def _number(value, default=0.0):
+    """NaN/None (aggregates over empty windows) to a default"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return default
+    return value
+
+
+class KPIEngine:
+    """
+    KPIs computed from ClickHouse transactions.
+    Windows end at the last completed KPI_BUCKET_MINUTES bucket, so every
+    request within a bucket asks for the same window and is served from
+    cache (Redis, then this process). One multi-aggregate query covers
+    each view, comparing the window with the one before it for growth.
+    """
+
+    CACHE_PREFIX = "kpis"
+
+    def __init__(self):
+        self._local: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    # ----- views -----
+
+    def get_kpis(self, period: str = 'daily', now: datetime = None) -> Dict[str, Any]:
+        """Headline KPIs for the period"""
+        days = PERIOD_DAYS[period]
+        return self.build_kpis(period, self.get_summary(days, now=now), self.get_sentiment(days, now=now))
+
+    def get_dashboard(self, period: str = 'daily', top_routes: int = 5, now: datetime = None) -> Dict[str, Any]:
+        """Dashboard for the period, fetching fragments one after another (the API uses dashboard_composer)"""
+        days = PERIOD_DAYS[period]
+        return self.build_dashboard(
+            period, self.get_summary(days, now=now), self.get_sentiment(days, now=now),
+            self.get_realtime(now=now), top_routes=top_routes
+        )
+
+    def build_kpis(self, period: str, summary: Dict[str, Any], sentiment_avg: Optional[float]) -> Dict[str, Any]:
+        return {
+            'total_passengers': summary['passengers'],
+            'total_revenue': summary['revenue'],
+            'avg_occupancy': summary['avg_occupancy'],
+            'routes_active': summary['routes_active'],
+            'peak_hour': summary['peak_hour'],
+            'sentiment_avg': sentiment_avg,
+            'passenger_growth': summary['passenger_growth'],
+            'revenue_growth': summary['revenue_growth'],
+            'period': period,
+            'data_available': summary['data_available'],
+            'window': summary['window'],
+            'generated_at': summary['generated_at']
+        }
+
+    def build_dashboard(self, period: str, summary: Dict[str, Any], sentiment_avg: Optional[float],
+                        realtime: Optional[Dict[str, Any]], top_routes: int = 5) -> Dict[str, Any]:
+        routes = sorted(summary['route_passengers'], key=lambda pair: pair[1], reverse=True)
+
+        return {
+            'period': period,
+            'metrics': {
+                'total_passengers': summary['passengers'],
+                'total_revenue': summary['revenue'],
+                # Route-hours with at least one boarding; vehicle trips are not recorded
+                'service_hours': summary['service_hours'],
+                'avg_occupancy': summary['avg_occupancy'],
+                'on_time_performance': None  # schedule adherence is not recorded
+            },
+            'routes': {
+                'total': summary['routes_total'],
+                'active': summary['routes_active'],
+                'peak_routes': [
+                    {'route_id': route_id, 'name': f"Ruta {route_id}", 'passengers': passengers}
+                    for route_id, passengers in routes[:top_routes]
+                ]
+            },
+            'trends': {
+                'passenger_growth': summary['passenger_growth'],
+                'revenue_growth': summary['revenue_growth'],
+                'satisfaction_score': sentiment_avg
+            },
+            'realtime': realtime,
+            'alerts': self._build_alerts(summary),
+            'data_available': summary['data_available'],
+            'window': summary['window'],
+            'generated_at': summary['generated_at']
+        }
+
+    def get_performance(self, days: int = 7, route_id: int = None, now: datetime = None) -> Dict[str, Any]:
+        """Operational metrics over the last N days, optionally for one route"""
+        summary = self.get_summary(days, route_id=route_id, now=now)
+        passengers = summary['passengers']
+        return {
+            'on_time_rate': None,  # schedule adherence is not recorded
+            'avg_delay_minutes': None,
+            'passenger_satisfaction': self.get_sentiment(days, now=now),
+            'revenue_per_passenger': round(summary['revenue'] / passengers, 2) if passengers else None,
+            'occupancy_rate': summary['avg_occupancy'],
+            'passengers': passengers,
+            'passenger_growth': summary['passenger_growth'],
+            'data_available': summary['data_available'],
+            'period': {'days': days, **summary['window']},
+            'generated_at': summary['generated_at']
+        }
+
+    def get_revenue(self, days: int = 7, now: datetime = None) -> Dict[str, Any]:
+        """Daily revenue over the last N days with growth against the N days before"""
+        window = self._window(days, now)
+        try:
+            return self._cached(
+                f"{self.CACHE_PREFIX}:revenue:{days}:{window['end'].isoformat()}",
+                lambda: self._compute_revenue(days, window)
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Revenue analysis unavailable: {e}")
+            return self._compute_revenue(days, window, rows=([], [], []))
+
+    # ----- fragments -----
+    # fetch_* raise when their source fails so callers can tell missing
+    # data from an empty window; get_* fall back to an empty value instead.
+    # Failures are never cached: the next request retries the source.
+
+    def get_summary(self, days: int, route_id: int = None, now: datetime = None) -> Dict[str, Any]:
+        try:
+            return self.fetch_summary(days, route_id=route_id, now=now)
+        except Exception as e:
+            logger.warning(f"⚠️ KPI summary unavailable: {e}")
+            return self.empty_summary(days, now=now)
+
+    def fetch_summary(self, days: int, route_id: int = None, now: datetime = None) -> Dict[str, Any]:
+        window = self._window(days, now)
+        scope = f"route{route_id}" if route_id else "all"
+        return self._cached(
+            f"{self.CACHE_PREFIX}:summary:{days}:{scope}:{window['end'].isoformat()}",
+            lambda: self._compute_summary(window, route_id)
+        )
+
+    def empty_summary(self, days: int, now: datetime = None) -> Dict[str, Any]:
+        return self._compute_summary(self._window(days, now), None, row=EMPTY_SUMMARY_ROW)
+
+    def get_sentiment(self, days: int, now: datetime = None) -> Optional[float]:
+        try:
+            return self.fetch_sentiment(days, now=now)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not aggregate feedback sentiment: {e}")
+            return None
+
+    def fetch_sentiment(self, days: int, now: datetime = None) -> Optional[float]:
+        window = self._window(days, now)
+        return self._cached(
+            f"{self.CACHE_PREFIX}:sentiment:{days}:{window['end'].isoformat()}",
+            lambda: {'sentiment_avg': self._sentiment_avg(window['start'], window['end'])}
+        )['sentiment_avg']
+
+    def get_realtime(self, now: datetime = None) -> Optional[Dict[str, Any]]:
+        try:
+            return self.fetch_realtime(now=now)
+        except Exception as e:
+            logger.warning(f"⚠️ Realtime metrics unavailable: {e}")
+            return None
+
+    def fetch_realtime(self, now: datetime = None) -> Dict[str, Any]:
+        """Last hour of boardings, ending at the current minute"""
+        end = (now or datetime.now()).replace(second=0, microsecond=0)
+        window = {'start': end - timedelta(hours=1), 'end': end}
+        return self._cached(
+            f"{self.CACHE_PREFIX}:realtime:{end.isoformat()}",
+            lambda: self._compute_realtime(window),
+            ttl=120
+        )
+
+    def _compute_summary(self, window: Dict[str, datetime], route_id: Optional[int],
+                         row: tuple = None) -> Dict[str, Any]:
+        if row is None:
+            params = {**window, 'capacity': settings.KPI_ROUTE_HOURLY_CAPACITY,
+                      'window_hours': int((window['end'] - window['start']).total_seconds() // 3600)}
+            route_filter = ""
+            if route_id:
+                route_filter = " AND route_id = %(route_id)s"
+                params['route_id'] = route_id
+            row = clickhouse_conn.execute(SUMMARY_QUERY.format(route_filter=route_filter), params)[0]
+
+        (passengers, prev_passengers, revenue, prev_revenue, service_hours, avg_occupancy,
+         routes_active, routes_total, hourly, route_passengers, prev_route_passengers) = row
+
+        hours, hour_counts = hourly
+        passengers, revenue = int(passengers), round(float(revenue), 2)
+
+        return {
+            'passengers': passengers,
+            'revenue': revenue,
+            'service_hours': int(service_hours),
+            'avg_occupancy': round(float(_number(avg_occupancy)), 4),
+            'routes_active': int(routes_active),
+            'routes_total': int(routes_total),
+            'peak_hour': int(hours[hour_counts.index(max(hour_counts))]) if hour_counts else None,
+            'passenger_growth': _growth(passengers, prev_passengers),
+            'revenue_growth': _growth(revenue, prev_revenue),
+            # [route_id, passengers] pairs: JSON object keys would turn route ids into strings
+            'route_passengers': [[int(r), int(c)] for r, c in zip(*route_passengers)],
+            'prev_route_passengers': [[int(r), int(c)] for r, c in zip(*prev_route_passengers)],
+            'data_available': row is not EMPTY_SUMMARY_ROW,
+            'window': {'from': window['start'].isoformat(), 'to': window['end'].isoformat()},
+            'generated_at': datetime.now().isoformat()
+        }
+
+    def _compute_realtime(self, window: Dict[str, datetime]) -> Dict[str, Any]:
+        passengers, revenue, routes_active = clickhouse_conn.execute(REALTIME_QUERY, window)[0]
+        return {
+            'passengers_last_hour': int(passengers),
+            'revenue_last_hour': round(float(revenue), 2),
+            'routes_active': int(routes_active),
+            'window': {'from': window['start'].isoformat(), 'to': window['end'].isoformat()}
+        }
+
+    def _compute_revenue(self, days: int, window: Dict[str, datetime], rows: tuple = None) -> Dict[str, Any]:
+        if rows is None:
+            rows = clickhouse_conn.execute(DAILY_REVENUE_QUERY, window, columnar=True) or ([], [], [])
+        dates, passengers, revenue = rows
+
+        start_date = window['start'].date()
+        daily, previous_revenue = [], 0.0
+        for day, count, amount in zip(dates, passengers, revenue):
+            if day < start_date:
+                previous_revenue += amount
+                continue
+            daily.append({
+                'date': day.isoformat(),
+                'revenue': round(float(amount), 2),
+                'passengers': int(count),
+                'avg_fare': round(float(amount) / count, 2) if count else 0.0
+            })
+
+        total_revenue = round(sum(day['revenue'] for day in daily), 2)
+        return {
+            'summary': {
+                'total_revenue': total_revenue,
+                'avg_daily_revenue': round(total_revenue / days, 2),
+                'total_passengers': sum(day['passengers'] for day in daily),
+                'growth_rate': _growth(total_revenue, previous_revenue)
+            },
+            'daily_breakdown': daily,
+            'data_available': bool(dates),
+            'period': {'days': days, 'from': window['start'].isoformat(), 'to': window['end'].isoformat()},
+            'generated_at': datetime.now().isoformat()
+        }
+
+    def _sentiment_avg(self, start: datetime, end: datetime) -> Optional[float]:
+        """Mean feedback sentiment (positive=1, neutral=0.5, negative=0) in one aggregation"""
+        from app.db.mongodb import mongodb_conn
+        label = {'$ifNull': ['$sentiment', '$sentimiento']}
+        result = list(mongodb_conn.get_collection('user_feedback').aggregate([
+            {'$match': {'timestamp': {'$gte': start, '$lt': end}}},
+            {'$group': {'_id': None, 'score': {'$avg': {'$switch': {
+                'branches': [
+                    {'case': {'$eq': [label, name]}, 'then': score}
+                    for name, score in SENTIMENT_SCORES.items()
+                ],
+                'default': None
+            }}}}}
+        ]))
+        if result and result[0]['score'] is not None:
+            return round(float(result[0]['score']), 4)
+        return None
+
+    def _build_alerts(self, summary: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
+        """Routes whose demand jumped, or that stopped reporting, versus the previous window"""
+        current, previous = dict(summary['route_passengers']), dict(summary['prev_route_passengers'])
+        alerts = []
+        for route_id, prev_count in sorted(previous.items(), key=lambda item: item[1], reverse=True):
+            growth = _growth(current.get(route_id, 0), prev_count)
+            if route_id not in current:
+                alerts.append({'type': 'info', 'route_id': route_id,
+                               'message': f"Ruta {route_id} sin transacciones en el periodo"})
+            elif growth is not None and growth >= settings.KPI_ALERT_GROWTH_PCT:
+                alerts.append({'type': 'warning', 'route_id': route_id,
+                               'message': f"Ruta {route_id} con alta demanda (+{growth:.0f}%)"})
+        return [{**alert, 'timestamp': summary['generated_at']} for alert in alerts[:limit]]
+
+    # ----- windows and caching -----
+
+    def _window(self, days: int, now: datetime = None) -> Dict[str, datetime]:
+        """[start, end) ending at the last completed bucket, plus the window before it"""
+        bucket = settings.KPI_BUCKET_MINUTES
+        now = (now or datetime.now()).replace(second=0, microsecond=0)
+        end = now - timedelta(minutes=now.minute % bucket)
+        start = end - timedelta(days=days)
+        return {'start': start, 'end': end, 'prev_start': start - timedelta(days=days)}
+
+    def _cached(self, key: str, compute: Callable[[], Dict[str, Any]], ttl: int = None) -> Dict[str, Any]:
+        with self._lock:
+            if key in self._local:
+                return self._local[key]
+        try:
+            cached = redis_conn.get(key)
+            if cached:
+                self._remember(key, cached)
+                return cached
+        except Exception:
+            logger.debug("Redis not available for KPIs")
+
+        value = compute()
+        self._remember(key, value)
+        try:
+            # The key names its bucket; keep it a little longer than the bucket
+            redis_conn.set(key, value, ttl=ttl or settings.KPI_BUCKET_MINUTES * 60 * 2)
+        except Exception:
+            logger.debug("Could not cache KPIs")
+        return value
+
+    def _remember(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            # Keys of older buckets never come back
+            if len(self._local) >= 64:
+                self._local.clear()
+            self._local[key] = value
+
+
+# Global instance
+kpi_engine = KPIEngine()
@@ -0,0 +1,238 @@
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# pyarrow (pinned in requirements.txt) is imported only when exporting Parquet or Arrow IPC;
+# installs without it still serve csv and json
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# (name, type) column declarations; the types drive the Arrow schema
+Columns = List[Tuple[str, str]]
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write target that hands the written bytes back in chunks (for HTTP streaming)"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+
+# ----- writers -----
+
+class _TextExportWriter:
+    """Row formats with optional gzip, compressed as they are written"""
+
+    compressions = (None, 'gzip')
+
+    def __init__(self, stream: BinaryIO, columns: Columns, compression: Optional[str] = None,
+                 header: Dict[str, Any] = None):
+        self._gzip = gzip.GzipFile(fileobj=stream, mode='wb') if compression == 'gzip' else None
+        self._stream = self._gzip or stream
+        self.columns = [name for name, _ in columns]
+        self.header = header or {}
+
+    def close(self):
+        if self._gzip is not None:
+            self._gzip.close()  # writes the gzip trailer, leaves the target stream open
+
+
+class CSVExportWriter(_TextExportWriter):
+    content_type = 'text/csv'
+    extension = 'csv'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write([self.columns])
+
+    def write(self, rows: List[tuple]):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        self._stream.write(buffer.getvalue().encode('utf-8'))
+
+
+class JSONExportWriter(_TextExportWriter):
+    """{<header>, "columns": [...], "data": [{...}, ...]} written record by record"""
+
+    content_type = 'application/json'
+    extension = 'json'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._first = True
+        # Header object without its closing brace; close() ends the data array and the object
+        header = json.dumps({**self.header, 'columns': self.columns}, default=_json_value)[:-1]
+        self._stream.write(f'{header}, "data": ['.encode('utf-8'))
+
+    def write(self, rows: List[tuple]):
+        lines = [json.dumps(dict(zip(self.columns, row)), default=_json_value) for row in rows]
+        if lines:
+            self._stream.write((('\n' if self._first else ',\n') + ',\n'.join(lines)).encode('utf-8'))
+            self._first = False
+
+    def close(self):
+        self._stream.write(b'\n]}\n')
+        super().close()
+
+
+class _ArrowExportWriter:
+    """Columnar formats: every block becomes one Arrow record batch"""
+
+    def __init__(self, stream: BinaryIO, columns: Columns, compression: Optional[str] = None,
+                 header: Dict[str, Any] = None):
+        import pyarrow as pa
+
+        types = {
+            'timestamp': pa.timestamp('s'), 'date': pa.date32(), 'int': pa.int64(),
+            'float': pa.float64(), 'string': pa.string(),
+        }
+        metadata = {key: json.dumps(value, default=_json_value) for key, value in (header or {}).items()}
+        self._pa = pa
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns], metadata=metadata)
+        self.compression = compression
+        self._stream = stream
+
+    def _batch(self, rows: List[tuple]):
+        return self._pa.RecordBatch.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(zip(*rows), self.schema)],
+            schema=self.schema
+        )
+
+
+class ParquetExportWriter(_ArrowExportWriter):
+    """One row group per block, so only the current block is held in memory"""
+
+    content_type = 'application/vnd.apache.parquet'
+    extension = 'parquet'
+    compressions = ('snappy', None, 'gzip', 'zstd')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        import pyarrow.parquet as pq
+        self._writer = pq.ParquetWriter(self._stream, self.schema, compression=self.compression or 'none')
+
+    def write(self, rows: List[tuple]):
+        if rows:
+            self._writer.write_batch(self._batch(rows))
+
+    def close(self):
+        self._writer.close()
+
+
+class ArrowExportWriter(_ArrowExportWriter):
+    """Arrow IPC stream format (readable with pyarrow.ipc.open_stream)"""
+
+    content_type = 'application/vnd.apache.arrow.stream'
+    extension = 'arrows'
+    compressions = (None, 'lz4', 'zstd')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self._pa.ipc.IpcWriteOptions(compression=self.compression)
+        self._writer = self._pa.ipc.new_stream(self._stream, self.schema, options=options)
+
+    def write(self, rows: List[tuple]):
+        if rows:
+            self._writer.write_batch(self._batch(rows))
+
+    def close(self):
+        self._writer.close()
+
+
+EXPORT_WRITERS = {
+    'csv': CSVExportWriter,
+    'json': JSONExportWriter,
+    'parquet': ParquetExportWriter,
+    'arrow': ArrowExportWriter,
+}
+ARROW_FORMATS = ('parquet', 'arrow')
+
+
+def validate_export(format: str, compression: Optional[str] = None):
+    if format not in EXPORT_WRITERS:
+        raise ValueError(f"Unsupported export format '{format}'. Available: {sorted(EXPORT_WRITERS)}")
+    if format in ARROW_FORMATS and not HAS_PYARROW:
+        raise ValueError(f"The {format} format requires pyarrow, which is not installed")
+    allowed = EXPORT_WRITERS[format].compressions
+    if compression not in allowed:
+        raise ValueError(f"Unsupported compression '{compression}' for {format}. "
+                         f"Available: {[c for c in allowed if c]}")
+
+
+def export_filename(name: str, format: str, compression: Optional[str] = None) -> str:
+    suffix = '.gz' if compression == 'gzip' and format not in ARROW_FORMATS else ''
+    return f"{name}.{EXPORT_WRITERS[format].extension}{suffix}"
+
+
+def export_content_type(format: str, compression: Optional[str] = None) -> str:
+    if compression == 'gzip' and format not in ARROW_FORMATS:
+        return 'application/gzip'
+    return EXPORT_WRITERS[format].content_type
+
+
+def default_compression(format: str) -> Optional[str]:
+    return EXPORT_WRITERS[format].compressions[0]
+
+
+def write_export(stream: BinaryIO, batches: Iterable[List[tuple]], columns: Columns, format: str,
+                 compression: Optional[str] = None, header: Dict[str, Any] = None,
+                 on_batch=None) -> int:
+    """Write blocks of rows to a binary stream as they arrive; returns the row count"""
+    writer = EXPORT_WRITERS[format](stream, columns, compression=compression, header=header)
+    rows = 0
+    for batch in batches:
+        writer.write(batch)
+        rows += len(batch)
+        if on_batch is not None:
+            on_batch(rows)
+    writer.close()
+    return rows
+
+
+def iter_export(batches: Iterable[List[tuple]], columns: Columns, format: str,
+                compression: Optional[str] = None, header: Dict[str, Any] = None) -> Iterator[bytes]:
+    """
+    Encode blocks of rows incrementally for a StreamingResponse: each
+    block is written and its bytes handed out before the next one is read.
+    """
+    sink = _ChunkSink()
+    writer = EXPORT_WRITERS[format](sink, columns, compression=compression, header=header)
+    for batch in batches:
+        writer.write(batch)
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
@@ -0,0 +1,98 @@
+import logging
+import math
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.db.redis_cache import get_redis, redis_conn
+
+logger = logging.getLogger(__name__)
+
+
+class RedisJobQueue:
+    """
+    Report job queue shared by every API process and standalone worker.
+    Job ids go through a Redis list (LPUSH / BRPOP, so each job is taken by
+    exactly one worker); each job's status document lives under its own
+    key and expires after REPORT_RETENTION_HOURS. A worker that dies mid
+    job leaves it 'running' until it expires.
+    """
+
+    def __init__(self, name: str = "reports"):
+        self.name = name
+
+    def put(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        self._save(job)
+        get_redis().lpush(f"{self.name}:queue", job['report_id'])
+        return job
+
+    def pop(self, timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+        """Next queued job, or None after `timeout` seconds"""
+        item = get_redis().brpop(f"{self.name}:queue", timeout=max(1, math.ceil(timeout)))
+        if item is None:
+            return None
+        job = self.get(item[1])
+        if job is None:
+            logger.warning(f"⚠️ Report job {item[1]} expired before a worker took it")
+        return job
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        return redis_conn.get(self._key(report_id))
+
+    def update(self, report_id: str, **fields) -> Dict[str, Any]:
+        # Only the worker that popped a job writes to it afterwards
+        job = {**(self.get(report_id) or {'report_id': report_id}), **fields}
+        self._save(job)
+        return job
+
+    def _save(self, job: Dict[str, Any]):
+        job['updated_at'] = datetime.now().isoformat()
+        redis_conn.set(self._key(job['report_id']), job, ttl=settings.REPORT_RETENTION_HOURS * 3600)
+
+    def _key(self, report_id: str) -> str:
+        return f"{self.name}:job:{report_id}"
+
+
+class LocalJobQueue:
+    """In-process stand-in for RedisJobQueue (tests and single-process development)"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        self._save(job)
+        self._queue.put(job['report_id'])
+        return job
+
+    def pop(self, timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+        try:
+            return self.get(self._queue.get(timeout=timeout))
+        except queue.Empty:
+            return None
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(report_id)
+            return dict(job) if job else None
+
+    def update(self, report_id: str, **fields) -> Dict[str, Any]:
+        job = {**(self.get(report_id) or {'report_id': report_id}), **fields}
+        self._save(job)
+        return job
+
+    def _save(self, job: Dict[str, Any]):
+        with self._lock:
+            self._jobs[job['report_id']] = {**job, 'updated_at': datetime.now().isoformat()}
+
+
+def create_job_queue(backend: str = None):
+    backend = backend or settings.REPORT_QUEUE_BACKEND
+    if backend == 'redis':
+        return RedisJobQueue()
+    if backend == 'local':
+        return LocalJobQueue()
+    raise ValueError(f"Unknown report queue backend '{backend}'. Available: ['local', 'redis']")
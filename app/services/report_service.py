@@ -0,0 +1,294 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.db.clickhouse import clickhouse_conn
+from app.services.report_export import (
+    default_compression, export_content_type, export_filename, iter_export, validate_export, write_export
+)
+from app.services.report_queue import create_job_queue
+from app.services.report_storage import create_report_storage
+
+logger = logging.getLogger(__name__)
+
+
+# ----- transformation stages (one ClickHouse block at a time) -----
+
+def add_route_name(rows: List[tuple], route_index: int = 1) -> List[tuple]:
+    """Insert the display name right after the route id"""
+    at = route_index + 1
+    return [row[:at] + (f"Ruta {row[route_index]}",) + row[at:] for row in rows]
+
+
+def add_ratio(rows: List[tuple], numerator: int, denominator: int) -> List[tuple]:
+    """Append numerator / denominator (0 when the denominator is 0)"""
+    return [row + (row[numerator] / row[denominator] if row[denominator] else 0.0,) for row in rows]
+
+
+def round_columns(rows: List[tuple], indexes: tuple, digits: int = 2) -> List[tuple]:
+    return [
+        tuple(round(value, digits) if i in indexes else value for i, value in enumerate(row))
+        for row in rows
+    ]
+
+
+# Every report reads the [date_from, date_to) range ordered by time, so
+# rows stream from ClickHouse in blocks and go through the stages in order.
+# transaction_records has one row per route and hour with its passenger
+# count and average fare: passengers are summed and revenue is
+# passengers x fare, as in the KPI engine.
+REPORT_TYPES = {
+    'transactions': {
+        'query': """
+            SELECT timestamp, route_id, passenger_count AS passengers, toFloat64(fare_amount) AS avg_fare,
+                   passenger_count * toFloat64(fare_amount) AS revenue
+            FROM transaction_records
+            WHERE timestamp >= %(date_from)s AND timestamp < %(date_to)s{route_filter}
+            ORDER BY timestamp
+        """,
+        'stages': [add_route_name, lambda rows: round_columns(rows, (4, 5))],
+        'columns': [('timestamp', 'timestamp'), ('route_id', 'int'), ('route_name', 'string'),
+                    ('passengers', 'int'), ('avg_fare', 'float'), ('revenue', 'float')],
+    },
+    'daily_revenue': {
+        'query': """
+            SELECT toDate(timestamp) AS day, route_id,
+                   sum(passenger_count) AS passengers, sum(passenger_count * toFloat64(fare_amount)) AS revenue
+            FROM transaction_records
+            WHERE timestamp >= %(date_from)s AND timestamp < %(date_to)s{route_filter}
+            GROUP BY day, route_id
+            ORDER BY day, route_id
+        """,
+        'stages': [add_route_name, lambda rows: add_ratio(rows, 4, 3), lambda rows: round_columns(rows, (4, 5))],
+        'columns': [('date', 'date'), ('route_id', 'int'), ('route_name', 'string'),
+                    ('passengers', 'int'), ('revenue', 'float'), ('avg_fare', 'float')],
+    },
+    'route_demand': {
+        'query': """
+            SELECT toStartOfHour(timestamp) AS hour, route_id,
+                   sum(passenger_count) AS boardings, sum(passenger_count * toFloat64(fare_amount)) AS revenue
+            FROM transaction_records
+            WHERE timestamp >= %(date_from)s AND timestamp < %(date_to)s{route_filter}
+            GROUP BY hour, route_id
+            ORDER BY hour, route_id
+        """,
+        'stages': [add_route_name, lambda rows: round_columns(rows, (4,))],
+        'columns': [('hour', 'timestamp'), ('route_id', 'int'), ('route_name', 'string'),
+                    ('boardings', 'int'), ('revenue', 'float')],
+    },
+}
+
+REPORT_FILTERS = ('route_ids',)
+
+
+class ReportService:
+    """
+    Report generation off the request path.
+    Submitting only validates the request and queues a job; background
+    workers (threads in each API process and/or scripts/run_report_workers.py)
+    take jobs from the queue, stream the ClickHouse rows in blocks through
+    the report's stages and write them to storage as they go, so memory
+    stays at one block however long the report is. Status and downloads
+    work from any process because both the queue and the storage are shared.
+    """
+
+    def __init__(self, job_queue=None, storage=None):
+        self._queue = job_queue
+        self._storage = storage
+        self._workers: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    @property
+    def queue(self):
+        if self._queue is None:
+            self._queue = create_job_queue()
+        return self._queue
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            self._storage = create_report_storage()
+        return self._storage
+
+    def submit(self, report_type: str, date_from: datetime, date_to: datetime,
+               filters: Dict[str, Any] = None, format: str = 'json',
+               compression: Optional[str] = None) -> Dict[str, Any]:
+        """Validate and queue a report; returns the job status"""
+        compression = self._validate(report_type, date_from, date_to, filters, format, compression)
+        job = {
+            'report_id': str(uuid.uuid4()),
+            'report_type': report_type,
+            'format': format,
+            'compression': compression,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'filters': filters or {},
+            'status': 'queued',
+            'rows': 0,
+            'submitted_at': datetime.now().isoformat()
+        }
+        self.queue.put(job)
+        logger.info(f"📄 Report {job['report_id']} ({report_type}, {format}) queued")
+        return job
+
+    def export(self, report_type: str, date_from: datetime, date_to: datetime,
+               filters: Dict[str, Any] = None, format: str = 'csv',
+               compression: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Stream a report straight to the caller instead of queueing it. The
+        rows are read, transformed and encoded block by block while the
+        response is sent, so nothing is stored and memory stays at one block.
+        """
+        compression = self._validate(report_type, date_from, date_to, filters, format, compression)
+        header = {'report_type': report_type, 'date_from': date_from.isoformat(),
+                  'date_to': date_to.isoformat(), 'filters': filters or {}}
+        batches = self._stream_batches(report_type, date_from, date_to, filters or {})
+        return {
+            'chunks': iter_export(batches, REPORT_TYPES[report_type]['columns'], format,
+                                  compression=compression, header=header),
+            'filename': export_filename(f"{report_type}_{date_from:%Y%m%d}_{date_to:%Y%m%d}", format, compression),
+            'content_type': export_content_type(format, compression)
+        }
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        return self.queue.get(report_id)
+
+    def iter_report(self, job: Dict[str, Any]) -> Iterator[bytes]:
+        """Chunks of a completed report's file"""
+        return self.storage.iter_chunks(job['report_id'], job['filename'])
+
+    def run(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate one report (called by the workers)"""
+        report_id = job['report_id']
+        format, compression = job['format'], job.get('compression')
+        filename = export_filename(f"{job['report_type']}_{report_id[:8]}", format, compression)
+        content_type = export_content_type(format, compression)
+        header = {key: job[key] for key in ('report_id', 'report_type', 'date_from', 'date_to', 'filters')}
+
+        started = time.perf_counter()
+        self.queue.update(report_id, status='running', started_at=datetime.now().isoformat())
+        progress = {'rows': 0}
+
+        def on_batch(rows: int):
+            progress['rows'] = rows
+            self.queue.update(report_id, rows=rows)
+
+        try:
+            batches = self._stream_batches(
+                job['report_type'], datetime.fromisoformat(job['date_from']),
+                datetime.fromisoformat(job['date_to']), job['filters']
+            )
+            with self.storage.open_write(report_id, filename, content_type) as stream:
+                rows = write_export(stream, batches, REPORT_TYPES[job['report_type']]['columns'], format,
+                                    compression=compression, header=header, on_batch=on_batch)
+        except Exception as e:
+            logger.error(f"❌ Report {report_id} failed: {e}")
+            return self.queue.update(report_id, status='failed', error=str(e), rows=progress['rows'],
+                                     finished_at=datetime.now().isoformat())
+
+        logger.info(f"✅ Report {report_id} completed: {rows} rows in {time.perf_counter() - started:.1f}s")
+        return self.queue.update(
+            report_id, status='completed', rows=rows, filename=filename,
+            content_type=content_type, finished_at=datetime.now().isoformat()
+        )
+
+    def _validate(self, report_type: str, date_from: datetime, date_to: datetime,
+                  filters: Optional[Dict[str, Any]], format: str, compression: Optional[str]) -> Optional[str]:
+        """Raise ValueError for an invalid request; returns the compression to use"""
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Unknown report type '{report_type}'. Available: {sorted(REPORT_TYPES)}")
+        if date_from >= date_to:
+            raise ValueError("date_from must be before date_to")
+        unknown = sorted(set(filters or {}) - set(REPORT_FILTERS))
+        if unknown:
+            raise ValueError(f"Unsupported report filters {unknown}. Available: {list(REPORT_FILTERS)}")
+        validate_export(format)
+        compression = compression or default_compression(format)
+        validate_export(format, compression)
+        return compression
+
+    # ----- workers -----
+
+    def start_workers(self, count: int = None):
+        """Start background worker threads (idempotent)"""
+        count = settings.REPORT_WORKERS if count is None else count
+        with self._lock:
+            if self._workers:
+                return
+            self._stop.clear()
+            for i in range(count):
+                worker = threading.Thread(target=self._worker_loop, name=f"report-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        if count:
+            logger.info(f"📄 {count} report workers started")
+
+    def stop_workers(self, timeout: float = 5.0):
+        self._stop.set()
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.join(timeout=timeout)
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._cleanup_if_due()
+                job = self.queue.pop(timeout=1.0)
+            except Exception as e:
+                logger.warning(f"⚠️ Report queue unavailable: {e}")
+                self._stop.wait(5)
+                continue
+            if job is not None:
+                self.run(job)
+
+    def _cleanup_if_due(self):
+        with self._lock:
+            if time.time() - self._last_cleanup < 3600:
+                return
+            self._last_cleanup = time.time()
+        try:
+            removed = self.storage.cleanup()
+            if removed:
+                logger.info(f"🧹 Removed {removed} expired reports")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not clean up old reports: {e}")
+
+    def _stream_batches(self, report_type: str, date_from: datetime, date_to: datetime,
+                        filters: Dict[str, Any]) -> Iterator[List[tuple]]:
+        definition = REPORT_TYPES[report_type]
+        params = {'date_from': date_from, 'date_to': date_to}
+        route_filter = ""
+        if filters.get('route_ids'):
+            route_filter = " AND route_id IN %(route_ids)s"
+            params['route_ids'] = tuple(int(route) for route in filters['route_ids'])
+
+        rows = clickhouse_conn.execute_iter(
+            definition['query'].format(route_filter=route_filter), params,
+            settings={'max_block_size': settings.REPORT_BATCH_ROWS}
+        )
+        stages: List[Callable[[List[tuple]], List[tuple]]] = definition['stages']
+        try:
+            while True:
+                batch = list(islice(rows, settings.REPORT_BATCH_ROWS))
+                if not batch:
+                    break
+                for stage in stages:
+                    batch = stage(batch)
+                yield batch
+        finally:
+            # Abandoned early (failed write, client gone): release the stream's connection
+            close = getattr(rows, 'close', None)
+            if close is not None:
+                close()
+
+
+# Global instance
+report_service = ReportService()
@@ -0,0 +1,127 @@
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+
+class LocalReportStorage:
+    """
+    Report files on local (or shared network) disk, one directory per
+    report. Files are written under a temporary name and renamed when
+    complete, so a download never sees a partial report.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.REPORT_STORAGE_PATH
+
+    @contextmanager
+    def open_write(self, report_id: str, filename: str, content_type: str) -> Iterator[BinaryIO]:
+        directory = os.path.join(self.path, report_id)
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, filename)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                yield f
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def iter_chunks(self, report_id: str, filename: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(os.path.join(self.path, report_id, filename), 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def exists(self, report_id: str, filename: str) -> bool:
+        return os.path.isfile(os.path.join(self.path, report_id, filename))
+
+    def cleanup(self, max_age_hours: int = None) -> int:
+        """Delete reports older than the retention period"""
+        if not os.path.isdir(self.path):
+            return 0
+        cutoff = time.time() - (max_age_hours or settings.REPORT_RETENTION_HOURS) * 3600
+        removed = 0
+        for name in os.listdir(self.path):
+            directory = os.path.join(self.path, name)
+            if os.path.isdir(directory) and os.path.getmtime(directory) < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+class GridFSReportStorage:
+    """
+    Report files in MongoDB GridFS (bucket `reports`), keyed by report id.
+    Chunks are uploaded as they are written; an upload that fails midway
+    is aborted and leaves nothing behind.
+    """
+
+    def __init__(self, bucket: str = "reports"):
+        self.bucket_name = bucket
+
+    @contextmanager
+    def open_write(self, report_id: str, filename: str, content_type: str) -> Iterator[BinaryIO]:
+        upload = self._bucket().open_upload_stream_with_id(
+            report_id, filename, metadata={'content_type': content_type}
+        )
+        try:
+            yield upload
+            upload.close()
+        except BaseException:
+            upload.abort()
+            raise
+
+    def iter_chunks(self, report_id: str, filename: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        download = self._bucket().open_download_stream(report_id)
+        try:
+            while True:
+                chunk = download.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            download.close()
+
+    def exists(self, report_id: str, filename: str) -> bool:
+        from app.db.mongodb import mongodb_conn
+        return mongodb_conn.get_collection(f"{self.bucket_name}.files").count_documents({'_id': report_id}, limit=1) > 0
+
+    def cleanup(self, max_age_hours: int = None) -> int:
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours or settings.REPORT_RETENTION_HOURS)
+        bucket = self._bucket()
+        removed = 0
+        for grid_file in bucket.find({'uploadDate': {'$lt': cutoff}}):
+            bucket.delete(grid_file._id)
+            removed += 1
+        return removed
+
+    def _bucket(self):
+        from gridfs import GridFSBucket
+        from app.db.mongodb import mongodb_conn
+
+        if mongodb_conn.db is None:
+            mongodb_conn.connect()
+        return GridFSBucket(mongodb_conn.db, bucket_name=self.bucket_name)
+
+
+def create_report_storage(backend: str = None):
+    backend = backend or settings.REPORT_STORAGE_BACKEND
+    if backend == 'local':
+        return LocalReportStorage()
+    if backend == 'gridfs':
+        return GridFSReportStorage()
+    raise ValueError(f"Unknown report storage backend '{backend}'. Available: ['gridfs', 'local']")
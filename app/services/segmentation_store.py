@@ -0,0 +1,297 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.ml.artifacts import is_artifact, load_arrays, save_arrays
+from app.ml.dbscan_model import DBSCANUserSegmentation
+from app.services.user_feature_service import user_feature_service
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentationStore:
+    """
+    Store of fitted DBSCAN segmentations.
+    Fits once per (data snapshot, eps, min_samples) and keeps the result
+    in memory and on disk so read endpoints become lookups.
+    """
+
+    # Bump when the persisted result layout changes so stale artifacts are refitted
+    ARTIFACT_FORMAT = 6
+
+    def __init__(self, store_path: str = None, max_entries: int = None):
+        self.store_path = store_path or settings.SEGMENTATION_STORE_PATH
+        self.max_entries = max_entries or settings.SEGMENTATION_STORE_MAX_ENTRIES
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Get the user data snapshot segmentations are fitted on"""
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._build_snapshot(*self._load_users())
+            return self._snapshot
+
+    def refresh_snapshot(self) -> Dict[str, Any]:
+        """Reload users from the feature store into a new snapshot"""
+        return self.set_snapshot(*self._load_users())
+
+    def _load_users(self) -> Tuple[pd.DataFrame, str]:
+        """
+        Real rider features from the ClickHouse feature store, synthetic as
+        fallback. Returns the users and their source ('feature_store' or
+        'synthetic'), which results report so synthetic profiles are not
+        mistaken for real ones.
+        """
+        if settings.SEGMENTATION_USE_FEATURE_STORE:
+            users_data = user_feature_service.load_features(
+                min_transactions=settings.SEGMENTATION_MIN_TRANSACTIONS
+            )
+            if users_data is not None and not users_data.empty:
+                return users_data, 'feature_store'
+            logger.warning("⚠️ No user features available, using synthetic users")
+
+        users_data = DBSCANUserSegmentation().generate_synthetic_users(
+            num_users=settings.SEGMENTATION_SNAPSHOT_USERS,
+            random_state=settings.SEGMENTATION_SNAPSHOT_SEED
+        )
+        return users_data, 'synthetic'
+
+    def set_snapshot(self, users_data: pd.DataFrame, source: str = 'feature_store') -> Dict[str, Any]:
+        """Replace the data snapshot (results for older snapshots stay addressable)"""
+        snapshot = self._build_snapshot(users_data, source)
+        with self._lock:
+            self._snapshot = snapshot
+        logger.info(f"✅ Segmentation snapshot {snapshot['snapshot_id']} set ({len(users_data)} users)")
+        return snapshot
+
+    def get_or_fit(self, eps: float = None, min_samples: int = None) -> Dict[str, Any]:
+        """Get the segmentation for the current snapshot, fitting it only once"""
+        eps = float(eps if eps is not None else settings.SEGMENTATION_EPS)
+        min_samples = int(min_samples if min_samples is not None else settings.SEGMENTATION_MIN_SAMPLES)
+        snapshot = self.get_snapshot()
+        version = self.make_version(snapshot['snapshot_id'], eps, min_samples, settings.SEGMENTATION_MODE)
+
+        result = self._get_cached(version)
+        if result is not None:
+            return result
+
+        # One lock per version: concurrent requests for the same parameters
+        # wait for a single fit, different parameters fit independently
+        with self._lock:
+            key_lock = self._key_locks.setdefault(version, threading.Lock())
+
+        with key_lock:
+            result = self._get_cached(version)
+            if result is not None:
+                return result
+
+            result = self._load(version)
+            if result is None:
+                result = self._fit(snapshot, version, eps, min_samples)
+                self._save(result)
+            self._remember(result)
+            return result
+
+    def get_user(self, result: Dict[str, Any], user_id: int) -> Optional[Dict[str, Any]]:
+        """Look up a user's features and cluster label in a stored result"""
+        snapshot = self.get_snapshot()
+        if result['snapshot_id'] != snapshot['snapshot_id']:
+            return None
+
+        position = snapshot['positions'].get(user_id)
+        if position is None:
+            return None
+
+        user = snapshot['users'].iloc[position].to_dict()
+        user['cluster'] = int(result['labels'][position])
+        return user
+
+    def get_outliers(self, result: Dict[str, Any], limit: int = None) -> pd.DataFrame:
+        """Get outlier users of a stored result"""
+        users_data = self.get_snapshot()['users']
+        outliers = users_data[result['labels'] == -1]
+        return outliers.head(limit) if limit else outliers
+
+    def clear(self):
+        """Drop in-memory results (disk artifacts are kept)"""
+        with self._lock:
+            self._results.clear()
+
+    @staticmethod
+    def make_version(snapshot_id: str, eps: float, min_samples: int, mode: str = 'exact') -> str:
+        """Build the artifact version for a snapshot and parameter set"""
+        return f"{snapshot_id}_{mode}_eps{eps:g}_ms{min_samples}"
+
+    def _build_snapshot(self, users_data: pd.DataFrame, source: str,
+                        snapshot_id: str = None) -> Dict[str, Any]:
+        """Fingerprint user data so results can be keyed by content"""
+        users_data = users_data.reset_index(drop=True)
+        digest = snapshot_id or hashlib.sha1(
+            pd.util.hash_pandas_object(users_data, index=False).values.tobytes()
+        ).hexdigest()[:12]
+        return {
+            'snapshot_id': digest,
+            'users': users_data,
+            'positions': {int(user_id): i for i, user_id in enumerate(users_data['user_id'])},
+            'source': source,
+            'created_at': datetime.now()
+        }
+
+    def _fit(self, snapshot: Dict[str, Any], version: str, eps: float, min_samples: int) -> Dict[str, Any]:
+        """Fit a fresh model so no shared instance is mutated"""
+        logger.info(f"🤖 Fitting segmentation {version}...")
+        model = DBSCANUserSegmentation(
+            eps=eps,
+            min_samples=min_samples,
+            mode=settings.SEGMENTATION_MODE,
+            chunk_size=settings.SEGMENTATION_CHUNK_SIZE,
+            silhouette_sample_size=settings.SEGMENTATION_SILHOUETTE_SAMPLE_SIZE
+        )
+        users_data = snapshot['users']
+
+        fit_result = model.fit(users_data)
+        clusters, outliers_info = model.analyze_clusters(users_data)
+
+        return {
+            'format': self.ARTIFACT_FORMAT,
+            'version': version,
+            'snapshot_id': snapshot['snapshot_id'],
+            'data_source': snapshot['source'],
+            'eps': eps,
+            'min_samples': min_samples,
+            'model': model,
+            'labels': np.asarray(fit_result['labels']),
+            'n_clusters': fit_result['n_clusters'],
+            'n_outliers': fit_result['n_outliers'],
+            'silhouette_score': fit_result['silhouette_score'],
+            'clusters': clusters,
+            'outliers': outliers_info,
+            'total_users': len(users_data),
+            'fitted_at': datetime.now()
+        }
+
+    # ----- publishing to API workers (through the model registry) -----
+
+    def publish(self, result: Dict[str, Any], registry=None) -> Dict[str, Any]:
+        """
+        Publish a fitted result and the snapshot it was fitted on as the
+        active 'user_segmentation' registry version. Workers polling the
+        registry install both, so a refit done by the nightly script is
+        served without restarting the API.
+        """
+        from app.ml.model_registry import model_registry
+
+        registry = registry or model_registry
+        snapshot = self.get_snapshot()
+        if snapshot['snapshot_id'] != result['snapshot_id']:
+            raise ValueError("Only results of the current snapshot can be published")
+
+        result_path = self._artifact_path(result['version'])
+        if not is_artifact(result_path):
+            self._save(result)
+        snapshot_path = os.path.join(self.store_path, 'snapshots', snapshot['snapshot_id'])
+        users = snapshot['users']
+        save_arrays(snapshot_path, {column: self._column_array(users[column]) for column in users.columns}, {
+            'snapshot_id': snapshot['snapshot_id'],
+            'source': snapshot['source'],
+            'columns': list(users.columns)
+        })
+
+        return registry.publish('user_segmentation', {'result': result_path, 'snapshot': snapshot_path}, {
+            'version': result['version'],
+            'snapshot_id': result['snapshot_id'],
+            'data_source': result['data_source'],
+            'n_clusters': result['n_clusters'],
+            'n_outliers': result['n_outliers']
+        })
+
+    def install_published(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Registry loader: make a published snapshot and result current in this worker"""
+        arrays, snapshot_manifest = load_arrays(manifest['paths']['snapshot'], mmap=False)
+        result = self._load_path(manifest['paths']['result'], manifest['metadata']['version'])
+        if result is None:
+            raise ValueError(f"Published segmentation {manifest['version']} could not be loaded")
+
+        users = pd.DataFrame({column: arrays[column] for column in snapshot_manifest['columns']})
+        snapshot = self._build_snapshot(users, snapshot_manifest['source'], snapshot_manifest['snapshot_id'])
+        with self._lock:
+            self._snapshot = snapshot
+        self._remember(result)
+        logger.info(f"✅ Segmentation {result['version']} installed from the registry")
+        return result
+
+    @staticmethod
+    def _column_array(column: pd.Series) -> np.ndarray:
+        """Column as a plain .npy-compatible array (datetimes as datetime64)"""
+        if column.dtype == object:
+            return pd.to_datetime(column).to_numpy()
+        return column.to_numpy()
+
+    def _get_cached(self, version: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._results.get(version)
+            if result is not None:
+                self._results.move_to_end(version)
+            return result
+
+    def _remember(self, result: Dict[str, Any]):
+        with self._lock:
+            self._results[result['version']] = result
+            self._results.move_to_end(result['version'])
+            while len(self._results) > self.max_entries:
+                evicted, _ = self._results.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+
+    def _artifact_path(self, version: str) -> str:
+        return os.path.join(self.store_path, version)
+
+    def _load(self, version: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a persisted result from disk. Labels and model arrays are
+        memory mapped, so workers share them instead of each holding a copy.
+        """
+        return self._load_path(self._artifact_path(version), version)
+
+    def _load_path(self, path: str, version: str) -> Optional[Dict[str, Any]]:
+        if not is_artifact(path):
+            return None
+        try:
+            arrays, result = load_arrays(path)
+            if result.get('format') != self.ARTIFACT_FORMAT:
+                logger.info(f"ℹ️  Segmentation {version} artifact is outdated. Refitting.")
+                return None
+
+            model_arrays = {name[len('model.'):]: array for name, array in arrays.items() if name.startswith('model.')}
+            result['model'] = DBSCANUserSegmentation.from_arrays(model_arrays, result.pop('model_params'))
+            result['labels'] = arrays['labels']
+            result['fitted_at'] = datetime.fromisoformat(result['fitted_at'])
+            logger.info(f"✅ Segmentation {version} loaded from {path}")
+            return result
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load segmentation {version}: {e}. Refitting.")
+            return None
+
+    def _save(self, result: Dict[str, Any]):
+        """Persist a result as .npy arrays plus a JSON manifest (renamed into place)"""
+        try:
+            model_arrays, model_params = result['model'].to_arrays()
+            arrays = {'labels': result['labels'], **{f"model.{name}": array for name, array in model_arrays.items()}}
+            manifest = {key: value for key, value in result.items() if key not in ('model', 'labels')}
+            save_arrays(self._artifact_path(result['version']), arrays, {**manifest, 'model_params': model_params})
+        except Exception as e:
+            logger.warning(f"⚠️ Could not persist segmentation {result['version']}: {e}")
+
+
+# Global instance
+segmentation_store = SegmentationStore()
@@ -0,0 +1,251 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _write_status(path: str, **fields):
+    """Merge fields into a job status file (write-then-rename)"""
+    status = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            status = json.load(f)
+    status.update(fields, updated_at=datetime.now().isoformat())
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def train_lstm_job(job_dir: str, status_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Train a fresh LSTM predictor into job_dir (runs in the worker process).
+    TensorFlow is only imported here, never in the serving process.
+    """
+    from tensorflow import keras
+    from app.ml.lstm_model import LSTMDemandPredictor
+
+    epochs = int(params.get('epochs', 50))
+    predictor = LSTMDemandPredictor()
+    predictor.model_path = os.path.join(job_dir, os.path.basename(settings.LSTM_MODEL_PATH))
+    export_path = os.path.join(job_dir, os.path.basename(settings.DEMAND_RUNTIME_PATH))
+
+    progress = keras.callbacks.LambdaCallback(
+        on_epoch_end=lambda epoch, logs: _write_status(
+            status_path, progress=round((epoch + 1) / epochs, 4), epoch=epoch + 1,
+            loss=float(logs.get('loss', 0.0))
+        )
+    )
+
+    # Generate training data
+    training_data = predictor.generate_synthetic_data(num_samples=int(params.get('num_samples', 2000)))
+    history = predictor.train(training_data, epochs=epochs, callbacks=[progress], export_path=export_path)
+
+    return {
+        'model_name': 'demand_lstm',
+        'artifacts': {
+            'model': export_path,
+            'manifest': os.path.splitext(export_path)[0] + '.json',
+            'keras': predictor.model_path,
+        },
+        'final_loss': float(history['loss'][-1]),
+        'final_mae': float(history['mae'][-1]),
+    }
+
+
+def train_gbm_job(job_dir: str, status_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Retrain the demand model the API serves (SklearnDemandModel, 'gbm') on
+    hourly demand of every route and write its artifact into job_dir.
+    """
+    import pickle
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.metrics import mean_absolute_error
+    from app.ml.demand_models import calendar_features
+    from app.ml.feature_matrix import to_feature_matrix
+    from app.services.demand_service import demand_service
+
+    history = demand_service.get_route_hourly_demand(days=int(params.get('days', 90)))
+    if history is None or len(history) < int(params.get('min_rows', 100)):
+        raise ValueError("Not enough hourly demand history to train on")
+
+    features = ['route_id', 'hour', 'day_of_week', 'is_weekend', 'month', 'is_peak_hour']
+    frame = calendar_features(history['timestamp']).assign(route_id=history['route_id'].to_numpy())
+    X = to_feature_matrix(frame, features)
+    y = history['demand'].to_numpy(dtype=np.float64)
+    _write_status(status_path, progress=0.3)
+
+    # Rows are in time order: the test set is the most recent 20%
+    split = int(len(X) * 0.8)
+    model = HistGradientBoostingRegressor(max_iter=int(params.get('max_iter', 100)), learning_rate=0.1,
+                                          max_depth=5, random_state=42)
+    model.fit(X[:split], y[:split])
+    predictions = model.predict(X[split:])
+    observed = y[split:] > 0
+    test_mae = float(mean_absolute_error(y[split:], predictions))
+    test_mape = float(np.mean(np.abs(predictions[observed] - y[split:][observed]) / y[split:][observed]) * 100)
+    _write_status(status_path, progress=0.9, test_mae=test_mae)
+
+    artifact_path = os.path.join(job_dir, os.path.basename(settings.DEMAND_MODEL_FILE))
+    with open(artifact_path, 'wb') as f:
+        pickle.dump({
+            'model': model,
+            'features': features,
+            'metrics': {'test_mae': test_mae, 'test_mape': test_mape, 'accuracy': max(0.0, 100 - test_mape)},
+            'trained_at': datetime.now().isoformat(),
+            'training_samples': split,
+            'test_samples': len(X) - split
+        }, f)
+
+    return {
+        'model_name': 'demand_gbm',
+        'artifacts': {'model': artifact_path},
+        'test_mae': test_mae,
+        'test_mape': test_mape,
+        'routes': int(pd.unique(history['route_id']).size)
+    }
+
+
+def _run_job(trainer: Callable, job_dir: str, status_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker-process entry point: run a trainer and record its outcome"""
+    _write_status(status_path, status='running', started_at=datetime.now().isoformat())
+    try:
+        result = trainer(job_dir, status_path, params)
+    except Exception as e:
+        _write_status(status_path, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+        raise
+    _write_status(status_path, status='trained', progress=1.0, result=result)
+    return result
+
+
+class TrainingJobManager:
+    """
+    Runs model training in a separate process.
+    Submitting returns a job id immediately; status and progress live in
+    JSON files under TRAINING_JOBS_PATH so any worker can report them.
+    When a job finishes, its artifacts are published as the active version
+    in the model registry, which every worker hot-swaps, so requests never
+    see a half-trained or half-written model. 'gbm' retrains the model
+    /demand/predict serves; 'lstm' the exported LSTM runtime.
+    """
+
+    TRAINERS = {'gbm': train_gbm_job, 'lstm': train_lstm_job}
+
+    def __init__(self, jobs_path: str = None):
+        self.jobs_path = jobs_path or settings.TRAINING_JOBS_PATH
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str = 'lstm', params: Dict[str, Any] = None,
+               on_complete: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+        """Queue a training job and return its initial status"""
+        if kind not in self.TRAINERS:
+            raise ValueError(f"Unknown training job '{kind}'. Available: {sorted(self.TRAINERS)}")
+
+        job_id = f"{kind}-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        job_dir = os.path.join(self.jobs_path, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        status_path = self._status_path(job_id)
+        _write_status(status_path, job_id=job_id, kind=kind, params=params or {}, status='queued',
+                      progress=0.0, submitted_at=datetime.now().isoformat())
+
+        future = self._get_executor().submit(_run_job, self.TRAINERS[kind], job_dir, status_path, params or {})
+        future.add_done_callback(lambda f: self._finish(job_id, f, on_complete or self.promote))
+
+        logger.info(f"🤖 Training job {job_id} queued")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current status of a job"""
+        path = self._status_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent jobs first"""
+        if not os.path.isdir(self.jobs_path):
+            return []
+        job_ids = sorted(
+            (name for name in os.listdir(self.jobs_path) if os.path.exists(self._status_path(name))),
+            key=lambda name: os.path.getmtime(self._status_path(name)),
+            reverse=True
+        )
+        return [self.get(job_id) for job_id in job_ids[:limit]]
+
+    def promote(self, result: Dict[str, Any]):
+        """
+        Publish trained artifacts as the active registry version and hot-swap
+        them here. The registry loaders install the version into the serving
+        singletons (demand_gbm into the demand model registry /demand/predict
+        reads), so a promotion fails if this worker could not load it.
+        """
+        from app.ml.model_registry import model_registry
+
+        metadata = {key: value for key, value in result.items() if key not in ('artifacts', 'model_name')}
+        manifest = model_registry.publish(result['model_name'], result['artifacts'], metadata=metadata)
+        result['version'] = manifest['version']
+
+        # Other workers pick the new version up on their next poll
+        model_registry.poll()
+        if model_registry.current_version(result['model_name']) != manifest['version']:
+            raise RuntimeError(f"{result['model_name']} {manifest['version']} was published but could not be loaded")
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _finish(self, job_id: str, future, on_complete: Callable[[Dict[str, Any]], None]):
+        """Runs in the serving process once the worker returns"""
+        status_path = self._status_path(job_id)
+        if future.cancelled():
+            _write_status(status_path, status='cancelled', finished_at=datetime.now().isoformat())
+            return
+        if future.exception() is not None:
+            if self.get(job_id).get('status') != 'failed':
+                _write_status(status_path, status='failed', error=str(future.exception()),
+                              finished_at=datetime.now().isoformat())
+            logger.error(f"❌ Training job {job_id} failed: {future.exception()}")
+            return
+
+        try:
+            result = future.result()
+            on_complete(result)
+            _write_status(status_path, status='completed', version=result.get('version'),
+                          finished_at=datetime.now().isoformat())
+            logger.info(f"✅ Training job {job_id} completed and promoted")
+        except Exception as e:
+            _write_status(status_path, status='failed', error=f"Promotion failed: {e}",
+                          finished_at=datetime.now().isoformat())
+            logger.error(f"❌ Training job {job_id} could not be promoted: {e}")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # One job at a time; spawn keeps TensorFlow state out of the serving process
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _status_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_path, job_id, 'status.json')
+
+
+# Global instance
+training_jobs = TrainingJobManager()
@@ -0,0 +1,153 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.db.clickhouse import clickhouse_conn
+
+logger = logging.getLogger(__name__)
+
+
+# Per-user aggregate states, kept up to date by the materialized view below.
+# Reads finalize the states with -Merge combinators instead of scanning transacciones.
+USER_FEATURES_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS user_features_agg (
+    user_id UInt64,
+    transactions_state AggregateFunction(count),
+    avg_spending_state AggregateFunction(avg, Float64),
+    unique_routes_state AggregateFunction(uniq, UInt32),
+    morning_ratio_state AggregateFunction(avg, UInt8),
+    evening_ratio_state AggregateFunction(avg, UInt8),
+    weekend_ratio_state AggregateFunction(avg, UInt8),
+    top_route_state AggregateFunction(topK(1), UInt32),
+    peak_hour_state AggregateFunction(topK(1), UInt8),
+    first_seen_at SimpleAggregateFunction(min, DateTime),
+    last_seen_at SimpleAggregateFunction(max, DateTime)
+) ENGINE = AggregatingMergeTree()
+ORDER BY user_id
+"""
+
+USER_FEATURES_STATE_SELECT = """
+SELECT
+    toUInt64(user_id) AS user_id,
+    countState() AS transactions_state,
+    avgState(toFloat64(monto)) AS avg_spending_state,
+    uniqState(toUInt32(ruta_id)) AS unique_routes_state,
+    avgState(toUInt8(hora >= 6 AND hora <= 9)) AS morning_ratio_state,
+    avgState(toUInt8(hora >= 17 AND hora <= 20)) AS evening_ratio_state,
+    avgState(toUInt8(tipo_dia = 'Fin de semana')) AS weekend_ratio_state,
+    topKState(1)(toUInt32(ruta_id)) AS top_route_state,
+    topKState(1)(toUInt8(hora)) AS peak_hour_state,
+    min(fecha_hora) AS first_seen_at,
+    max(fecha_hora) AS last_seen_at
+FROM transacciones
+WHERE user_id IS NOT NULL
+GROUP BY user_id
+"""
+
+USER_FEATURES_VIEW_DDL = f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS user_features_mv
+TO user_features_agg AS
+{USER_FEATURES_STATE_SELECT}
+"""
+
+
+class UserFeatureService:
+    """Service for reading per-user segmentation features from ClickHouse"""
+
+    COLUMNS = [
+        'user_id', 'usage_frequency', 'avg_spending', 'route_diversity',
+        'peak_hour_usage_ratio', 'morning_usage_ratio', 'evening_usage_ratio',
+        'weekend_usage_ratio', 'total_transactions',
+        'top_route', 'peak_hour', 'last_seen'
+    ]
+
+    def ensure_schema(self):
+        """Create the aggregate table and the materialized view feeding it"""
+        clickhouse_conn.execute(USER_FEATURES_TABLE_DDL)
+        clickhouse_conn.execute(USER_FEATURES_VIEW_DDL)
+        logger.info("✅ User feature store schema ready")
+
+    def backfill(self):
+        """Load aggregate states for transactions inserted before the view existed"""
+        clickhouse_conn.execute(f"INSERT INTO user_features_agg {USER_FEATURES_STATE_SELECT}")
+        logger.info("✅ User feature store backfilled from transacciones")
+
+    def load_features(self, min_transactions: int = 3,
+                      updated_since: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+        """
+        Read finalized user features.
+        With updated_since only users with transactions after that time are
+        returned (the delta for incremental segmentation). Returns a DataFrame
+        with the DBSCAN feature columns, or None when the store is unavailable
+        or empty.
+        """
+        try:
+            delta_filter = ""
+            params = {'min_transactions': min_transactions}
+            if updated_since is not None:
+                # Narrow to changed users first so only their states are merged
+                delta_filter = """
+                WHERE user_id IN (
+                    SELECT user_id FROM user_features_agg
+                    WHERE last_seen_at > %(updated_since)s
+                )"""
+                params['updated_since'] = updated_since
+
+            query = f"""
+            SELECT
+                user_id,
+                total_transactions / greatest(dateDiff('day', first_seen, last_seen) + 1, 1) * 30
+                    AS usage_frequency,
+                avg_spending,
+                route_diversity,
+                morning_usage_ratio + evening_usage_ratio AS peak_hour_usage_ratio,
+                morning_usage_ratio,
+                evening_usage_ratio,
+                weekend_usage_ratio,
+                total_transactions,
+                top_route,
+                peak_hour,
+                last_seen
+            FROM (
+                SELECT
+                    user_id,
+                    countMerge(transactions_state) AS total_transactions,
+                    avgMerge(avg_spending_state) AS avg_spending,
+                    uniqMerge(unique_routes_state) AS route_diversity,
+                    avgMerge(morning_ratio_state) AS morning_usage_ratio,
+                    avgMerge(evening_ratio_state) AS evening_usage_ratio,
+                    avgMerge(weekend_ratio_state) AS weekend_usage_ratio,
+                    arrayElement(topKMerge(1)(top_route_state), 1) AS top_route,
+                    arrayElement(topKMerge(1)(peak_hour_state), 1) AS peak_hour,
+                    min(first_seen_at) AS first_seen,
+                    max(last_seen_at) AS last_seen
+                FROM user_features_agg{delta_filter}
+                GROUP BY user_id
+                HAVING total_transactions >= %(min_transactions)s
+            )
+            ORDER BY user_id
+            """
+
+            columns = clickhouse_conn.execute(query, params, columnar=True)
+
+            if not columns or len(columns[0]) == 0:
+                logger.warning("⚠️ No user features found in ClickHouse")
+                return None
+
+            df = pd.DataFrame({
+                name: np.asarray(values) for name, values in zip(self.COLUMNS, columns)
+            })
+
+            logger.info(f"✅ Loaded features for {len(df)} users from ClickHouse")
+            return df
+
+        except Exception as e:
+            logger.error(f"❌ Error loading user features: {e}")
+            return None
+
+
+# Global instance
+user_feature_service = UserFeatureService()
@@ -0,0 +1,55 @@
+"""
+Configuración de gunicorn para producción con varios workers uvicorn.
+
+    gunicorn -c gunicorn_conf.py app.main:app
+
+Con preload_app el proceso master importa la app y carga los modelos
+(BERT, GBM, LSTM, DBSCAN) antes de crear los workers: los pesos quedan en
+memoria compartida copy-on-write y cada worker solo paga su memoria propia.
+Las conexiones a ClickHouse, MongoDB y Redis se abren en cada worker.
+
+Variables de entorno:
+    WEB_CONCURRENCY   número de workers (por defecto: núcleos disponibles)
+    PRELOAD_APP       true/false (por defecto true)
+    BIND              dirección de escucha (por defecto 0.0.0.0:8000)
+    WORKER_TIMEOUT    segundos antes de reiniciar un worker bloqueado
+    TORCH_NUM_THREADS hilos de torch por worker (por defecto núcleos / workers)
+"""
+
+import gc
+import os
+
+from app.core.config import settings
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    """Master, después de importar la app y antes de crear los workers"""
+    if not preload_app:
+        return
+
+    from app.main import preload_models
+
+    for name, status in preload_models().items():
+        server.log.info(f"Preload {name}: {status}")
+
+    # Los objetos cargados no se recorren más en el GC: así el recolector
+    # de cada worker no escribe en sus páginas y no rompe el copy-on-write
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Worker recién creado: repartir los núcleos entre los workers"""
+    from app.main import init_worker
+
+    init_worker(torch_threads=settings.TORCH_NUM_THREADS or max(1, (os.cpu_count() or 1) // workers))
@@ -0,0 +1,158 @@
+"""
+Benchmark de serialización de respuestas JSON
+Compara el camino anterior (casts float()/int() en los routers,
+jsonable_encoder y JSONResponse con json.dumps) con AppJSONResponse
+(orjson con numpy y datetimes nativos), sobre payloads con la forma de las
+respuestas reales: pronósticos por ruta, perfiles/outliers de
+segmentación y asignaciones de clusters. Además mide los bytes en crudo,
+con gzip y con brotli (si está instalado) al nivel que usa el middleware.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import gzip
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.compression import HAS_BROTLI
+from app.core.config import settings
+from app.core.responses import AppJSONResponse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de respuestas JSON")
+    parser.add_argument('--repeat', type=int, default=50, help="Repeticiones por payload")
+    parser.add_argument('--routes', type=int, default=50, help="Rutas en el payload de pronósticos")
+    parser.add_argument('--users', type=int, default=5000, help="Usuarios en los payloads de segmentación")
+    parser.add_argument('--output', type=str, default=None, help="Archivo JSON de salida")
+    return parser.parse_args()
+
+
+def build_payloads(routes: int, users: int) -> dict:
+    """Payloads con los tipos que devuelven los servicios (escalares numpy, datetimes)"""
+    rng = np.random.default_rng(42)
+    start = datetime(2025, 1, 6, 8, 0)
+    demand = rng.gamma(4.0, 30.0, size=(routes, 24))
+    hours = (start.hour + np.arange(1, 25)) % 24
+
+    forecasts = {
+        'forecasts': [
+            {
+                'route_id': route_id,
+                'predictions': [
+                    {'timestamp': start + timedelta(hours=h + 1), 'hour': hours[h],
+                     'predicted_demand': demand[route_id, h], 'confidence': 0.87}
+                    for h in range(24)
+                ],
+            }
+            for route_id in range(routes)
+        ],
+        'generated_at': start,
+    }
+
+    features = rng.random((users, 3)) * [30, 5000, 10]
+    outliers = {
+        'outliers': [
+            {'user_id': user_id, 'usage_frequency': row[0], 'avg_spending': row[1],
+             'route_diversity': row[2], 'reason': "Comportamiento atípico detectado por DBSCAN"}
+            for user_id, row in enumerate(features)
+        ],
+        'total_outliers': users,
+        'generated_at': start,
+    }
+
+    labels = rng.integers(-1, 8, size=users)
+    assignments = {
+        'assignments': [{'user_id': user_id, 'cluster_id': label} for user_id, label in enumerate(labels)],
+        'version': 'v3',
+        'generated_at': start,
+    }
+    return {'forecasts': forecasts, 'outliers': outliers, 'assignments': assignments}
+
+
+def to_python(value):
+    """Lo que hacían los casts float()/int() de los routers antes de responder"""
+    if isinstance(value, dict):
+        return {key: to_python(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_python(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def render_before(payload) -> bytes:
+    return JSONResponse(jsonable_encoder(to_python(payload))).body
+
+
+def render_after(payload) -> bytes:
+    return AppJSONResponse(payload).body
+
+
+def timed(render, payload, repeat: int):
+    body = render(payload)  # calentamiento
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render(payload)
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+
+def compressed_sizes(body: bytes) -> dict:
+    sizes = {'raw': len(body), 'gzip': len(gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL))}
+    if HAS_BROTLI:
+        import brotli
+        sizes['br'] = len(brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY))
+    return sizes
+
+
+def main():
+    args = parse_args()
+    payloads = build_payloads(args.routes, args.users)
+    if not HAS_BROTLI:
+        logger.info("ℹ️  brotli no está instalado; solo se mide gzip")
+
+    results = []
+    for name, payload in payloads.items():
+        logger.info(f"🔬 Midiendo {name}...")
+        before_ms, before_body = timed(render_before, payload, args.repeat)
+        after_ms, after_body = timed(render_after, payload, args.repeat)
+        # Mismo contenido: el ahorro de bytes viene de la compresión, no del serializador
+        assert json.loads(before_body) == json.loads(after_body)
+        results.append({
+            'payload': name,
+            'before_ms': round(before_ms, 2),
+            'after_ms': round(after_ms, 2),
+            'speedup': round(before_ms / after_ms, 1) if after_ms else None,
+            'before_bytes': compressed_sizes(before_body),
+            'after_bytes': compressed_sizes(after_body),
+        })
+
+    print(f"\n{'payload':>12} {'antes':>9} {'después':>9} {'x':>6} {'bytes':>10} {'gzip':>9}"
+          + (f" {'br':>9}" if HAS_BROTLI else ''))
+    for r in results:
+        sizes = r['after_bytes']
+        line = (f"{r['payload']:>12} {r['before_ms']:>7.2f}ms {r['after_ms']:>7.2f}ms {r['speedup']:>5}x "
+                f"{sizes['raw']:>10} {sizes['gzip']:>9}")
+        if HAS_BROTLI:
+            line += f" {sizes['br']:>9}"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"✅ Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
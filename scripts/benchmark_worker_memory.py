@@ -0,0 +1,155 @@
+"""
+Benchmark de memoria con varios workers de gunicorn (solo Linux)
+Arranca el servicio con gunicorn_conf.py con y sin preload_app, espera a
+que /ready responda y mide la memoria de cada proceso desde
+/proc/<pid>/smaps_rollup: RSS, PSS (memoria compartida repartida entre
+los procesos) y USS (memoria propia). Con preload los pesos de los modelos
+se cuentan una sola vez, así que el PSS total debe crecer mucho más
+despacio con el número de workers.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import logging
+import signal
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria de workers gunicorn")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help="Números de workers a medir")
+    parser.add_argument('--port', type=int, default=8765, help="Puerto local para las pruebas")
+    parser.add_argument('--timeout', type=float, default=300, help="Segundos máximos esperando /ready")
+    parser.add_argument('--output', type=str, default=None, help="Archivo JSON de salida")
+    return parser.parse_args()
+
+
+def read_memory(pid: int) -> dict:
+    """RSS, PSS y USS de un proceso en MB"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        'rss_mb': round(fields.get('Rss', 0.0), 1),
+        'pss_mb': round(fields.get('Pss', 0.0), 1),
+        'uss_mb': round(fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0), 1),
+    }
+
+
+def child_pids(parent: int) -> list:
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                # El nombre del proceso va entre paréntesis y puede tener espacios
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def wait_ready(port: int, timeout: float) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            status = json.loads(e.read() or b'{}')
+            if status.get('loading_done'):
+                # Algún componente obligatorio falló; igual se puede medir
+                return status
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"El servicio no quedó listo en {timeout}s")
+
+
+def measure(workers: int, preload: bool, port: int, timeout: float) -> dict:
+    env = {**os.environ, 'WEB_CONCURRENCY': str(workers), 'PRELOAD_APP': str(preload).lower(),
+           'BIND': f"127.0.0.1:{port}"}
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py', 'app.main:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        ready = wait_ready(port, timeout)
+        # Todos los workers deben haber arrancado (el /ready lo atiende uno solo)
+        deadline = time.time() + timeout
+        while len(child_pids(process.pid)) < workers and time.time() < deadline:
+            time.sleep(0.5)
+        time.sleep(2)
+
+        master = read_memory(process.pid)
+        worker_memory = [read_memory(pid) for pid in child_pids(process.pid)]
+        return {
+            'workers': workers,
+            'preload': preload,
+            'master': master,
+            'worker_avg': {
+                key: round(sum(m[key] for m in worker_memory) / len(worker_memory), 1)
+                for key in master
+            } if worker_memory else None,
+            'total_pss_mb': round(master['pss_mb'] + sum(m['pss_mb'] for m in worker_memory), 1),
+            'total_rss_mb': round(master['rss_mb'] + sum(m['rss_mb'] for m in worker_memory), 1),
+            'components': {name: c['status'] for name, c in ready.get('components', {}).items()}
+        }
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        logger.error("❌ Se necesita Linux >= 4.14 (/proc/<pid>/smaps_rollup)")
+        sys.exit(1)
+
+    results = []
+    for workers in args.workers:
+        for preload in (False, True):
+            logger.info(f"🔬 Midiendo {workers} workers, preload={preload}...")
+            results.append(measure(workers, preload, args.port, args.timeout))
+
+    print(f"\n{'workers':>8} {'preload':>8} {'PSS total':>10} {'RSS total':>10} {'USS/worker':>11}")
+    for r in results:
+        uss = r['worker_avg']['uss_mb'] if r['worker_avg'] else 0.0
+        print(f"{r['workers']:>8} {str(r['preload']):>8} {r['total_pss_mb']:>9.1f}M "
+              f"{r['total_rss_mb']:>9.1f}M {uss:>10.1f}M")
+
+    # Con preload el RSS suma los pesos compartidos en cada worker; el PSS no
+    for workers in args.workers:
+        without, with_preload = [r for r in results if r['workers'] == workers]
+        saved = without['total_pss_mb'] - with_preload['total_pss_mb']
+        print(f"{workers} workers: preload ahorra {saved:.1f} MB de PSS")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"✅ Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
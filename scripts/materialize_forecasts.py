@@ -0,0 +1,57 @@
+"""
+Script de materialización de pronósticos de demanda
+Calcula el pronóstico de todas las rutas activas y lo guarda en ClickHouse
+(tabla demand_forecasts) y Redis, junto con la versión del modelo y el
+watermark de datos. Con --loop se repite periódicamente (o usar cron)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Materialización de pronósticos de demanda")
+    parser.add_argument('--hours-ahead', type=int, default=settings.FORECAST_HORIZON_HOURS,
+                        help="Horizonte del pronóstico en horas")
+    parser.add_argument('--loop', action='store_true',
+                        help=f"Repetir cada FORECAST_REFRESH_MINUTES ({settings.FORECAST_REFRESH_MINUTES} min)")
+    args = parser.parse_args()
+
+    from app.db.clickhouse import clickhouse_conn
+    from app.db.redis_cache import redis_conn
+    from app.ml.demand_baseline import demand_baseline
+    from app.services.demand_service import demand_service
+    from app.services.forecast_materializer import forecast_materializer
+
+    clickhouse_conn.connect()
+    try:
+        redis_conn.connect()
+    except Exception as e:
+        logger.warning(f"⚠️ Redis no disponible, solo se escribirá en ClickHouse: {e}")
+
+    while True:
+        logger.info("=" * 60)
+        logger.info("📈 MATERIALIZACIÓN DE PRONÓSTICOS")
+        logger.info("=" * 60)
+
+        demand_baseline.load_profiles(demand_service.get_hourly_profile())
+        summary = forecast_materializer.run(hours_ahead=args.hours_ahead)
+        logger.info(json.dumps(summary, indent=2, default=str))
+
+        if not args.loop:
+            break
+        time.sleep(settings.FORECAST_REFRESH_MINUTES * 60)
+
+
+if __name__ == "__main__":
+    main()
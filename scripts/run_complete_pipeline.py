@@ -133,7 +133,7 @@ def main():
         logger.info("\n📁 Modelos guardados en:")
         logger.info("   - models/lstm_demand_v1.h5")
         logger.info("   - models/bert_sentiment_v1/")
-        logger.info("   - models/dbscan_users_v1.pkl")
+        logger.info("   - models/dbscan_segmentation/")
         logger.info("\n🚀 Siguiente paso: Reiniciar el servicio Analytics")
         logger.info("   python start_simple.py")
     else:
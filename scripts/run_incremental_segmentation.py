@@ -0,0 +1,43 @@
+"""
+Script de segmentación incremental (pensado para ejecución nocturna)
+Asigna usuarios nuevos o modificados desde la última ejecución usando el
+índice de core samples y reentrena DBSCAN solo si el drift supera el umbral.
+El reentrenamiento se publica en el registro de modelos (user_segmentation)
+y los workers de la API lo cargan en su próximo poll, sin reiniciar
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segmentación incremental de usuarios")
+    parser.add_argument('--force-refit', action='store_true', help="Reentrenar aunque no haya drift")
+    args = parser.parse_args()
+
+    from app.db.clickhouse import clickhouse_conn
+    from app.services.incremental_segmentation import incremental_segmentation
+
+    clickhouse_conn.connect()
+
+    logger.info("=" * 60)
+    logger.info("🔄 SEGMENTACIÓN INCREMENTAL")
+    logger.info("=" * 60)
+
+    try:
+        summary = incremental_segmentation.run(force_refit=args.force_refit)
+    except RuntimeError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+    logger.info(json.dumps(summary, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Workers de generación de reportes
+Toman trabajos de la cola de reportes en Redis (REPORT_QUEUE_BACKEND=redis),
+leen los datos de ClickHouse por bloques y escriben el archivo en el
+almacenamiento configurado (disco o GridFS). Se pueden lanzar tantas
+instancias como haga falta, independientes de la API; en ese caso la API
+puede arrancar con REPORT_WORKERS=0.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import logging
+import signal
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers de generación de reportes")
+    parser.add_argument('--workers', type=int, default=2, help="Hilos de trabajo en este proceso")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.services.report_service import report_service
+
+    if settings.REPORT_QUEUE_BACKEND != 'redis':
+        logger.error("❌ Los workers externos necesitan REPORT_QUEUE_BACKEND=redis")
+        sys.exit(1)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    report_service.start_workers(args.workers)
+    logger.info(f"📄 {args.workers} workers de reportes esperando trabajos "
+                f"(almacenamiento: {settings.REPORT_STORAGE_BACKEND})")
+    stop.wait()
+
+    logger.info("🛑 Deteniendo workers (el reporte en curso termina primero)...")
+    report_service.stop_workers(timeout=None)
+
+
+if __name__ == "__main__":
+    main()
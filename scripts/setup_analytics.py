@@ -6,7 +6,6 @@ import os
 import sys
 import logging
 from datetime import datetime
-import pickle
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -64,6 +63,7 @@ def configure_models():
     logger.info("🔧 Entrenando DBSCAN...")
     
     try:
+        from app.core.config import settings
         from app.ml.dbscan_model import dbscan_segmentation
         
         users_data = dbscan_segmentation.generate_synthetic_users(num_users=1000)
@@ -73,12 +73,9 @@ def configure_models():
         logger.info(f"   Clusters: {result['n_clusters']}")
         logger.info(f"   Outliers: {result['n_outliers']}")
         
-        # Guardar modelo
-        os.makedirs('models', exist_ok=True)
-        model_path = os.path.join('models', 'dbscan_users_v1.pkl')
-        with open(model_path, 'wb') as f:
-            pickle.dump(dbscan_segmentation, f)
-        logger.info(f"   Guardado en: {model_path}")
+        # Guardar modelo (arrays .npy + manifest.json, se cargan con mmap al iniciar)
+        dbscan_segmentation.save(settings.DBSCAN_MODEL_PATH)
+        logger.info(f"   Guardado en: {settings.DBSCAN_MODEL_PATH}")
         
     except Exception as e:
         logger.warning(f"⚠️  DBSCAN usará datos sintéticos en cada request: {e}")
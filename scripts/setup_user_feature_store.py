@@ -0,0 +1,43 @@
+"""
+Script para crear el feature store de usuarios en ClickHouse
+Crea la tabla AggregatingMergeTree, la vista materializada que la mantiene
+y carga los estados agregados de las transacciones ya existentes
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Configurar feature store de usuarios")
+    parser.add_argument('--skip-backfill', action='store_true',
+                        help="No cargar transacciones históricas (solo esquema)")
+    args = parser.parse_args()
+
+    from app.db.clickhouse import clickhouse_conn
+    from app.services.user_feature_service import user_feature_service
+
+    clickhouse_conn.connect()
+
+    logger.info("📊 Creando tabla user_features_agg y vista user_features_mv...")
+    user_feature_service.ensure_schema()
+
+    if not args.skip_backfill:
+        # Ejecutar una sola vez: la vista materializada solo procesa inserciones nuevas
+        logger.info("🔄 Cargando estados agregados desde transacciones...")
+        user_feature_service.backfill()
+
+    features = user_feature_service.load_features()
+    if features is not None:
+        logger.info(f"✅ Feature store listo: {len(features)} usuarios")
+        logger.info("ℹ️  Activar con SEGMENTATION_USE_FEATURE_STORE=true para segmentar usuarios reales")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Script para explorar parámetros de DBSCAN (eps, min_samples)
+Calcula la curva k-distance y el grafo de vecinos una sola vez y evalúa
+toda la grilla en paralelo reutilizándolo
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Barrido de parámetros DBSCAN")
+    parser.add_argument('--eps', type=float, nargs='+', default=[0.3, 0.5, 0.8, 1.0, 1.5],
+                        help="Valores de eps a evaluar")
+    parser.add_argument('--min-samples', type=int, nargs='+', default=[3, 5, 10, 20],
+                        help="Valores de min_samples a evaluar")
+    parser.add_argument('--users', type=int, default=5000, help="Usuarios sintéticos a generar")
+    parser.add_argument('--seed', type=int, default=42, help="Semilla de los datos sintéticos")
+    parser.add_argument('--jobs', type=int, default=-1, help="Procesos en paralelo (-1 = todos los núcleos)")
+    parser.add_argument('--output', type=str, default=None, help="Archivo JSON de salida")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from app.ml.dbscan_model import DBSCANUserSegmentation
+
+    model = DBSCANUserSegmentation()
+    users_data = model.generate_synthetic_users(num_users=args.users, random_state=args.seed)
+
+    logger.info("=" * 60)
+    logger.info(f"🔎 Barrido DBSCAN: {len(args.eps)} eps × {len(args.min_samples)} min_samples")
+    logger.info("=" * 60)
+
+    sweep = model.sweep(users_data, args.eps, args.min_samples, n_jobs=args.jobs)
+
+    logger.info(f"{'eps':>6} {'min_s':>6} {'clusters':>9} {'outliers':>9} {'ratio':>7} {'silhouette':>11}")
+    for point in sweep['results']:
+        silhouette = point['silhouette_score']
+        logger.info(
+            f"{point['eps']:>6.2f} {point['min_samples']:>6d} {point['n_clusters']:>9d} "
+            f"{point['n_outliers']:>9d} {point['outlier_ratio']:>7.2%} "
+            f"{silhouette if silhouette is not None else float('nan'):>11.3f}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(sweep, f, indent=2)
+        logger.info(f"💾 Resultados guardados en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -166,8 +166,8 @@ def train_dbscan_model():
     
     try:
         from clickhouse_driver import Client
+        from app.core.config import settings
         from app.ml.dbscan_model import dbscan_segmentation
-        import pickle
         
         logger.info("📊 Conectando a ClickHouse...")
         client = Client(
@@ -226,13 +226,10 @@ def train_dbscan_model():
         logger.info(f"   Clusters encontrados: {result['n_clusters']}")
         logger.info(f"   Outliers: {result['n_outliers']}")
         
-        # Guardar modelo
-        os.makedirs('models', exist_ok=True)
-        model_path = os.path.join('models', 'dbscan_users_v1.pkl')
-        with open(model_path, 'wb') as f:
-            pickle.dump(dbscan_segmentation, f)
+        # Guardar modelo (arrays .npy + manifest.json, se cargan con mmap al iniciar)
+        dbscan_segmentation.save(settings.DBSCAN_MODEL_PATH)
         
-        logger.info(f"💾 Modelo guardado en: {model_path}")
+        logger.info(f"💾 Modelo guardado en: {settings.DBSCAN_MODEL_PATH}")
         return True
         
     except ImportError as e:
@@ -4,8 +4,7 @@ This script uses the project's synthetic data generators to train models
 locally for development/testing. For production/historical training you
 should provide real datasets and configure proper training infra.
 """
-import os
-import pickle
+from app.core.config import settings
 from app.ml.lstm_model import lstm_predictor
 from app.ml.dbscan_model import dbscan_segmentation
 
@@ -24,11 +23,8 @@ def train_dbscan():
     users = dbscan_segmentation.generate_synthetic_users(num_users=500)
     print("[train] Fitting DBSCAN (demo)...")
     res = dbscan_segmentation.fit(users)
-    os.makedirs('models', exist_ok=True)
-    dbscan_path = os.path.join('models', 'dbscan_segmentation.pkl')
-    with open(dbscan_path, 'wb') as f:
-        pickle.dump(dbscan_segmentation, f)
-    print(f"[train] DBSCAN model object saved to: {dbscan_path}")
+    dbscan_segmentation.save(settings.DBSCAN_MODEL_PATH)
+    print(f"[train] DBSCAN model arrays saved to: {settings.DBSCAN_MODEL_PATH}")
     return res
 
 
@@ -11,7 +11,6 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import pickle
-from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import logging
@@ -23,11 +22,17 @@ logger = logging.getLogger(__name__)
 # 1. ENTRENAR DBSCAN (Clustering)
 # ===========================
 def train_dbscan_model():
-    """Entrenar DBSCAN con datos reales de ClickHouse"""
+    """
+    Entrenar DBSCAN con datos reales de ClickHouse y publicarlo en el
+    registro de modelos (user_segmentation), desde donde lo sirven los
+    workers de la API sin reiniciar
+    """
     try:
         from app.db.clickhouse import clickhouse_conn
-        from sklearn.cluster import DBSCAN
-        from sklearn.metrics import silhouette_score, davies_bouldin_score
+        from app.services.segmentation_store import segmentation_store
+        from app.services.user_feature_service import user_feature_service
+        from app.ml.feature_matrix import to_feature_matrix
+        from sklearn.metrics import davies_bouldin_score
         
         logger.info("=" * 60)
         logger.info("🎯 ENTRENANDO MODELO DBSCAN")
@@ -35,56 +40,31 @@ def train_dbscan_model():
         
         clickhouse_conn.connect()
         
-        # Query para obtener features de usuarios
-        query = """
-        SELECT 
-            user_id,
-            COUNT(*) as frequency,
-            AVG(monto) as avg_spending,
-            AVG(CASE WHEN hora >= 6 AND hora <= 9 THEN 1 ELSE 0 END) as morning_usage,
-            AVG(CASE WHEN hora >= 17 AND hora <= 20 THEN 1 ELSE 0 END) as evening_usage,
-            COUNT(DISTINCT ruta_id) as unique_routes,
-            AVG(CASE WHEN tipo_dia = 'Fin de semana' THEN 1 ELSE 0 END) as weekend_usage
-        FROM transacciones
-        WHERE user_id IS NOT NULL
-        GROUP BY user_id
-        HAVING frequency >= 3
-        """
-        
-        logger.info("📊 Obteniendo datos de usuarios desde ClickHouse...")
-        result = clickhouse_conn.execute(query)
-        df = pd.DataFrame(result, columns=['user_id', 'frequency', 'avg_spending', 
-                                           'morning_usage', 'evening_usage', 
-                                           'unique_routes', 'weekend_usage'])
+        # Features agregadas por usuario desde el feature store (sin escanear transacciones)
+        logger.info("📊 Obteniendo features de usuarios desde el feature store...")
+        df = user_feature_service.load_features(min_transactions=3)
+        if df is None:
+            raise RuntimeError("Feature store vacío. Ejecutar scripts/setup_user_feature_store.py")
         logger.info(f"✅ {len(df)} usuarios obtenidos")
         
-        # Preparar features
-        features = ['frequency', 'avg_spending', 'morning_usage', 'evening_usage', 
-                   'unique_routes', 'weekend_usage']
-        X = df[features].values
-        
-        # Normalizar
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        # Entrenar DBSCAN
+        # Mismo store, parámetros (SEGMENTATION_EPS / SEGMENTATION_MIN_SAMPLES) y
+        # versión que usan los endpoints, así la API sirve este ajuste tal cual
         logger.info("🤖 Entrenando DBSCAN...")
-        dbscan = DBSCAN(eps=0.5, min_samples=5, metric='euclidean')
-        clusters = dbscan.fit_predict(X_scaled)
-        
-        df['cluster'] = clusters
+        segmentation_store.set_snapshot(df, 'feature_store')
+        result = segmentation_store.get_or_fit()
+        clusters = np.asarray(result['labels'])
         
-        # Calcular métricas
-        n_clusters = len(set(clusters)) - (1 if -1 in clusters else 0)
-        n_outliers = list(clusters).count(-1)
+        n_clusters = result['n_clusters']
+        n_outliers = result['n_outliers']
+        silhouette = result['silhouette_score'] or 0
         
-        # Silhouette score (solo para puntos no-outliers)
+        # Davies-Bouldin (solo para puntos no-outliers)
         mask = clusters != -1
         if mask.sum() > 1 and n_clusters > 1:
-            silhouette = silhouette_score(X_scaled[mask], clusters[mask])
+            model = result['model']
+            X_scaled = model.scaler.transform(to_feature_matrix(df, model.FEATURES))
             davies_bouldin = davies_bouldin_score(X_scaled[mask], clusters[mask])
         else:
-            silhouette = 0
             davies_bouldin = 0
         
         logger.info(f"✅ Clusters encontrados: {n_clusters}")
@@ -92,41 +72,19 @@ def train_dbscan_model():
         logger.info(f"📊 Silhouette Score: {silhouette:.3f} (rango: -1 a 1, mejor cerca de 1)")
         logger.info(f"📊 Davies-Bouldin Index: {davies_bouldin:.3f} (menor es mejor)")
         
-        # Guardar modelo
-        os.makedirs('models', exist_ok=True)
-        model_data = {
-            'model': dbscan,
-            'scaler': scaler,
-            'features': features,
-            'clusters_info': {},
-            'metrics': {
-                'n_clusters': n_clusters,
-                'n_outliers': n_outliers,
-                'outlier_percentage': n_outliers/len(df)*100,
-                'silhouette_score': float(silhouette),
-                'davies_bouldin_index': float(davies_bouldin)
-            },
-            'trained_at': datetime.now().isoformat()
+        # Publicar: los workers de la API lo instalan en su próximo poll del registro
+        manifest = segmentation_store.publish(result)
+        logger.info(f"💾 Segmentación {result['version']} publicada (versión de registro {manifest['version']})")
+        
+        return {
+            'n_clusters': n_clusters,
+            'n_outliers': n_outliers,
+            'outlier_percentage': n_outliers/len(df)*100,
+            'silhouette_score': float(silhouette),
+            'davies_bouldin_index': float(davies_bouldin),
+            'version': result['version']
         }
         
-        # Analizar cada cluster
-        for cluster_id in range(n_clusters):
-            cluster_data = df[df['cluster'] == cluster_id]
-            model_data['clusters_info'][f'cluster_{cluster_id}'] = {
-                'size': len(cluster_data),
-                'avg_frequency': float(cluster_data['frequency'].mean()),
-                'avg_spending': float(cluster_data['avg_spending'].mean()),
-                'morning_users': float(cluster_data['morning_usage'].mean()),
-                'evening_users': float(cluster_data['evening_usage'].mean())
-            }
-        
-        with open('models/dbscan_production.pkl', 'wb') as f:
-            pickle.dump(model_data, f)
-        
-        logger.info("💾 Modelo DBSCAN guardado en: models/dbscan_production.pkl")
-        
-        return model_data['metrics']
-        
     except Exception as e:
         logger.error(f"❌ Error entrenando DBSCAN: {e}")
         return None
@@ -135,8 +93,13 @@ def train_dbscan_model():
 # ===========================
 # 2. ENTRENAR MODELO DE DEMANDA (Time Series)
 # ===========================
-def train_demand_model():
-    """Entrenar modelo de predicción de demanda con Prophet"""
+def train_demand_model(estimator='gbm'):
+    """
+    Entrenar modelo de predicción de demanda.
+    estimator='gbm' usa GradientBoostingRegressor; 'hist' usa
+    HistGradientBoostingRegressor (más rápido con muchos registros).
+    El artefacto lo sirve app.ml.demand_models.
+    """
     try:
         from app.db.clickhouse import clickhouse_conn
         
@@ -146,22 +109,22 @@ def train_demand_model():
         
         clickhouse_conn.connect()
         
-        # Query para obtener series temporales
+        # Query para obtener series temporales de todas las rutas
         query = """
         SELECT 
+            ruta_id as route_id,
             toDate(fecha_hora) as ds,
             toHour(fecha_hora) as hour,
             COUNT(*) as y,
             AVG(monto) as avg_amount
         FROM transacciones
-        WHERE ruta_id = 1
-        GROUP BY ds, hour
-        ORDER BY ds, hour
+        GROUP BY route_id, ds, hour
+        ORDER BY ds, hour, route_id
         """
         
         logger.info("📊 Obteniendo series temporales desde ClickHouse...")
         result = clickhouse_conn.execute(query)
-        df = pd.DataFrame(result, columns=['ds', 'hour', 'y', 'avg_amount'])
+        df = pd.DataFrame(result, columns=['route_id', 'ds', 'hour', 'y', 'avg_amount'])
         df['ds'] = pd.to_datetime(df['ds'])
         logger.info(f"✅ {len(df)} registros obtenidos")
         
@@ -172,27 +135,37 @@ def train_demand_model():
         df['is_peak_hour'] = ((df['hour'] >= 7) & (df['hour'] <= 9) | 
                               (df['hour'] >= 17) & (df['hour'] <= 19)).astype(int)
         
-        # Preparar train/test split
+        # Preparar train/test split (ordenado por tiempo: el test son los últimos días)
         train_size = int(len(df) * 0.8)
         train_df = df[:train_size].copy()
         test_df = df[train_size:].copy()
         
         # Modelo simple pero efectivo: Gradient Boosting
-        from sklearn.ensemble import GradientBoostingRegressor
+        from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
         
-        features = ['hour', 'day_of_week', 'is_weekend', 'month', 'is_peak_hour']
+        # route_id permite que cada ruta tenga su propio pronóstico
+        features = ['route_id', 'hour', 'day_of_week', 'is_weekend', 'month', 'is_peak_hour']
         X_train = train_df[features].values
         y_train = train_df['y'].values
         X_test = test_df[features].values
         y_test = test_df['y'].values
         
-        logger.info("🤖 Entrenando Gradient Boosting Regressor...")
-        model = GradientBoostingRegressor(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=5,
-            random_state=42
-        )
+        if estimator == 'hist':
+            logger.info("🤖 Entrenando Histogram Gradient Boosting Regressor...")
+            model = HistGradientBoostingRegressor(
+                max_iter=100,
+                learning_rate=0.1,
+                max_depth=5,
+                random_state=42
+            )
+        else:
+            logger.info("🤖 Entrenando Gradient Boosting Regressor...")
+            model = GradientBoostingRegressor(
+                n_estimators=100,
+                learning_rate=0.1,
+                max_depth=5,
+                random_state=42
+            )
         model.fit(X_train, y_train)
         
         # Predicciones
@@ -249,6 +222,16 @@ def train_demand_model():
         
         logger.info("💾 Modelo de demanda guardado en: models/demand_production.pkl")
         
+        # Registrar versión: los workers la cargan sin reiniciar
+        try:
+            from app.ml.model_registry import model_registry
+            manifest = model_registry.publish(
+                'demand_gbm', {'model': 'models/demand_production.pkl'}, metadata=model_data['metrics']
+            )
+            logger.info(f"📦 Versión registrada y activada: {manifest['version']}")
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo registrar la versión del modelo: {e}")
+        
         return model_data['metrics']
         
     except Exception as e:
@@ -360,6 +343,7 @@ def main():
     logger.info("🚀 ENTRENAMIENTO DE MODELOS DE PRODUCCIÓN")
     logger.info("=" * 80 + "\n")
     
+    os.makedirs('models', exist_ok=True)
     results = {}
     
     # 1. DBSCAN
@@ -9,7 +9,6 @@ import os
 import sys
 import logging
 from datetime import datetime
-import pickle
 
 # Configurar logging
 logging.basicConfig(
@@ -86,6 +85,7 @@ def train_dbscan_model():
     logger.info("=" * 80)
     
     try:
+        from app.core.config import settings
         from app.ml.dbscan_model import dbscan_segmentation
         
         # Generar datos sintéticos de usuarios
@@ -105,13 +105,10 @@ def train_dbscan_model():
         for cluster_id, count in result['cluster_sizes'].items():
             logger.info(f"      Cluster {cluster_id}: {count} usuarios")
         
-        # Guardar modelo
-        os.makedirs('models', exist_ok=True)
-        model_path = os.path.join('models', 'dbscan_users_v1.pkl')
-        with open(model_path, 'wb') as f:
-            pickle.dump(dbscan_segmentation, f)
+        # Guardar modelo (arrays .npy + manifest.json, se cargan con mmap al iniciar)
+        dbscan_segmentation.save(settings.DBSCAN_MODEL_PATH)
         
-        logger.info(f"💾 Modelo guardado en: {model_path}")
+        logger.info(f"💾 Modelo guardado en: {settings.DBSCAN_MODEL_PATH}")
         return True
         
     except Exception as e:
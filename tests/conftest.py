@@ -0,0 +1,41 @@
+import re
+from pathlib import Path
+
+import pytest
+
+
+# Words that may appear bare in the queries besides column names and aliases
+SQL_WORDS = {
+    'select', 'from', 'where', 'and', 'or', 'not', 'in', 'is', 'null', 'as', 'group', 'order',
+    'by', 'having', 'limit', 'asc', 'desc', 'distinct', 'interval', 'day', 'hour', 'left',
+    'join', 'using', 'on', 'settings', 'join_use_nulls'
+}
+
+
+def _transaction_records_columns():
+    """Columns of transaction_records as created by scripts/populate_clickhouse.py"""
+    source = (Path(__file__).resolve().parents[1] / 'scripts' / 'populate_clickhouse.py').read_text()
+    ddl = re.search(r'transaction_records \((.*?)\) ENGINE', source, re.S).group(1)
+    return {line.split()[0] for line in ddl.strip().splitlines()}
+
+
+@pytest.fixture
+def transaction_records_sql():
+    """
+    Check that a query only reads columns transaction_records has.
+    Mocked execute calls accept any SQL, so this is what catches column
+    names of other tables (ruta_id, monto from transacciones). Queries that
+    join another table pass its name and columns as other_names.
+    """
+    columns = _transaction_records_columns()
+
+    def check(query, other_names=()):
+        assert 'transaction_records' in query
+        body = re.sub(r"%\(\w+\)s|'[^']*'", " ", query)
+        aliases = set(re.findall(r'\bas\s+(\w+)', body, re.I))
+        known = columns | aliases | set(other_names) | {'transaction_records'}
+        names = set(re.findall(r'\b([A-Za-z_]\w*)\b(?!\s*\()', body))
+        unknown = {name for name in names if name not in known and name.lower() not in SQL_WORDS}
+        assert not unknown, f"Not columns of transaction_records: {sorted(unknown)}"
+
+    return check
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from datetime import datetime
+
+from app.services.dashboard_composer import DashboardComposer
+from app.services.kpi_service import KPIEngine
+
+
+NOW = datetime(2025, 1, 6, 10, 7)
+
+
+class SlowEngine(KPIEngine):
+    """KPI engine whose fragment sources just sleep"""
+
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = delays
+
+    def _compute_summary(self, window, route_id, row=None):
+        if row is None:
+            time.sleep(self.delays['summary'])
+            row = (100, 80, 250.0, 200.0, 10, 0.5, 2, 2, ([8], [100]), ([1, 2], [60, 40]), ([1, 2], [50, 30]))
+        return super()._compute_summary(window, route_id, row=row)
+
+    def _sentiment_avg(self, start, end):
+        time.sleep(self.delays['sentiment'])
+        return 0.75
+
+    def _compute_realtime(self, window):
+        time.sleep(self.delays['realtime'])
+        if self.delays.get('realtime_fails'):
+            raise ConnectionError("clickhouse down")
+        return {'passengers_last_hour': 5, 'revenue_last_hour': 12.5, 'routes_active': 1}
+
+
+def no_redis(monkeypatch):
+    from app.db import redis_cache as redis_module
+
+    def down(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(redis_module.redis_conn, "get", down)
+    monkeypatch.setattr(redis_module.redis_conn, "set", down)
+
+
+def test_fragments_run_concurrently(monkeypatch):
+    no_redis(monkeypatch)
+    composer = DashboardComposer(SlowEngine({'summary': 0.3, 'sentiment': 0.3, 'realtime': 0.3}), timeout=2)
+
+    started = time.perf_counter()
+    dashboard = asyncio.run(composer.compose_dashboard('daily', now=NOW))
+    elapsed = time.perf_counter() - started
+
+    # Close to the slowest fragment, not the 0.9s sum
+    assert elapsed < 0.6
+    assert dashboard['partial'] is False
+    assert dashboard['metrics']['total_passengers'] == 100
+    assert dashboard['trends']['satisfaction_score'] == 0.75
+    assert dashboard['realtime']['passengers_last_hour'] == 5
+
+
+def test_slow_or_failing_fragments_give_partial_results(monkeypatch):
+    no_redis(monkeypatch)
+    engine = SlowEngine({'summary': 0.0, 'sentiment': 0.5, 'realtime': 0.0, 'realtime_fails': True})
+    composer = DashboardComposer(engine, timeout=0.2)
+
+    dashboard = asyncio.run(composer.compose_dashboard('daily', now=NOW))
+
+    assert dashboard['partial'] is True
+    assert dashboard['fragments']['summary']['status'] == 'ok'
+    assert dashboard['fragments']['sentiment']['status'] == 'timeout'
+    assert dashboard['fragments']['realtime']['status'] == 'error'
+    assert dashboard['metrics']['total_passengers'] == 100
+    assert dashboard['trends']['satisfaction_score'] is None
+    assert dashboard['realtime'] is None
+
+    # The timed out fetch still fills its own cache entry for the next request
+    time.sleep(0.4)
+    kpis = asyncio.run(composer.compose_kpis('daily', now=NOW))
+    assert kpis['sentiment_avg'] == 0.75
+
+
+def test_concurrent_requests_share_inflight_fragments(monkeypatch):
+    no_redis(monkeypatch)
+    engine = SlowEngine({'summary': 0.2, 'sentiment': 0.2, 'realtime': 0.2})
+    calls = []
+    compute = engine._compute_summary
+
+    def counting_summary(window, route_id, row=None):
+        calls.append(window)
+        return compute(window, route_id, row=row)
+
+    monkeypatch.setattr(engine, "_compute_summary", counting_summary)
+    composer = DashboardComposer(engine, timeout=2)
+
+    async def two_requests():
+        return await asyncio.gather(composer.compose_dashboard('daily', now=NOW),
+                                    composer.compose_kpis('daily', now=NOW))
+
+    dashboard, kpis = asyncio.run(two_requests())
+    assert len(calls) == 1
+    assert dashboard['metrics']['total_passengers'] == kpis['total_passengers'] == 100
+    assert not composer._inflight
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from app.ml.dbscan_model import DBSCANUserSegmentation
+
+
+def test_scalable_mode_matches_exact_labels():
+    users_data = DBSCANUserSegmentation().generate_synthetic_users(num_users=400, random_state=7)
+
+    exact = DBSCANUserSegmentation(eps=0.8, min_samples=5, mode='exact')
+    scalable = DBSCANUserSegmentation(eps=0.8, min_samples=5, mode='scalable', chunk_size=64)
+    exact_result = exact.fit(users_data)
+    scalable_result = scalable.fit(users_data)
+
+    assert np.array_equal(exact_result['labels'], scalable_result['labels'])
+    assert scalable.core_samples.dtype == np.float32
+
+
+def test_silhouette_is_sampled_for_large_inputs(monkeypatch):
+    import sklearn.metrics
+
+    calls = []
+    real_silhouette_score = sklearn.metrics.silhouette_score
+
+    def spy(X, labels, **kwargs):
+        calls.append((len(X), kwargs))
+        return real_silhouette_score(X, labels, **kwargs)
+
+    monkeypatch.setattr(sklearn.metrics, "silhouette_score", spy)
+    users_data = DBSCANUserSegmentation().generate_synthetic_users(num_users=400, random_state=7)
+    model = DBSCANUserSegmentation(eps=0.8, min_samples=5, silhouette_sample_size=50)
+    result = model.fit(users_data)
+
+    assert len(calls) == 1 and calls[0][0] > 50
+    assert calls[0][1]["sample_size"] == 50 and calls[0][1]["random_state"] == 42
+    assert -1 <= result['silhouette_score'] <= 1
+
+    calls.clear()
+    DBSCANUserSegmentation(eps=0.8, min_samples=5, silhouette_sample_size=None).fit(users_data)
+    assert "sample_size" not in calls[0][1]
+
+
+def test_hdbscan_assigns_within_core_distance(tmp_path):
+    from app.ml.dbscan_model import has_hdbscan
+    if not has_hdbscan():
+        pytest.skip("HDBSCAN requires scikit-learn >= 1.3")
+
+    users_data = DBSCANUserSegmentation().generate_synthetic_users(num_users=400, random_state=7)
+    model = DBSCANUserSegmentation(eps=0.01, min_samples=5, mode='hdbscan')
+    result = model.fit(users_data)
+    assert (model.core_radii > model.eps).all()
+
+    # Nudge each anchor by half its core distance: beyond eps, still inside its radius
+    direction = np.zeros(len(model.FEATURES))
+    direction[0] = 1.0
+    nudged = model.core_samples + 0.5 * model.core_radii[:, None] * direction
+    raw = model.scaler.inverse_transform(nudged)
+    assert (model.assign_many(raw) != -1).mean() > 0.9
+
+    far_away = {name: 1e6 for name in model.FEATURES}
+    assert model.assign(far_away) == -1
+
+    model.save(str(tmp_path / 'hdbscan'))
+    loaded = DBSCANUserSegmentation.load(str(tmp_path / 'hdbscan'))
+    assert np.array_equal(loaded.assign_many(users_data), model.assign_many(users_data))
+
+
+def test_sweep_matches_individual_fits():
+    users_data = DBSCANUserSegmentation().generate_synthetic_users(num_users=300, random_state=3)
+    sweep = DBSCANUserSegmentation().sweep(users_data, [0.5, 0.9], [4, 8], n_jobs=1)
+
+    assert len(sweep['results']) == 4
+    assert sweep['k_distance'][0]['distance'] >= sweep['k_distance'][-1]['distance']
+    for point in sweep['results']:
+        fitted = DBSCANUserSegmentation(eps=point['eps'], min_samples=point['min_samples']).fit(users_data)
+        assert point['n_clusters'] == fitted['n_clusters']
+        assert point['n_outliers'] == fitted['n_outliers']
+
+
+def test_sweep_leaves_the_fitted_scaler_alone():
+    users_data = DBSCANUserSegmentation().generate_synthetic_users(num_users=300, random_state=3)
+    other_users = DBSCANUserSegmentation().generate_synthetic_users(num_users=200, random_state=9)
+    model = DBSCANUserSegmentation(eps=0.8, min_samples=5)
+    model.fit(users_data)
+    mean, labels = model.scaler.mean_.copy(), model.assign_many(users_data)
+
+    model.sweep(other_users.assign(avg_spending=other_users['avg_spending'] * 3), [0.5], [5], n_jobs=1)
+
+    np.testing.assert_array_equal(model.scaler.mean_, mean)
+    assert np.array_equal(model.assign_many(users_data), labels)
+
+
+def test_analyze_clusters_matches_per_cluster_filtering():
+    users_data = DBSCANUserSegmentation().generate_synthetic_users(num_users=400, random_state=7)
+    columns_before = list(users_data.columns)
+    model = DBSCANUserSegmentation(eps=0.8, min_samples=5)
+    model.fit(users_data)
+
+    clusters, outliers_info = model.analyze_clusters(users_data, top_routes=2, top_hours=3)
+
+    assert list(users_data.columns) == columns_before
+    assert outliers_info['count'] == int((model.labels == -1).sum())
+    for cluster in clusters:
+        members = users_data[model.labels == cluster['cluster_id']]
+        assert cluster['user_count'] == len(members)
+        assert np.isclose(cluster['avg_spending'], members['avg_spending'].mean())
+        assert cluster['common_routes'][0] == members['top_route'].value_counts().idxmax()
+        assert set(cluster['peak_hours']) <= set(members['peak_hour'])
+        assert len(cluster['common_routes']) <= 2 and len(cluster['peak_hours']) <= 3
+
+
+def test_synthetic_peak_hours_follow_peak_usage_ratio():
+    model = DBSCANUserSegmentation()
+    users_data = model.generate_synthetic_users(num_users=2000, random_state=7)
+    in_peak = users_data['peak_hour'].isin(model.PEAK_HOURS)
+
+    commuters = users_data['peak_hour_usage_ratio'] > 0.6
+    weekenders = users_data['peak_hour_usage_ratio'] < 0.4
+    assert in_peak[commuters].mean() > 0.6 > 0.4 > in_peak[weekenders].mean()
+
+
+def test_saved_arrays_are_memory_mapped_and_assign_like_the_fitted_model(tmp_path):
+    users_data = DBSCANUserSegmentation().generate_synthetic_users(num_users=400, random_state=7)
+    model = DBSCANUserSegmentation(eps=0.8, min_samples=5)
+    result = model.fit(users_data)
+
+    model.save(str(tmp_path / 'dbscan'))
+    assert not list(tmp_path.glob('**/*.pkl'))
+    loaded = DBSCANUserSegmentation.load(str(tmp_path / 'dbscan'))
+
+    assert isinstance(loaded.core_samples, np.memmap)
+    assert np.array_equal(loaded.assign_many(users_data), model.assign_many(users_data))
+    core = loaded.core_sample_indices
+    assert np.array_equal(loaded.assign_many(users_data.iloc[core]), result['labels'][core])
@@ -18,3 +18,50 @@ def test_predict_demand():
     data = resp.json()
     assert data.get("route_id") == 1
     assert "predictions" in data
+
+
+def test_forecast_fallback_runs_off_the_event_loop(monkeypatch):
+    import asyncio
+    from app.services.forecast_materializer import forecast_materializer
+
+    calls = []
+
+    def on_event_loop():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    monkeypatch.setattr(forecast_materializer, "get_forecast", lambda route_id, hours: calls.append(on_event_loop()))
+    resp = client.get("/api/v1/analytics/demand/forecast/7?hours=5", headers=get_auth_header())
+
+    assert resp.status_code == 200
+    assert calls == [False]
+    body = resp.json()
+    assert len(body["forecast"]) == 5 and "target_hour" in body["forecast"][0]
+    assert body["data_watermark"] is None
+
+
+def test_forecast_history_and_materialization_run_off_the_event_loop(monkeypatch):
+    import asyncio
+    from app.services.forecast_materializer import forecast_materializer
+
+    calls = []
+
+    def off_loop(name, result):
+        def spy(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                calls.append((name, True))
+            except RuntimeError:
+                calls.append((name, False))
+            return result
+        return spy
+
+    monkeypatch.setattr(forecast_materializer, "get_history", off_loop("history", {"history": []}))
+    monkeypatch.setattr(forecast_materializer, "run", off_loop("run", {"routes": 0}))
+
+    assert client.get("/api/v1/analytics/demand/forecast/7/history", headers=get_auth_header()).json() == {"history": []}
+    assert client.post("/api/v1/analytics/demand/forecast/materialize", headers=get_auth_header()).json() == {"routes": 0}
+    assert calls == [("history", False), ("run", False)]
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.ml.demand_baseline import DemandBaseline
+
+START = datetime(2025, 1, 6, 6, 30)  # Monday; first forecast hour is 07:00
+
+
+def test_static_profile_keeps_original_hourly_bands():
+    baseline = DemandBaseline()
+    forecast = baseline.forecast([1, 2], 24, start=START, seed=7)[1]
+
+    assert 180 - 15 <= forecast[0] <= 180 + 20      # 07:00 morning peak
+    assert 195 - 18 <= forecast[10] <= 195 + 25     # 17:00 evening peak
+    assert 25 - 5 <= forecast[17] <= 25 + 8         # 00:00 night
+    assert forecast.min() >= 10
+
+
+def test_seeded_forecasts_are_reproducible():
+    baseline = DemandBaseline()
+    first = baseline.forecast([1, 2, 3], 48, start=START, seed=42)
+    second = baseline.forecast([1, 2, 3], 48, start=START, seed=42)
+
+    for route_id in first:
+        np.testing.assert_array_equal(first[route_id], second[route_id])
+    assert not np.array_equal(first[1], baseline.forecast([1], 48, start=START, seed=43)[1])
+
+
+def test_learned_profiles_per_route_with_default_row():
+    baseline = DemandBaseline()
+    rollup = pd.DataFrame({
+        'route_id': [5, 5, 9],
+        'day_of_week': [0, 0, 0],
+        'hour': [7, 8, 7],
+        'avg_demand': [400.0, 300.0, 100.0],
+    })
+    assert baseline.load_profiles(rollup)
+
+    frame = pd.DataFrame({'route_id': [5, 5, 9, 9, 77], 'day_of_week': [0] * 5, 'hour': [7, 8, 7, 8, 7]})
+    levels = baseline.predict(frame)
+
+    # Route 9 has no 08:00 cell and route 77 is unknown: both use the all-routes average
+    np.testing.assert_allclose(levels, [400.0, 300.0, 100.0, 300.0, 250.0])
+    assert baseline.version != 'baseline-static'
+    assert not baseline.load_profiles(pd.DataFrame())
+
+
+def test_hourly_profile_averages_passengers(monkeypatch, transaction_records_sql):
+    from app.db import clickhouse as clickhouse_module
+    from app.services.demand_service import demand_service
+
+    queries = []
+
+    def fake_execute(query, params=None, **kwargs):
+        queries.append(query)
+        return ([5], [0], [7], [42.5])
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "connect", lambda: None)
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", fake_execute)
+
+    rollup = demand_service.get_hourly_profile()
+
+    transaction_records_sql(queries[0])
+    assert "sum(passenger_count) / uniqExact(toDate(timestamp))" in queries[0]
+    assert rollup.to_dict("records") == [{'route_id': 5, 'day_of_week': 0, 'hour': 7, 'avg_demand': 42.5}]
@@ -0,0 +1,72 @@
+import pickle
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+
+from app.ml.demand_models import DemandModel, DemandModelRegistry, SklearnDemandModel, build_forecast_frame
+
+FEATURES = ['route_id', 'hour', 'day_of_week', 'is_weekend', 'month', 'is_peak_hour']
+
+
+def _train_artifact(path, features=FEATURES):
+    rng = np.random.RandomState(0)
+    X = np.column_stack([
+        rng.randint(1, 6, 300), rng.randint(0, 24, 300), rng.randint(0, 7, 300), rng.randint(0, 2, 300),
+        rng.randint(1, 13, 300), rng.randint(0, 2, 300)
+    ])
+    y = 50 + 10 * X[:, 5] + X[:, 1] + 20 * X[:, 0]
+    X = X[:, [FEATURES.index(feature) for feature in features]]
+    model = GradientBoostingRegressor(n_estimators=20, random_state=0).fit(X, y)
+    with open(path, 'wb') as f:
+        pickle.dump({'model': model, 'features': features, 'metrics': {'accuracy': 90.0},
+                     'trained_at': '2025-01-01T00:00:00'}, f)
+    return model
+
+
+def test_forecast_frame_is_route_major():
+    frame = build_forecast_frame([3, 7], 30, start=datetime(2025, 1, 3, 22, 15))
+
+    assert len(frame) == 60
+    assert frame['route_id'].tolist() == [3] * 30 + [7] * 30
+    assert frame['hour'].iloc[:3].tolist() == [23, 0, 1]
+    assert frame['is_weekend'].iloc[1] == 1  # Saturday 00:00
+    assert frame['is_peak_hour'].iloc[frame['hour'].tolist().index(8)] == 1
+
+
+def test_sklearn_model_forecasts_all_routes_in_one_call(tmp_path):
+    path = tmp_path / 'demand_production.pkl'
+    trained = _train_artifact(path)
+    model = SklearnDemandModel.from_file(str(path))
+    start = datetime(2025, 1, 3, 12)
+
+    forecast = model.forecast([1, 2, 5], 24, start=start)
+
+    expected = trained.predict(build_forecast_frame([5], 24, start=start)[FEATURES].to_numpy())
+    assert set(forecast) == {1, 2, 5}
+    np.testing.assert_allclose(forecast[5], expected, rtol=1e-6)
+    assert forecast[5].mean() > forecast[1].mean() + 40  # routes get their own forecasts
+    assert model.confidence == 0.9
+
+
+def test_route_agnostic_artifact_falls_back_to_baseline(tmp_path):
+    path = tmp_path / 'demand_production.pkl'
+    _train_artifact(path, features=FEATURES[1:])
+    registry = DemandModelRegistry()
+    registry.register('gbm', lambda: SklearnDemandModel.from_file(str(path)))
+
+    assert registry.get('gbm') is None
+    with pytest.raises(TypeError):
+        DemandModel()
+
+
+def test_registry_falls_back_when_model_missing(tmp_path):
+    registry = DemandModelRegistry()
+    registry.register('gbm', lambda: SklearnDemandModel.from_file(str(tmp_path / 'missing.pkl')))
+
+    assert registry.get('gbm') is None
+
+    _train_artifact(tmp_path / 'missing.pkl')
+    assert registry.get('gbm') is None  # not retried until an explicit reload
+    assert registry.load('gbm') is registry.get('gbm')
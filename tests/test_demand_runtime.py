@@ -0,0 +1,109 @@
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.demand_runtime import DemandInferenceRuntime
+from app.ml.lstm_model import LSTMDemandPredictor
+
+
+def test_importing_demand_modules_does_not_import_tensorflow():
+    code = (
+        "import sys; import app.ml.lstm_model, app.ml.demand_runtime; "
+        "sys.exit('tensorflow' in sys.modules)"
+    )
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_exported_model_matches_keras_rollout(tmp_path):
+    pytest.importorskip("tensorflow")
+    predictor = LSTMDemandPredictor()
+    predictor.model_path = str(tmp_path / "lstm.h5")
+    data = predictor.generate_synthetic_data(num_samples=60)
+    predictor.prepare_data(data)
+    predictor.model = predictor.build_model((predictor.sequence_length, len(predictor.FEATURES)))
+
+    path = predictor.export_for_serving(str(tmp_path / "lstm.tflite"))
+    runtime = DemandInferenceRuntime(path)
+    assert runtime.load()
+
+    recent = pd.concat([data.assign(route_id=1), data.assign(route_id=2).iloc[5:]])
+    route_ids, expected_batch = predictor.prepare_inference_batch(recent)
+    runtime_ids, batch = runtime.prepare_batch(recent)
+    np.testing.assert_array_equal(runtime_ids, route_ids)
+    np.testing.assert_allclose(batch, expected_batch, atol=1e-6)
+
+    expected = predictor.predict_batch(expected_batch, hours_ahead=6)
+    np.testing.assert_allclose(runtime.predict_batch(batch, hours_ahead=6), expected, atol=1e-4)
+
+
+def test_runtime_without_export_is_not_loaded(tmp_path):
+    runtime = DemandInferenceRuntime(str(tmp_path / "missing.tflite"))
+    assert not runtime.load()
+    assert not runtime.is_loaded
+
+
+def test_rollout_builds_demand_features_like_training():
+    predictor = LSTMDemandPredictor()
+    data = predictor.generate_synthetic_data(num_samples=60)
+    predictor.prepare_data(data)
+    scaled = predictor.scaler.transform(data[predictor.FEATURES].to_numpy()).astype(np.float32)
+    demand = data["demand"].to_numpy(dtype=np.float32)
+    L = predictor.sequence_length
+
+    runtime = DemandInferenceRuntime()
+    runtime.manifest = {
+        "features": predictor.FEATURES, "sequence_length": L, "rolling_window": predictor.ROLLING_WINDOW,
+        "scaler_min": predictor.scaler.min_.astype(np.float32),
+        "scaler_scale": predictor.scaler.scale_.astype(np.float32),
+    }
+    windows = []
+
+    def fake_run(window):
+        # A perfect model: the true demand of the hour after the window
+        windows.append(window.copy())
+        return demand[[L + len(windows) - 1]]
+
+    runtime._run = fake_run
+    predictions = runtime.predict_batch(scaled[None, :L], hours_ahead=3)
+
+    np.testing.assert_allclose(predictions[0], demand[L:L + 3])
+    demand_cols = [predictor.FEATURES.index("previous_demand"), predictor.FEATURES.index("rolling_mean")]
+    for step, window in enumerate(windows[1:], start=1):
+        np.testing.assert_allclose(window[0, :, demand_cols], scaled[step:step + L, demand_cols].T, atol=1e-4)
+
+
+def test_unfitted_scaler_is_not_fitted_on_inference_data():
+    predictor = LSTMDemandPredictor()
+    data = predictor.generate_synthetic_data(num_samples=30)
+
+    with pytest.raises(RuntimeError):
+        predictor.prepare_inference_batch(data, group_col=None)
+    assert not hasattr(predictor.scaler, "scale_")
+
+
+def test_predict_is_served_by_the_loaded_runtime(monkeypatch):
+    from app.ml import demand_runtime as runtime_module
+
+    runtime = runtime_module.demand_runtime
+    calls = []
+    monkeypatch.setattr(runtime, "manifest", {"format": "tflite"})
+    monkeypatch.setattr(runtime, "prepare_batch", lambda data, group_col: (np.array([None]), np.zeros((1, 24, 10))))
+
+    def fake_predict_batch(sequences, hours_ahead):
+        calls.append(hours_ahead)
+        return np.full((1, hours_ahead), 42.0, dtype=np.float32)
+
+    monkeypatch.setattr(runtime, "predict_batch", fake_predict_batch)
+    predictor = LSTMDemandPredictor()
+    data = predictor.generate_synthetic_data(num_samples=30)
+
+    assert predictor.predict(data, hours_ahead=6) == [42.0] * 6
+    assert calls == [6]
+
+    # Without a runtime (and no Keras model) the rule-based baseline answers
+    monkeypatch.setattr(runtime, "manifest", None)
+    assert len(predictor.predict(data, hours_ahead=6)) == 6
+    assert calls == [6]
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+from app.ml.feature_matrix import to_feature_matrix, scale_in_place, sliding_windows
+from app.ml.lstm_model import LSTMDemandPredictor
+
+
+def test_feature_matrix_is_compact_and_fills_missing(tmp_path):
+    frame = pd.DataFrame({"a": [1.0, None, 3.0], "b": [4, 5, 6], "c": ["x", "y", "z"]})
+
+    matrix = to_feature_matrix(frame, ["a", "b"])
+    backed = to_feature_matrix(frame, ["a", "b"], memmap_path=str(tmp_path / "features.npy"))
+
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    assert matrix.tolist() == [[1, 4], [0, 5], [3, 6]]
+    assert isinstance(backed, np.memmap)
+    assert np.array_equal(np.load(tmp_path / "features.npy"), matrix)
+
+
+def test_scale_in_place_reuses_buffer():
+    matrix = np.arange(12, dtype=np.float32).reshape(6, 2)
+    scaler = MinMaxScaler()
+    scaled = scale_in_place(matrix, scaler)
+    assert scaled is matrix
+    assert matrix.min() == 0 and matrix.max() == 1
+
+    # The scaler itself keeps copying for everyone else
+    assert scaler.get_params()["copy"] is True
+    other = np.arange(12, dtype=np.float32).reshape(6, 2)
+    scaler.transform(other)
+    assert other.max() == 11
+
+
+def test_lstm_windows_match_loop_construction():
+    predictor = LSTMDemandPredictor()
+    data = predictor.generate_synthetic_data(num_samples=60)
+
+    X, y = predictor.prepare_data(data)
+
+    scaled = MinMaxScaler().fit_transform(data[predictor.FEATURES].to_numpy())
+    L = predictor.sequence_length
+    expected_X = np.array([scaled[i:i + L] for i in range(len(scaled) - L)])
+    expected_y = data["demand"].to_numpy()[L:]
+    assert X.shape == expected_X.shape
+    assert np.allclose(X, expected_X, atol=1e-5)
+    assert np.allclose(y, expected_y, atol=1e-3)
+    assert not X.flags["OWNDATA"]
+    assert len(sliding_windows(np.zeros((3, 2)), 5)) == 0
+
+
+def test_grouped_windows_never_cross_routes():
+    predictor = LSTMDemandPredictor()
+    route_a = predictor.generate_synthetic_data(num_samples=40).assign(route_id=1)
+    route_b = predictor.generate_synthetic_data(num_samples=30).assign(route_id=2)
+    data = pd.concat([route_b, route_a], ignore_index=True)  # unsorted on purpose
+
+    X, y = predictor.prepare_data(data)
+    windows, targets, starts = predictor.build_windows(data)
+
+    L = predictor.sequence_length
+    assert len(X) == (40 - L) + (30 - L)
+    assert np.array_equal(y, targets)
+    batches = list(predictor.iter_batches(windows, targets, starts, batch_size=7))
+    assert np.allclose(np.concatenate([b[0] for b in batches]), X)
+    assert np.allclose(np.concatenate([b[1] for b in batches]), y)
+
+
+def test_inference_batch_stacks_last_window_per_route():
+    predictor = LSTMDemandPredictor()
+    data = pd.concat([
+        predictor.generate_synthetic_data(num_samples=30).assign(route_id=2),
+        predictor.generate_synthetic_data(num_samples=40).assign(route_id=1),
+        predictor.generate_synthetic_data(num_samples=10).assign(route_id=3),  # too short
+    ], ignore_index=True)
+    predictor.prepare_data(data)
+
+    route_ids, sequences = predictor.prepare_inference_batch(data)
+
+    assert route_ids.tolist() == [1, 2]
+    assert sequences.shape == (2, predictor.sequence_length, len(predictor.FEATURES))
+    last_route_1 = data[data.route_id == 1].tail(predictor.sequence_length)
+    expected = predictor.scaler.transform(last_route_1[predictor.FEATURES].to_numpy())
+    assert np.allclose(sequences[0], expected, atol=1e-5)
+
+
+def test_streaming_windows_are_built_chunkwise_on_disk(tmp_path):
+    predictor = LSTMDemandPredictor()
+    data = pd.concat([
+        predictor.generate_synthetic_data(num_samples=40).assign(route_id=1),
+        predictor.generate_synthetic_data(num_samples=30).assign(route_id=2),
+    ], ignore_index=True)
+    expected_X, expected_y = predictor.prepare_data(data)
+
+    chunks = (data.iloc[i:i + 16] for i in range(0, len(data), 16))
+    path = tmp_path / "windows.f32"
+    windows, targets, starts = predictor.build_windows_streaming(chunks, memmap_path=str(path))
+
+    assert path.stat().st_size == len(data) * len(predictor.FEATURES) * 4
+    assert np.allclose(windows[starts], expected_X, atol=1e-5)
+    assert np.allclose(targets, expected_y)
+
+    shuffled = (frame for frame in [data.iloc[:20], data.iloc[50:], data.iloc[20:50]])
+    with pytest.raises(ValueError):
+        predictor.build_windows_streaming(shuffled, memmap_path=str(path))
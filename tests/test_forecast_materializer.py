@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from app.db import clickhouse as clickhouse_module
+from app.db import redis_cache as redis_module
+from app.services.forecast_materializer import forecast_materializer
+
+
+def test_run_materializes_all_routes_and_serves_lookups(monkeypatch):
+    inserts, cache = [], {}
+    watermark = datetime(2025, 1, 6, 9, 55)
+
+    def fake_execute(query, params=None, **kwargs):
+        if query.lstrip().startswith("INSERT"):
+            inserts.append((params, kwargs))
+        elif "max(timestamp)" in query:
+            return [(watermark,)]
+        return []
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", fake_execute)
+    monkeypatch.setattr(redis_module.redis_conn, "get", lambda key: cache.get(key))
+    monkeypatch.setattr(redis_module.redis_conn, "set", lambda key, value, ttl=None: cache.__setitem__(key, value))
+
+    summary = forecast_materializer.run(hours_ahead=6, route_ids=[3, 4])
+
+    columns, kwargs = inserts[0]
+    assert kwargs.get("columnar") is True
+    assert columns[0] == [3] * 6 + [4] * 6
+    assert columns[2] == list(range(1, 7)) * 2
+    assert summary["data_watermark"] == watermark.isoformat()
+
+    latest = forecast_materializer.get_latest(3)
+    assert latest["model_version"] == summary["model_version"]
+    assert [point["demand"] for point in latest["forecast"]] == columns[3][:6]
+
+    # Past target hours are skipped and the remainder renumbered
+    first_target = datetime.fromisoformat(latest["forecast"][0]["target_hour"])
+    upcoming = forecast_materializer.get_forecast(3, 4, now=first_target)
+    assert [point["hour"] for point in upcoming["forecast"]] == [1, 2, 3, 4]
+    assert upcoming["forecast"][0]["target_hour"] == latest["forecast"][1]["target_hour"]
+    assert forecast_materializer.get_forecast(3, 6, now=first_target) is None
+
+
+def test_history_metrics_skip_hours_without_actuals(monkeypatch):
+    hours = [datetime(2025, 1, 6, h) for h in range(7, 10)]
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute",
+                        lambda query, params=None, **kwargs: (hours, [10.0, 20.0, 30.0], [12.0, None, 27.0]))
+
+    history = forecast_materializer.get_history(3)
+
+    assert history["observed_hours"] == 2
+    assert history["history"][1]["actual_demand"] is None
+    assert history["mae"] == 2.5  # (2 + 3) / 2; the unobserved hour is not an error of 20
+    assert round(history["mape"], 2) == round((2 / 12 + 3 / 27) / 2 * 100, 2)
+
+
+def test_computed_forecast_matches_materialized_schema(monkeypatch):
+    cache = {}
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", lambda query, params=None, **kwargs: [])
+    monkeypatch.setattr(redis_module.redis_conn, "get", lambda key: cache.get(key))
+    monkeypatch.setattr(redis_module.redis_conn, "set", lambda key, value, ttl=None: cache.__setitem__(key, value))
+
+    forecast_materializer.run(hours_ahead=6, route_ids=[3])
+    materialized = forecast_materializer.get_latest(3)
+    computed = forecast_materializer.compute_forecast(3, 6)
+
+    assert computed.keys() == materialized.keys()
+    assert [point.keys() for point in computed["forecast"]] == [point.keys() for point in materialized["forecast"]]
+
+
+def test_actuals_and_active_routes_read_transaction_records_columns(monkeypatch, transaction_records_sql):
+    queries = []
+
+    def fake_execute(query, params=None, **kwargs):
+        queries.append(query)
+        return ([], [], []) if kwargs.get("columnar") else [(3,), (7,)]
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", fake_execute)
+
+    forecast_materializer.get_history(3)
+    assert forecast_materializer.get_active_routes() == [3, 7]
+
+    history_query, routes_query = queries
+    transaction_records_sql(history_query, other_names=("demand_forecasts", "predicted_demand",
+                                                        "generated_at", "target_hour", "horizon"))
+    assert "sum(passenger_count) as actual_demand" in history_query
+    transaction_records_sql(routes_query)
@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+
+from app.core.security import create_access_token
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def get_auth_header():
+    token = create_access_token({"sub": "test@example.com"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_kpis_revalidate_with_etag_and_last_modified(monkeypatch):
+    from app.db import clickhouse as clickhouse_module
+    from app.db import redis_cache as redis_module
+    from app.services.kpi_service import kpi_engine
+
+    row = (10, 5, 20.0, 10.0, 2, 0.1, 1, 1, ([8], [10]), ([1], [10]), ([1], [5]))
+    realtime_row = (3, 7.5, 1)
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute",
+                        lambda query, params=None, **kw: [row] if "sumMapIf" in query else [realtime_row])
+    monkeypatch.setattr(redis_module.redis_conn, "get", lambda key: None)
+    monkeypatch.setattr(redis_module.redis_conn, "set", lambda key, value, ttl=None: None)
+    monkeypatch.setattr(kpi_engine, "_sentiment_avg", lambda start, end: 0.5)
+    monkeypatch.setattr(kpi_engine, "_local", {})
+
+    first = client.get("/api/v1/reports/kpis", headers=get_auth_header())
+    assert first.status_code == 200 and first.json()["total_passengers"] == 10
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+    assert etag.startswith('W/"') and last_modified.endswith("GMT")
+
+    again = client.get("/api/v1/reports/kpis", headers={**get_auth_header(), "If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+
+    since = client.get("/api/v1/reports/kpis",
+                       headers={**get_auth_header(), "If-Modified-Since": last_modified})
+    assert since.status_code == 304
+
+    weekly = client.get("/api/v1/reports/kpis?period=weekly",
+                        headers={**get_auth_header(), "If-None-Match": etag})
+    assert weekly.status_code == 200
+
+    dashboard = client.get("/api/v1/reports/dashboard", headers=get_auth_header())
+    assert dashboard.status_code == 200 and dashboard.json()["partial"] is False
+    assert dashboard.headers["etag"] != etag
+    assert client.get("/api/v1/reports/dashboard", headers={
+        **get_auth_header(), "If-None-Match": dashboard.headers["etag"]
+    }).status_code == 304
+
+
+def test_degraded_reports_carry_no_validators(monkeypatch):
+    from app.db import clickhouse as clickhouse_module
+    from app.db import redis_cache as redis_module
+    from app.services.kpi_service import kpi_engine
+
+    def clickhouse_down(query, params=None, **kwargs):
+        raise ConnectionError("clickhouse down")
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", clickhouse_down)
+    monkeypatch.setattr(redis_module.redis_conn, "get", lambda key: None)
+    monkeypatch.setattr(redis_module.redis_conn, "set", lambda key, value, ttl=None: None)
+    monkeypatch.setattr(kpi_engine, "_sentiment_avg", lambda start, end: 0.5)
+    monkeypatch.setattr(kpi_engine, "_local", {})
+
+    for path in ("/api/v1/reports/kpis", "/api/v1/reports/dashboard"):
+        resp = client.get(path, headers={**get_auth_header(), "If-None-Match": "*"})
+        assert resp.status_code == 200 and resp.json()["partial"] is True
+        assert resp.json()["data_available"] is False
+        assert "etag" not in resp.headers and "last-modified" not in resp.headers
+        assert resp.headers["cache-control"] == "no-store"
+
+
+def test_demand_trends_etag_follows_the_cache_entry(monkeypatch):
+    from app.db import redis_cache as redis_module
+
+    cached = {
+        "hourly_trends": [{"hour": 8, "avg_demand": 120.0}],
+        "daily_trends": [{"date": "2025-01-06", "avg_demand": 95.5}],
+        "data_watermark": "2025-01-06T23:00:00",
+        "generated_at": "2025-01-07T00:05:00"
+    }
+    monkeypatch.setattr(redis_module.redis_conn, "get", lambda key: dict(cached))
+
+    first = client.get("/api/v1/analytics/demand/trends", headers=get_auth_header())
+    assert first.status_code == 200 and first.json() == cached
+
+    revalidated = client.get("/api/v1/analytics/demand/trends",
+                             headers={**get_auth_header(), "If-None-Match": f'"x", {first.headers["etag"]}'})
+    assert revalidated.status_code == 304
+
+    cached["generated_at"] = "2025-01-07T01:05:00"
+    refreshed = client.get("/api/v1/analytics/demand/trends",
+                           headers={**get_auth_header(), "If-None-Match": first.headers["etag"]})
+    assert refreshed.status_code == 200 and refreshed.headers["etag"] != first.headers["etag"]
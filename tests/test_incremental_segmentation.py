@@ -0,0 +1,142 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.incremental_segmentation import IncrementalSegmentation
+
+
+def test_drift_not_exceeded_for_matching_distribution():
+    baseline = np.array([0] * 60 + [1] * 30 + [-1] * 10)
+    drift = IncrementalSegmentation.compute_drift(baseline, {"0": 58, "1": 32, "-1": 10})
+    assert not drift["exceeded"]
+    assert drift["cluster_shift"] < 0.05
+
+
+def test_drift_exceeded_when_new_users_fall_outside_clusters():
+    baseline = np.array([0] * 60 + [1] * 30 + [-1] * 10)
+    drift = IncrementalSegmentation.compute_drift(baseline, {"0": 20, "1": 10, "-1": 70})
+    assert drift["exceeded"]
+    assert drift["noise_rate"] == 0.7
+
+
+def test_drift_ignores_small_samples():
+    baseline = np.array([0] * 90 + [-1] * 10)
+    drift = IncrementalSegmentation.compute_drift(baseline, {"-1": 5})
+    assert not drift["exceeded"]
+
+
+@pytest.fixture
+def incremental(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.db import clickhouse as clickhouse_module
+    from app.ml.dbscan_model import DBSCANUserSegmentation
+    from app.ml.model_registry import ModelRegistry
+    from app.services.segmentation_store import SegmentationStore
+    from app.services.user_feature_service import user_feature_service
+
+    generator = DBSCANUserSegmentation()
+    feature_store = {
+        "users": generator.generate_synthetic_users(num_users=300, random_state=7)
+        .assign(last_seen=datetime(2025, 1, 5)),
+        "deltas": [],
+        "since": [],
+    }
+
+    def fake_load_features(min_transactions=3, **kwargs):
+        if "updated_since" not in kwargs:
+            return feature_store["users"]  # full snapshot (refresh_snapshot)
+        feature_store["since"].append(kwargs["updated_since"])
+        return feature_store["deltas"].pop(0) if feature_store["deltas"] else None
+
+    writes = []
+    monkeypatch.setattr(settings, "SEGMENTATION_USE_FEATURE_STORE", True)
+    monkeypatch.setattr(settings, "SEGMENTATION_EPS", 1.0)  # ~10% outliers on these users
+    monkeypatch.setattr(user_feature_service, "load_features", fake_load_features)
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute",
+                        lambda query, params=None, **kwargs: writes.append(params) if params else None)
+
+    store = SegmentationStore(store_path=str(tmp_path / "segmentation"))
+    registry = ModelRegistry(root=str(tmp_path / "registry"))
+    service = IncrementalSegmentation(state_path=str(tmp_path / "state.json"), store=store, registry=registry)
+    service.feature_store, service.writes = feature_store, writes
+    return service
+
+
+def _delta(users, last_seen):
+    return users.assign(last_seen=last_seen).reset_index(drop=True)
+
+
+def test_run_assigns_delta_and_saves_state_on_empty_delta(incremental):
+    result = incremental.store.get_or_fit()
+    core = result["model"].core_sample_indices[:10]
+    incremental.feature_store["deltas"].append(
+        _delta(incremental.store.get_snapshot()["users"].iloc[core], datetime(2025, 1, 6, 8))
+    )
+
+    summary = incremental.run()
+    assert summary["status"] == "assigned" and summary["assigned"] == 10 and not summary["refit"]
+    assert [row[1] for row in incremental.writes[0]] == result["labels"][core].tolist()
+    state = incremental.load_state()
+    assert state["watermark"] == "2025-01-06T08:00:00" and state["version"] == result["version"]
+
+    first_run_at = state["last_run_at"]
+    summary = incremental.run()
+    assert summary["status"] == "unchanged"
+    assert incremental.feature_store["since"][-1] == datetime(2025, 1, 6, 8)
+    state = incremental.load_state()
+    assert state["watermark"] == "2025-01-06T08:00:00" and state["last_run_at"] > first_run_at
+    assert sum(state["counts"].values()) == 10
+
+
+def test_empty_first_run_still_records_state(incremental):
+    assert incremental.run()["status"] == "unchanged"
+    assert incremental.load_state()["version"] == incremental.store.get_or_fit()["version"]
+
+
+def test_run_refuses_synthetic_segmentation(incremental, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "SEGMENTATION_USE_FEATURE_STORE", False)
+    incremental.feature_store["deltas"].append(
+        _delta(incremental.feature_store["users"].iloc[:10], datetime(2025, 1, 6, 8))
+    )
+
+    with pytest.raises(RuntimeError, match="synthetic"):
+        incremental.run(force_refit=True)
+    # Nothing assigned, tracked or published
+    assert incremental.writes == [] and incremental.feature_store["since"] == []
+    assert incremental.load_state()["version"] is None
+    assert incremental.registry.get_active("user_segmentation") is None
+
+
+def test_refit_is_published_and_installed_by_api_workers(incremental, tmp_path):
+    from app.ml.dbscan_model import DBSCANUserSegmentation
+    from app.ml.model_registry import ModelRegistry
+    from app.services.segmentation_store import SegmentationStore
+
+    before = incremental.store.get_or_fit()
+    # Riders nobody resembles: every one is an outlier, drift forces a refit
+    outliers = _delta(incremental.store.get_snapshot()["users"].iloc[:60], datetime(2025, 1, 6, 8))
+    for name in DBSCANUserSegmentation.FEATURES:
+        outliers[name] = 1e6
+    incremental.feature_store["deltas"].append(outliers)
+    incremental.feature_store["users"] = DBSCANUserSegmentation().generate_synthetic_users(
+        num_users=300, random_state=11).assign(last_seen=datetime(2025, 1, 6, 8))
+
+    summary = incremental.run()
+    assert summary["status"] == "refitted" and summary["version"] != before["version"]
+    assert incremental.registry.get_active("user_segmentation")["metadata"]["version"] == summary["version"]
+
+    # An API worker (own store, same registry volume) serves the refit without fitting
+    api_store = SegmentationStore(store_path=str(tmp_path / "api"))
+    api_store._fit = lambda *args, **kwargs: pytest.fail("API worker refitted")
+    api_registry = ModelRegistry(root=incremental.registry.root)
+    api_registry.register_loader("user_segmentation", api_store.install_published)
+    assert api_registry.poll() == {"user_segmentation": api_registry.get_active_version("user_segmentation")}
+
+    served = api_store.get_or_fit()
+    assert served["version"] == summary["version"]
+    assert api_store.get_snapshot()["source"] == "feature_store"
+    assert len(api_store.get_snapshot()["users"]) == 300
+    assert api_store.get_user(served, int(api_store.get_snapshot()["users"]["user_id"].iloc[0])) is not None
@@ -0,0 +1,81 @@
+import pytest
+
+from app.ml.model_registry import ModelRegistry
+
+
+def _artifact(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_publish_activate_and_rollback(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path / "registry"))
+    loaded = []
+    registry.register_loader("demand", lambda manifest: loaded.append(manifest["version"]) or manifest["paths"]["model"])
+
+    first = registry.publish("demand", {"model": _artifact(tmp_path, "v1.bin", "one")}, metadata={"mae": 3.0})
+    assert registry.poll() == {"demand": first["version"]}
+    assert registry.poll() == {}
+
+    # A second version is swapped in only after it is loaded
+    second = registry.publish("demand", {"model": _artifact(tmp_path, "v2.bin", "two")})
+    assert registry.current_version("demand") == first["version"]
+    registry.poll()
+    assert registry.current_version("demand") == second["version"]
+    assert open(registry.current("demand")).read() == "two"
+
+    registry.activate("demand", first["version"])
+    registry.poll()
+    assert registry.current_version("demand") == first["version"]
+    assert loaded == [first["version"], second["version"], first["version"]]
+    assert [v["active"] for v in registry.list_versions("demand")] == [False, True]
+    assert registry.list_models() == ["demand"]
+
+
+def test_corrupted_version_is_not_served(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path / "registry"))
+    registry.register_loader("demand", lambda manifest: manifest["version"])
+    good = registry.publish("demand", {"model": _artifact(tmp_path, "v1.bin", "one")})
+    registry.poll()
+
+    bad = registry.publish("demand", {"model": _artifact(tmp_path, "v2.bin", "two")}, activate=False)
+    with open(bad["paths"]["model"], "w") as f:
+        f.write("tampered")
+
+    with pytest.raises(ValueError):
+        registry.activate("demand", bad["version"])
+    assert registry.poll() == {}
+    assert registry.current("demand") == good["version"]
+
+
+def test_failed_bert_reload_keeps_serving_the_old_pipeline(tmp_path, monkeypatch):
+    import sys
+    import types
+    from app.ml import bert_model
+    from app.ml.model_registry import register_serving_loaders
+
+    def fake_pipeline(task, model, device):
+        if "broken" in model:
+            raise OSError("config.json is missing")
+        return lambda text: [{"label": "5 stars", "score": 0.9, "model": model}]
+
+    monkeypatch.setattr(bert_model, "HAS_TRANSFORMERS", True)
+    monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(pipeline=fake_pipeline))
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(
+        cuda=types.SimpleNamespace(is_available=lambda: False),
+        set_num_threads=lambda n: None, set_num_interop_threads=lambda n: None))
+    monkeypatch.setattr(bert_model.bert_analyzer, "pipeline", None)
+
+    registry = ModelRegistry(root=str(tmp_path / "registry"))
+    register_serving_loaders(registry)
+    good = registry.publish("bert_sentiment", {"model": _artifact(tmp_path, "good.bin", "ok")})
+    registry.poll()
+    served = bert_model.bert_analyzer.pipeline
+    assert served is not None and registry.current_version("bert_sentiment") == good["version"]
+
+    registry.publish("bert_sentiment", {"model": _artifact(tmp_path, "broken.bin", "??")})
+    assert registry.poll() == {}
+    assert bert_model.bert_analyzer.pipeline is served
+    assert registry.current_version("bert_sentiment") == good["version"]
+    assert bert_model.bert_analyzer.analyze("great service")["sentiment"] == "POSITIVE"
@@ -0,0 +1,85 @@
+import gzip
+import io
+from datetime import date, datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.services.report_export import iter_export, validate_export, write_export
+
+
+COLUMNS = [("date", "date"), ("route_id", "int"), ("route_name", "string"), ("revenue", "float")]
+
+
+def _batches(count, size=100):
+    for b in range(count):
+        yield [(date(2025, 1, 1 + b % 28), i, f"Ruta {i}", i * 1.5) for i in range(size)]
+
+
+def test_csv_export_streams_each_block_with_gzip():
+    chunks = list(iter_export(_batches(3), COLUMNS, "csv", compression="gzip"))
+    assert len(chunks) >= 2
+
+    lines = gzip.decompress(b"".join(chunks)).decode("utf-8").splitlines()
+    assert lines[0] == "date,route_id,route_name,revenue"
+    assert lines[1] == "2025-01-01,0,Ruta 0,0.0"
+    assert len(lines) == 301
+
+
+def test_parquet_and_arrow_exports_keep_one_batch_per_block():
+    buffer = io.BytesIO()
+    rows = write_export(buffer, _batches(4), COLUMNS, "parquet", compression="zstd", header={"report_type": "x"})
+    parquet = pq.ParquetFile(io.BytesIO(buffer.getvalue()))
+    assert rows == 400 and parquet.metadata.num_rows == 400
+    assert parquet.metadata.num_row_groups == 4
+    assert parquet.schema_arrow.field("date").type == pa.date32()
+
+    stream = b"".join(iter_export(_batches(2), COLUMNS, "arrow", compression="lz4"))
+    table = pa.ipc.open_stream(stream).read_all()
+    assert table.num_rows == 200 and table.column("revenue")[3].as_py() == 4.5
+
+
+def test_export_validation():
+    with pytest.raises(ValueError):
+        validate_export("excel")
+    with pytest.raises(ValueError):
+        validate_export("csv", "zstd")
+
+
+def test_export_endpoint_streams_from_clickhouse(monkeypatch, transaction_records_sql):
+    from fastapi.testclient import TestClient
+    from app.core.security import create_access_token
+    from app.db import clickhouse as clickhouse_module
+    from app.main import app
+
+    calls = []
+
+    def fake_execute_iter(query, params=None, **kwargs):
+        # The mock accepts any SQL: check the streamed query against the real table
+        transaction_records_sql(query)
+        calls.append(params)
+        for i in range(5):
+            yield (datetime(2025, 1, 6, 8, i), i % 2 + 1, 4, 2512.5, 10050.0)
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute_iter", fake_execute_iter)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'test@example.com'})}"}
+
+    resp = client.get("/api/v1/reports/export", headers=headers, params={
+        "report_type": "transactions", "date_from": "2025-01-06T00:00:00",
+        "date_to": "2025-01-07T00:00:00", "route_ids": "1,2"
+    })
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert 'filename="transactions_20250106_20250107.csv"' in resp.headers["content-disposition"]
+    lines = resp.text.splitlines()
+    assert lines[0] == "timestamp,route_id,route_name,passengers,avg_fare,revenue"
+    assert lines[1] == "2025-01-06 08:00:00,1,Ruta 1,4,2512.5,10050.0"
+    assert calls[0]["route_ids"] == (1, 2)
+
+    bad = client.get("/api/v1/reports/export", headers=headers, params={
+        "report_type": "transactions", "date_from": "2025-01-06T00:00:00",
+        "date_to": "2025-01-07T00:00:00", "format": "csv", "compression": "lz4"
+    })
+    assert bad.status_code == 400
@@ -0,0 +1,126 @@
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from app.services.report_queue import LocalJobQueue
+from app.services.report_service import ReportService
+from app.services.report_storage import LocalReportStorage
+
+
+ROWS = [
+    (datetime(2025, 1, 6, 8, 0), 1, 120, 300.456),
+    (datetime(2025, 1, 6, 8, 0), 2, 0, 0.0),
+    (datetime(2025, 1, 6, 9, 0), 1, 80, 200.0),
+]
+
+
+def _wait(service, report_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = service.get(report_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"report {report_id} did not finish")
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.db import clickhouse as clickhouse_module
+
+    queries = []
+
+    def fake_execute_iter(query, params=None, **kwargs):
+        queries.append((query, params))
+        if params.get("route_ids") == (99,):
+            raise ConnectionError("clickhouse down")
+        return iter(ROWS)
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute_iter", fake_execute_iter)
+    monkeypatch.setattr(settings, "REPORT_BATCH_ROWS", 2)
+
+    service = ReportService(job_queue=LocalJobQueue(), storage=LocalReportStorage(str(tmp_path)))
+    service.queries = queries
+    service.start_workers(2)
+    yield service
+    service.stop_workers()
+
+
+def test_reports_are_generated_by_workers_in_batches(service):
+    job = service.submit("route_demand", datetime(2025, 1, 6), datetime(2025, 1, 7),
+                         filters={"route_ids": [1, 2]}, format="csv")
+    assert job["status"] == "queued"
+
+    done = _wait(service, job["report_id"])
+    assert done["status"] == "completed" and done["rows"] == 3
+    assert service.queries[0][1]["route_ids"] == (1, 2)
+
+    lines = b"".join(service.iter_report(done)).decode("utf-8").splitlines()
+    assert lines[0] == "hour,route_id,route_name,boardings,revenue"
+    assert lines[1] == "2025-01-06 08:00:00,1,Ruta 1,120,300.46"
+    assert len(lines) == 4
+
+    done = _wait(service, service.submit("route_demand", datetime(2025, 1, 6), datetime(2025, 1, 7))["report_id"])
+    report = json.loads(b"".join(service.iter_report(done)))
+    assert report["columns"] == ["hour", "route_id", "route_name", "boardings", "revenue"]
+    assert report["data"][2] == {"hour": "2025-01-06T09:00:00", "route_id": 1, "route_name": "Ruta 1",
+                                 "boardings": 80, "revenue": 200.0}
+
+
+def test_failed_reports_leave_no_file(service, tmp_path):
+    job = service.submit("transactions", datetime(2025, 1, 6), datetime(2025, 1, 7),
+                         filters={"route_ids": [99]}, format="csv")
+    done = _wait(service, job["report_id"])
+    assert done["status"] == "failed" and "clickhouse down" in done["error"]
+    assert not list(tmp_path.rglob("*.csv"))
+
+    with pytest.raises(ValueError):
+        service.submit("transactions", datetime(2025, 1, 6), datetime(2025, 1, 7), format="pdf")
+    with pytest.raises(ValueError):
+        service.submit("transactions", datetime(2025, 1, 7), datetime(2025, 1, 6))
+
+
+def test_report_endpoints(service, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.api.v1 import reports
+    from app.core.security import create_access_token
+    from app.main import app
+
+    monkeypatch.setattr(reports, "report_service", service)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'test@example.com'})}"}
+
+    resp = client.post("/api/v1/reports/generate", headers=headers, json={
+        "report_type": "daily_revenue", "date_from": "2025-01-01T00:00:00",
+        "date_to": "2025-01-08T00:00:00", "format": "csv"
+    })
+    assert resp.status_code == 202
+    report_id = resp.json()["report_id"]
+
+    _wait(service, report_id)
+    status = client.get(f"/api/v1/reports/status/{report_id}", headers=headers).json()
+    assert status["status"] == "completed" and status["download_url"]
+
+    download = client.get(status["download_url"], headers=headers)
+    assert download.status_code == 200
+    assert download.text.splitlines()[0] == "date,route_id,route_name,passengers,revenue,avg_fare"
+    assert download.text.splitlines()[2] == "2025-01-06 08:00:00,2,Ruta 2,0,0.0,0.0"
+
+    assert client.get("/api/v1/reports/status/missing", headers=headers).status_code == 404
+    bad = client.post("/api/v1/reports/generate", headers=headers, json={
+        "report_type": "daily_revenue", "date_from": "2025-01-01T00:00:00",
+        "date_to": "2025-01-08T00:00:00", "format": "excel"
+    })
+    assert bad.status_code == 400
+
+
+def test_report_queries_read_transaction_records_columns(transaction_records_sql):
+    from app.services.report_service import REPORT_TYPES
+
+    for definition in REPORT_TYPES.values():
+        query = definition['query'].format(route_filter=" AND route_id IN %(route_ids)s")
+        transaction_records_sql(query)
+        assert 'count()' not in query and 'passenger_count' in query
@@ -11,8 +11,136 @@ def get_auth_header():
     return {"Authorization": f"Bearer {token}"}
 
 
-def test_get_kpis():
+def test_get_kpis(monkeypatch):
+    from app.services.kpi_service import kpi_engine
+
+    monkeypatch.setattr(kpi_engine, "_sentiment_avg", lambda start, end: None)
     resp = client.get("/api/v1/reports/kpis", headers=get_auth_header())
     assert resp.status_code == 200
     data = resp.json()
     assert "total_passengers" in data
+
+
+def test_kpi_engine_uses_one_query_per_bucket(monkeypatch):
+    from datetime import datetime
+    from app.db import clickhouse as clickhouse_module
+    from app.db import redis_cache as redis_module
+    from app.services.kpi_service import KPIEngine
+
+    queries = []
+    row = (1200, 1000, 3000.0, 2500.0, 40, 0.45, 3, 4,
+           ([7, 8, 17], [300, 500, 400]),
+           ([1, 2, 3], [700, 300, 200]),
+           ([1, 2, 4], [400, 400, 200]))
+
+    def fake_execute(query, params=None, **kwargs):
+        if 'sumMapIf' not in query:
+            return [(25, 60.0, 2)]  # realtime fragment
+        queries.append((query, params))
+        return [row]
+
+    def no_redis(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", fake_execute)
+    monkeypatch.setattr(redis_module.redis_conn, "get", no_redis)
+    monkeypatch.setattr(redis_module.redis_conn, "set", no_redis)
+
+    engine = KPIEngine()
+    monkeypatch.setattr(engine, "_sentiment_avg", lambda start, end: 0.8)
+    kpis = engine.get_kpis('daily', now=datetime(2025, 1, 6, 10, 7))
+    dashboard = engine.get_dashboard('daily', now=datetime(2025, 1, 6, 10, 9))
+
+    # Both views in the same 5-minute bucket share one multi-aggregate query
+    assert len(queries) == 1
+    assert 'sumIf' in queries[0][0] and 'uniqExactIf' in queries[0][0]
+    assert queries[0][1]['end'] == datetime(2025, 1, 6, 10, 5)
+    assert kpis['total_passengers'] == 1200
+    assert kpis['peak_hour'] == 8
+    assert kpis['passenger_growth'] == 20.0
+    assert dashboard['trends']['satisfaction_score'] == 0.8
+    assert dashboard['routes']['peak_routes'][0] == {'route_id': 1, 'name': 'Ruta 1', 'passengers': 700}
+    assert [alert['route_id'] for alert in dashboard['alerts']] == [1, 4]
+    assert dashboard['realtime']['passengers_last_hour'] == 25
+
+    # Field names say what is computed: route-hours, revenue per boarding,
+    # occupancy over every hour of the window (empty hours included)
+    assert dashboard['metrics']['service_hours'] == 40 and 'total_trips' not in dashboard['metrics']
+    assert queries[0][1]['window_hours'] == 24
+    assert '* %(window_hours)s) AS avg_occupancy' in queries[0][0]
+    performance = engine.get_performance(1, now=datetime(2025, 1, 6, 10, 9))
+    assert performance['revenue_per_passenger'] == 2.5 and 'revenue_per_trip' not in performance
+
+    engine.get_kpis('daily', now=datetime(2025, 1, 6, 10, 11))
+    assert len(queries) == 2
+
+
+def test_kpi_engine_reports_unavailable_data_without_caching(monkeypatch):
+    from app.db import clickhouse as clickhouse_module
+    from app.services.kpi_service import KPIEngine
+
+    def failing_execute(query, params=None, **kwargs):
+        raise ConnectionError("clickhouse down")
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", failing_execute)
+    engine = KPIEngine()
+    monkeypatch.setattr(engine, "_sentiment_avg", lambda start, end: None)
+
+    kpis = engine.get_kpis('weekly')
+    assert kpis['data_available'] is False
+    assert kpis['total_passengers'] == 0 and kpis['peak_hour'] is None
+    assert engine.get_revenue(7)['daily_breakdown'] == []
+    assert not [key for key in engine._local if ':summary:' in key or ':revenue:' in key]
+
+
+def test_kpi_queries_read_transaction_records_columns(monkeypatch, transaction_records_sql):
+    from datetime import datetime
+    from app.db import clickhouse as clickhouse_module
+    from app.services.kpi_service import KPIEngine, EMPTY_SUMMARY_ROW
+
+    queries = []
+
+    def fake_execute(query, params=None, **kwargs):
+        queries.append(query)
+        if 'sumMapIf' in query:
+            return [EMPTY_SUMMARY_ROW]
+        return [(0, 0.0, 0)] if not kwargs.get('columnar') else ([], [], [])
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", fake_execute)
+    engine = KPIEngine()
+    monkeypatch.setattr(engine, "_sentiment_avg", lambda start, end: None)
+    now = datetime(2025, 1, 6, 10, 7)
+    engine.get_performance(7, route_id=3, now=now)
+    engine.get_revenue(7, now=now)
+    engine.fetch_realtime(now=now)
+
+    assert len(queries) == 3
+    for query in queries:
+        # One row per route and hour: passengers are summed, revenue is passengers x average fare
+        transaction_records_sql(query)
+        assert 'sum(passenger_count)' in query and 'count()' not in query
+    assert 'AND route_id = %(route_id)s' in queries[0]
+
+
+def test_performance_and_revenue_run_off_the_event_loop(monkeypatch):
+    import asyncio
+    from app.services.kpi_service import kpi_engine
+
+    calls = []
+
+    def off_loop(name):
+        def spy(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                calls.append((name, True))
+            except RuntimeError:
+                calls.append((name, False))
+            return {"data_available": False}
+        return spy
+
+    monkeypatch.setattr(kpi_engine, "get_performance", off_loop("performance"))
+    monkeypatch.setattr(kpi_engine, "get_revenue", off_loop("revenue"))
+
+    assert client.get("/api/v1/reports/performance?route_id=3", headers=get_auth_header()).json()["route_id"] == 3
+    assert client.get("/api/v1/reports/revenue", headers=get_auth_header()).status_code == 200
+    assert calls == [("performance", False), ("revenue", False)]
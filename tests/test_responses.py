@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, choose_encoding
+from app.core.responses import AppJSONResponse, AppRoute
+
+
+def _app():
+    router = APIRouter(prefix="/t", route_class=AppRoute)
+
+    @router.get("/numpy")
+    def numpy_payload():
+        return {"hour": np.int64(8), "demand": np.float32(1.5), "series": np.arange(3),
+                "missing": float("nan"), "at": datetime(2025, 1, 6, 8, 0)}
+
+    @router.post("/created", status_code=201)
+    async def created():
+        return {"count": np.int32(2)}
+
+    @router.get("/large")
+    def large():
+        return {"rows": [{"route_id": i, "demand": 12.5} for i in range(200)]}
+
+    @router.get("/parquet")
+    def parquet():
+        return Response(b"PAR1" * 1000, media_type="application/vnd.apache.parquet")
+
+    @router.get("/stream")
+    def stream():
+        return StreamingResponse((b"hour,demand\n" * 200 for _ in range(3)), media_type="text/csv")
+
+    app = FastAPI(default_response_class=AppJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=1000)
+    app.include_router(router)
+    return app
+
+
+client = TestClient(_app())
+
+
+def test_numpy_and_datetimes_render_without_casts():
+    resp = client.get("/t/numpy", headers={"Accept-Encoding": "identity"})
+    assert resp.status_code == 200
+    assert resp.json() == {"hour": 8, "demand": 1.5, "series": [0, 1, 2],
+                           "missing": None, "at": "2025-01-06T08:00:00"}
+
+    created = client.post("/t/created")
+    assert created.status_code == 201 and created.json() == {"count": 2}
+
+
+def test_gzip_above_threshold_only():
+    small = client.get("/t/numpy", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    large = client.get("/t/large", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in large.headers["vary"]
+    assert len(large.json()["rows"]) == 200
+    assert int(large.headers["content-length"]) < len(large.content)  # content is decoded
+
+    streamed = client.get("/t/stream", headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.text.count("hour,demand") == 600
+
+    parquet = client.get("/t/parquet", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in parquet.headers and parquet.content.startswith(b"PAR1")
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br", brotli=True) == "br"
+    assert choose_encoding("gzip, deflate, br", brotli=False) == "gzip"
+    assert choose_encoding("br;q=0, gzip", brotli=True) == "gzip"
+    assert choose_encoding("identity", brotli=True) is None
+
+
+def test_brotli_when_installed():
+    pytest.importorskip("brotli")
+    from app.core import compression
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=10)
+
+    @app.get("/big")
+    def big():
+        return {"data": "x" * 2000}
+
+    compression_client = TestClient(app)
+    resp = compression_client.get("/big", headers={"Accept-Encoding": "br"})
+    assert compression.HAS_BROTLI and resp.headers["content-encoding"] == "br"
+    assert resp.json()["data"] == "x" * 2000
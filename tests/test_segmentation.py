@@ -1,6 +1,9 @@
+import numpy as np
 from fastapi.testclient import TestClient
 from app.main import app
 from app.core.security import create_access_token
+from app.ml.dbscan_model import DBSCANUserSegmentation
+from app.services.segmentation_store import segmentation_store
 
 
 client = TestClient(app)
@@ -17,3 +20,131 @@ def test_segment_users():
     assert resp.status_code == 200
     data = resp.json()
     assert "clusters" in data
+    # No ClickHouse here: the snapshot falls back to synthetic users and says so
+    assert data["data_source"] == "synthetic"
+
+
+def test_segmentation_response_requires_a_data_source():
+    import pytest
+    from datetime import datetime
+    from pydantic import ValidationError
+    from app.models.schemas import UserSegmentationResponse
+
+    with pytest.raises(ValidationError):
+        UserSegmentationResponse(clusters=[], outliers_count=0, total_users=0,
+                                 silhouette_score=None, generated_at=datetime.now())
+
+
+def test_segmentations_are_stored_per_parameters():
+    loose = client.post("/api/v1/analytics/users/segment", json={"eps": 0.8, "min_samples": 5}, headers=get_auth_header())
+    strict = client.post("/api/v1/analytics/users/segment", json={"eps": 0.3, "min_samples": 5}, headers=get_auth_header())
+    loose_again = client.post("/api/v1/analytics/users/segment", json={"eps": 0.8, "min_samples": 5}, headers=get_auth_header())
+    assert loose.status_code == strict.status_code == loose_again.status_code == 200
+    assert loose.json()["outliers_count"] == loose_again.json()["outliers_count"]
+    assert loose.json()["outliers_count"] <= strict.json()["outliers_count"]
+
+
+def test_user_profile():
+    resp = client.get("/api/v1/analytics/users/profile/1", headers=get_auth_header())
+    assert resp.status_code == 200
+    assert resp.json()["user_id"] == 1
+
+
+def test_assign_users_matches_fitted_labels():
+    result = segmentation_store.get_or_fit()
+    users = segmentation_store.get_snapshot()["users"]
+    core_position = int(result["model"].core_sample_indices[0])
+    core_user = users.iloc[core_position]
+    payload = {"users": [{name: float(core_user[name]) for name in DBSCANUserSegmentation.FEATURES}]}
+    payload["users"][0]["user_id"] = int(core_user["user_id"])
+
+    resp = client.post("/api/v1/analytics/users/assign", json=payload, headers=get_auth_header())
+    assert resp.status_code == 200
+    assignment = resp.json()["assignments"][0]
+    assert assignment["user_id"] == int(core_user["user_id"])
+    assert assignment["cluster_id"] == int(result["labels"][core_position])
+
+
+def test_sweep_parameters():
+    payload = {"eps_values": [0.5, 1.0], "min_samples_values": [5]}
+    resp = client.post("/api/v1/analytics/users/sweep", json=payload, headers=get_auth_header())
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["results"]) == 2
+    assert "k_distance" in data
+
+
+def test_sweep_runs_off_the_event_loop_in_the_configured_mode(monkeypatch):
+    import asyncio
+    from app.core.config import settings
+    from app.ml.dbscan_model import has_hdbscan
+
+    mode = "hdbscan" if has_hdbscan() else "scalable"
+    monkeypatch.setattr(settings, "SEGMENTATION_MODE", mode)
+    monkeypatch.setattr(settings, "SEGMENTATION_SWEEP_N_JOBS", 1)
+    calls = []
+    real_sweep = DBSCANUserSegmentation.sweep
+
+    def on_event_loop():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    def spy(self, users_data, eps_values, min_samples_values, n_jobs=-1, **kwargs):
+        calls.append((self.mode, n_jobs, on_event_loop()))
+        return real_sweep(self, users_data, eps_values, min_samples_values, n_jobs=n_jobs, **kwargs)
+
+    monkeypatch.setattr(DBSCANUserSegmentation, "sweep", spy)
+    payload = {"eps_values": [0.0, 0.5], "min_samples_values": [5]}
+    resp = client.post("/api/v1/analytics/users/sweep", json=payload, headers=get_auth_header())
+
+    assert resp.status_code == 200
+    assert resp.json()["mode"] == mode and len(resp.json()["results"]) == 2
+    assert calls == [(mode, 1, False)]
+
+
+def test_segmentation_endpoints_fit_off_the_event_loop(monkeypatch):
+    import asyncio
+
+    calls = []
+    real_get_or_fit = segmentation_store.get_or_fit
+
+    def spy(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            calls.append(True)
+        except RuntimeError:
+            calls.append(False)
+        return real_get_or_fit(*args, **kwargs)
+
+    monkeypatch.setattr(segmentation_store, "get_or_fit", spy)
+    user_id = int(segmentation_store.get_snapshot()["users"]["user_id"].iloc[0])
+    features = {"usage_frequency": 20, "avg_spending": 2500, "route_diversity": 2,
+                "peak_hour_usage_ratio": 0.7, "weekend_usage_ratio": 0.1, "total_transactions": 200}
+    headers = get_auth_header()
+
+    assert client.post("/api/v1/analytics/users/segment", json={"eps": 0.5, "min_samples": 5},
+                       headers=headers).status_code == 200
+    assert client.get("/api/v1/analytics/users/clusters", headers=headers).status_code == 200
+    assert client.get("/api/v1/analytics/users/outliers", headers=headers).status_code == 200
+    assert client.post("/api/v1/analytics/users/assign", json={"users": [features]},
+                       headers=headers).status_code == 200
+    assert client.get(f"/api/v1/analytics/users/profile/{user_id}", headers=headers).status_code == 200
+    assert calls == [False] * 5
+
+
+def test_persisted_segmentation_round_trips_without_pickle(tmp_path):
+    from app.services.segmentation_store import SegmentationStore
+
+    result = segmentation_store.get_or_fit()
+    store = SegmentationStore(store_path=str(tmp_path))
+    store._save(result)
+    loaded = store._load(result['version'])
+
+    assert loaded['clusters'] == result['clusters']
+    assert loaded['fitted_at'] == result['fitted_at']
+    assert np.array_equal(loaded['labels'], result['labels'])
+    users = segmentation_store.get_snapshot()["users"]
+    assert np.array_equal(loaded['model'].assign_many(users), result['model'].assign_many(users))
@@ -0,0 +1,96 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.core.startup import StartupOrchestrator
+
+
+def test_components_load_in_parallel_and_respect_dependencies():
+    order = []
+    release = threading.Event()
+
+    def slow(name):
+        def load():
+            release.wait(2)
+            order.append(name)
+        return load
+
+    def failing():
+        raise RuntimeError("no model file")
+
+    orchestrator = StartupOrchestrator(max_workers=4, required=[])
+    orchestrator.add('db', slow('db'))
+    orchestrator.add('model_a', slow('model_a'))
+    orchestrator.add('model_b', failing)
+    orchestrator.add('profiles', lambda: order.append('profiles'), depends_on=['db'])
+
+    started = time.perf_counter()
+    orchestrator.start()
+    assert time.perf_counter() - started < 0.5  # start() never blocks
+    assert not orchestrator.is_ready()
+
+    release.set()
+    assert orchestrator.wait(5)
+    assert order.index('profiles') > order.index('db')
+
+    status = orchestrator.status()['components']
+    assert status['model_b']['status'] == 'failed'
+    assert status['model_b']['error'] == 'no model file'
+    # Optional failures fall back; the service is still ready
+    assert orchestrator.is_ready()
+    assert orchestrator.is_ready(['model_a'])
+    assert not orchestrator.is_ready(['model_b'])
+
+
+def test_ready_endpoint_gates_on_required_and_requested_models(monkeypatch):
+    orchestrator = StartupOrchestrator(max_workers=2, required=['model_a'])
+    orchestrator.add('model_a', lambda: None)
+    orchestrator.add('model_b', lambda: (_ for _ in ()).throw(RuntimeError("missing")))
+    monkeypatch.setattr(main, 'startup_orchestrator', orchestrator)
+    client = TestClient(main.app)
+
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+
+    orchestrator.start().wait(5)
+    resp = client.get("/ready")
+    assert resp.status_code == 200
+    assert resp.json()['components']['model_a']['status'] == 'ready'
+
+    assert client.get("/api/v1/ready", params={'models': 'model_a'}).status_code == 200
+    resp = client.get("/ready", params={'models': 'model_b,unknown'})
+    assert resp.status_code == 503
+    assert resp.json()['unknown'] == ['unknown']
+
+
+def test_preload_loads_fork_safe_components_and_workers_load_the_rest():
+    loaded = []
+    orchestrator = StartupOrchestrator(max_workers=2, required=[])
+    orchestrator.add('db', lambda: loaded.append('db'))
+    orchestrator.add('model', lambda: loaded.append('model'), preload=True)
+    orchestrator.add('polling', lambda: loaded.append('polling'), depends_on=['model'])
+
+    assert orchestrator.preload() == {'model': 'ready'}
+    assert loaded == ['model']
+    assert not orchestrator.is_started()
+
+    orchestrator.start().wait(5)
+    assert sorted(loaded) == ['db', 'model', 'polling']  # model not loaded twice
+    assert orchestrator.is_ready()
+
+    # Preloaded components cannot depend on per-worker ones
+    with pytest.raises(ValueError):
+        orchestrator.add('bad', lambda: None, depends_on=['db'], preload=True)
+
+
+def test_importing_the_services_package_loads_no_models():
+    code = (
+        "import sys; import app.services; "
+        "sys.exit(any(name in sys.modules for name in ('pandas', 'sklearn', 'app.ml.dbscan_model')))"
+    )
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
@@ -0,0 +1,103 @@
+import os
+import time
+
+import pandas as pd
+
+from app.services.training_jobs import TrainingJobManager, _write_status, train_gbm_job
+
+
+def _fake_trainer(job_dir, status_path, params):
+    _write_status(status_path, progress=0.5)
+    artifact = os.path.join(job_dir, "model.bin")
+    with open(artifact, "w") as f:
+        f.write(str(os.getpid()))
+    return {"artifacts": {"serving": artifact}, "epochs": params["epochs"]}
+
+
+def _failing_trainer(job_dir, status_path, params):
+    raise ValueError("no data")
+
+
+def _wait(manager, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.2)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_jobs_run_in_another_process_and_promote(tmp_path):
+    manager = TrainingJobManager(jobs_path=str(tmp_path))
+    manager.TRAINERS = {"fake": _fake_trainer, "broken": _failing_trainer}
+    promoted = []
+    try:
+        job = manager.submit("fake", {"epochs": 3}, on_complete=promoted.append)
+        assert job["status"] in ("queued", "running")
+
+        done = _wait(manager, job["job_id"])
+        assert done["progress"] == 1.0 and done["result"]["epochs"] == 3
+        with open(promoted[0]["artifacts"]["serving"]) as f:
+            assert int(f.read()) != os.getpid()
+
+        failed = _wait(manager, manager.submit("broken", {}, on_complete=promoted.append)["job_id"])
+        assert failed["error"] == "no data" and len(promoted) == 1
+        assert [j["job_id"] for j in manager.list_jobs()][0] == failed["job_id"]
+    finally:
+        manager.shutdown()
+
+
+def _hourly_history(route_levels, days=14):
+    timestamps = pd.date_range("2025-01-01", periods=days * 24, freq="h")
+    rows = [(route_id, ts, level + 5 * (8 <= ts.hour <= 9))
+            for ts in timestamps for route_id, level in route_levels.items()]
+    return [list(column) for column in zip(*rows)]
+
+
+def test_gbm_job_trains_the_served_model_and_promotion_changes_predictions(tmp_path, monkeypatch,
+                                                                          transaction_records_sql):
+    from fastapi.testclient import TestClient
+
+    from app.core.security import create_access_token
+    from app.db import clickhouse as clickhouse_module
+    from app.main import app
+    from app.ml import model_registry as registry_module
+    from app.ml.demand_models import demand_model_registry
+
+    registry = registry_module.ModelRegistry(root=str(tmp_path / "registry"))
+    registry_module.register_serving_loaders(registry)
+    monkeypatch.setattr(registry_module, "model_registry", registry)
+    monkeypatch.setattr(demand_model_registry, "_models", {})
+    monkeypatch.setattr(demand_model_registry, "_attempted", set())
+    manager = TrainingJobManager(jobs_path=str(tmp_path / "jobs"))
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'test@example.com'})}"}
+
+    def train(levels, name):
+        history = _hourly_history(levels)
+
+        def fake_execute(query, params=None, **kwargs):
+            # Passengers per route-hour, not a count of route-hour rows
+            transaction_records_sql(query)
+            assert "sum(passenger_count) as demand" in query
+            return history
+
+        monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", fake_execute)
+        job_dir = tmp_path / name
+        job_dir.mkdir()
+        result = train_gbm_job(str(job_dir), str(job_dir / "status.json"), {"max_iter": 30})
+        manager.promote(result)
+        resp = client.post("/api/v1/analytics/demand/predict", json={"route_id": 2, "hours_ahead": 4}, headers=headers)
+        assert resp.status_code == 200
+        return result, resp.json()
+
+    first, served_first = train({1: 10, 2: 40}, "first")
+    second, served_second = train({1: 10, 2: 80}, "second")
+
+    assert first["routes"] == 2
+    assert served_first["model_version"] == f"gbm-{first['version']}"
+    assert served_second["model_version"] == f"gbm-{second['version']}"
+    first_levels = [p["predicted_demand"] for p in served_first["predictions"]]
+    second_levels = [p["predicted_demand"] for p in served_second["predictions"]]
+    assert min(second_levels) > max(first_levels) + 20
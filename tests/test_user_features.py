@@ -0,0 +1,41 @@
+from datetime import datetime
+from app.services.user_feature_service import user_feature_service
+from app.db import clickhouse as clickhouse_module
+from app.ml.dbscan_model import DBSCANUserSegmentation
+
+
+def test_load_features_builds_columnar_frame(monkeypatch):
+    columns = [
+        (1, 2), (20.0, 8.0), (150.0, 60.0), (2, 4), (0.7, 0.4), (0.4, 0.2), (0.3, 0.2),
+        (0.2, 0.6), (200, 80), (3, 7), (8, 18),
+        (datetime(2025, 1, 1), datetime(2025, 1, 2))
+    ]
+    calls = []
+
+    def fake_execute(query, params=None, **kwargs):
+        calls.append(kwargs)
+        return columns
+
+    monkeypatch.setattr(clickhouse_module.clickhouse_conn, "execute", fake_execute)
+
+    df = user_feature_service.load_features()
+
+    assert calls[0].get("columnar") is True
+    assert list(df.columns) == user_feature_service.COLUMNS
+    assert df["user_id"].tolist() == [1, 2]
+    assert df["peak_hour"].tolist() == [8, 18]
+    # Every clustering feature is backed by a computed column
+    assert set(DBSCANUserSegmentation.FEATURES) <= set(df.columns)
+
+
+def test_feature_store_is_off_by_default(monkeypatch):
+    from app.core.config import Settings, settings
+    from app.services.segmentation_store import SegmentationStore
+
+    assert Settings().SEGMENTATION_USE_FEATURE_STORE is False
+    monkeypatch.setattr(settings, "SEGMENTATION_USE_FEATURE_STORE", False)
+    monkeypatch.setattr(user_feature_service, "load_features",
+                        lambda **kwargs: (_ for _ in ()).throw(AssertionError("store queried")))
+
+    users_data, source = SegmentationStore()._load_users()
+    assert source == "synthetic" and "avg_trip_duration" not in users_data.columns